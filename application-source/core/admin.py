@@ -1,8 +1,61 @@
 """Admin site registrations for core models."""
 
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
 
-from .models import ReelInsight
+from .models import JobTrace, ReelInsight
+from .services.tracing import waterfall
 
 # Register your models here.
 admin.site.register(ReelInsight)
+
+
+@admin.register(JobTrace)
+class JobTraceAdmin(admin.ModelAdmin):
+    """Traced jobs; sort by duration for the slowest, open one for its spans."""
+
+    list_display = ("started_at", "kind", "insight_id", "duration_ms", "ok")
+    list_filter = ("kind", "ok")
+    search_fields = ("trace_id", "source_url", "insight_id")
+    ordering = ("-started_at",)
+    exclude = ("spans",)
+    readonly_fields = (
+        "trace_id",
+        "insight_id",
+        "kind",
+        "source_url",
+        "started_at",
+        "duration_ms",
+        "ok",
+        "waterfall",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Waterfall")
+    def waterfall(self, obj):
+        total = max(obj.duration_ms, 1)
+        rows = format_html_join(
+            "",
+            '<tr><td style="padding-left:{}em">{}</td><td>{}</td>'
+            '<td style="width:60%"><div style="margin-left:{}%;width:{}%;'
+            'min-width:1px;height:12px;background:{}"></div></td>'
+            '<td style="text-align:right">{} ms</td></tr>',
+            (
+                (
+                    row["depth"] * 1.5,
+                    row["name"],
+                    " ".join(f"{k}={v}" for k, v in row["attrs"].items()),
+                    round(100 * row["start_ms"] / total, 2),
+                    round(100 * (row["duration_ms"] or 0) / total, 2),
+                    "#417690" if row["ok"] else "#ba2121",
+                    row["duration_ms"],
+                )
+                for row in waterfall(obj)
+            ),
+        )
+        return format_html("<table>{}</table>", rows)
@@ -2,6 +2,7 @@
 
 import json
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -72,6 +73,156 @@ DEBUG = _get_env_bool("DEBUG", default=False)
 
 INSTAGRAM_COOKIES_PATH = "/opt/cookies/instagram.txt"
 
+# Base URLs of the local stand-in servers (``manage.py run_standins``) for
+# offline load tests, e.g. http://127.0.0.1:8801. Empty means the real
+# Gemini API and instagram.com.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+INSTAGRAM_BASE_URL = os.getenv("INSTAGRAM_BASE_URL", "")
+
+
+# ============================================================
+# Audio pipeline
+# ============================================================
+
+# audio_hash is the SHA-256 of the extracted audio, so changing any of the
+# settings below changes the hash of every new reel and hash dedup misses
+# reels stored before; run ``manage.py backfill_audio_hashes`` afterwards.
+
+# Demux AAC reel audio with `-c:a copy` instead of re-encoding when possible.
+AUDIO_STREAM_COPY = _get_env_bool("AUDIO_STREAM_COPY", default=True)
+
+# Encoding used when audio has to be re-encoded; see AUDIO_PROFILES in
+# core.services.audio_extractor (e.g. "opus_24k" for ~3x smaller payloads).
+AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "mp3_64k")
+
+# Drop leading silence and long pauses before encoding (disables stream copy).
+AUDIO_TRIM_SILENCE = _get_env_bool("AUDIO_TRIM_SILENCE", default=False)
+
+# Concurrent ffmpeg processes allowed on this host (0 = one per CPU).
+FFMPEG_MAX_CONCURRENCY = int(os.getenv("FFMPEG_MAX_CONCURRENCY", "0"))
+
+# Audio at least this long is split at silences and transcribed in parallel.
+CHUNKED_TRANSCRIBE_MIN_SECONDS = float(
+    os.getenv("CHUNKED_TRANSCRIBE_MIN_SECONDS", "180")
+)
+
+# SQLite file holding Gemini key rotation and cooldown state shared by every
+# worker process on this host.
+GEMINI_KEY_STATE_PATH = os.getenv(
+    "GEMINI_KEY_STATE_PATH",
+    os.path.join(tempfile.gettempdir(), "trigger-engine-gemini-keys.sqlite3"),
+)
+
+# Per-key Gemini budgets (requests/min, input tokens/min, requests/day).
+# Requests are scheduled on the key with the most headroom; defaults match
+# the free tier of the flash-lite models.
+GEMINI_KEY_RPM = int(os.getenv("GEMINI_KEY_RPM", "15"))
+GEMINI_KEY_TPM = int(os.getenv("GEMINI_KEY_TPM", "250000"))
+GEMINI_KEY_RPD = int(os.getenv("GEMINI_KEY_RPD", "1000"))
+
+# Quotas are per project and model, so each model spends its own buckets on
+# every key. Models listed here ("model=rpm/tpm/rpd", comma-separated) get
+# these budgets instead of the defaults above; the default entry is the
+# free tier of the capacity model.
+GEMINI_MODEL_BUDGETS = os.getenv(
+    "GEMINI_MODEL_BUDGETS", "gemini-2.5-flash=10/250000/250"
+)
+
+# A key rejected as invalid or without permission is skipped for this long,
+# then tried again (``manage.py gemini_keys --enable`` re-enables it now).
+GEMINI_KEY_DISABLE_SECONDS = float(
+    os.getenv("GEMINI_KEY_DISABLE_SECONDS", str(6 * 60 * 60))
+)
+
+# Longest a request waits for budget to refill before failing as exhausted.
+GEMINI_QUOTA_MAX_WAIT_SECONDS = float(
+    os.getenv("GEMINI_QUOTA_MAX_WAIT_SECONDS", "30")
+)
+
+# Concurrent async Gemini requests allowed per event loop.
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "32"))
+
+# Per-call deadline for Gemini requests (HTTP connect/read timeout).
+GEMINI_REQUEST_TIMEOUT_SECONDS = float(
+    os.getenv("GEMINI_REQUEST_TIMEOUT_SECONDS", "90")
+)
+
+# A key or model is skipped for GEMINI_BREAKER_OPEN_SECONDS after this many
+# consecutive errors or timeouts, then gets one trial call.
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_OPEN_SECONDS = float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+
+# Send a duplicate request on a second key when the first is slower than the
+# model's p95 latency (never sooner than the minimum delay).
+GEMINI_HEDGE_ENABLED = _get_env_bool("GEMINI_HEDGE_ENABLED", default=False)
+GEMINI_HEDGE_MIN_DELAY_SECONDS = float(
+    os.getenv("GEMINI_HEDGE_MIN_DELAY_SECONDS", "2")
+)
+
+# Audio at least this large is sent via the Gemini Files API, not inline.
+# 384 KiB is about 48s of the default 64 kbit/s MP3: below both
+# CHUNKED_TRANSCRIBE_MIN_SECONDS and the ~60s segments long audio is split
+# into, so those are uploaded while short clips stay inline.
+GEMINI_FILES_API_MIN_BYTES = int(
+    os.getenv("GEMINI_FILES_API_MIN_BYTES", str(384 * 1024))
+)
+
+# Parsed Gemini responses kept for reprocessing; least recently used
+# entries are evicted beyond this many bytes (0 disables the cache).
+GEMINI_RESPONSE_CACHE_MAX_BYTES = int(
+    os.getenv("GEMINI_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# Model routing: audio at least this long and posts with more slides or
+# image bytes than these limits go to GEMINI_CAPACITY_MODEL first; each
+# service's lite model handles the rest. Either falls back to the other on
+# invalid or truncated output.
+GEMINI_CAPACITY_MODEL = os.getenv("GEMINI_CAPACITY_MODEL", "models/gemini-2.5-flash")
+GEMINI_ROUTE_LONG_AUDIO_SECONDS = float(
+    os.getenv("GEMINI_ROUTE_LONG_AUDIO_SECONDS", "90")
+)
+GEMINI_ROUTE_MAX_LITE_IMAGES = int(os.getenv("GEMINI_ROUTE_MAX_LITE_IMAGES", "1"))
+GEMINI_ROUTE_MAX_LITE_IMAGE_BYTES = int(
+    os.getenv("GEMINI_ROUTE_MAX_LITE_IMAGE_BYTES", str(2 * 1024 * 1024))
+)
+
+# Stream Gemini transcriptions so the status endpoint can show the title and
+# other fields while the transcript is still being generated. Off by default:
+# process-reel only returns once the job is done, so nothing polls for the
+# partial fields yet, and streamed requests are never hedged.
+GEMINI_STREAM_PARTIALS = _get_env_bool("GEMINI_STREAM_PARTIALS", default=False)
+
+# Post slides are downscaled to this long edge and re-encoded as JPEG at this
+# quality before being sent to Gemini. 1536px keeps a slide within 2x2 of
+# Gemini's 768px image tiles while leaving caption text legible for OCR.
+POST_IMAGE_MAX_EDGE = int(os.getenv("POST_IMAGE_MAX_EDGE", "1536"))
+POST_IMAGE_JPEG_QUALITY = int(os.getenv("POST_IMAGE_JPEG_QUALITY", "80"))
+
+# Match reposts by perceptual audio fingerprint when the exact hash misses.
+# Off by default: a false match copies another reel's transcript.
+AUDIO_FINGERPRINT_ENABLED = _get_env_bool("AUDIO_FINGERPRINT_ENABLED", default=False)
+
+# Span timings of each reel/post job are kept for the trace waterfall; the
+# oldest are dropped beyond this many jobs (0 disables tracing).
+JOB_TRACE_MAX_ROWS = int(os.getenv("JOB_TRACE_MAX_ROWS", "5000"))
+
+# Opt-in CPU profiling of process_reel_task and the /api/ views: a random
+# PROFILE_SAMPLE_RATE fraction of them, plus any request whose
+# X-Profile-Token header equals PROFILE_TOKEN (empty disables the header).
+# PROFILE_MODE "sample" records the stack every PROFILE_SAMPLE_INTERVAL_SECONDS
+# as collapsed stacks; "cprofile" writes .pstats. Only the newest
+# PROFILE_MAX_FILES profiles in PROFILE_DIR are kept.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(
+    os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.005")
+)
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "trigger-engine-profiles")
+)
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
 
 # ============================================================
 # Email configuration
@@ -0,0 +1,95 @@
+"""Management command: recompute stored reel audio hashes.
+
+Audio is hashed as ffmpeg streams it, and stream-copied AAC or piped MP3
+bytes differ from the files earlier versions hashed, so a repost of an older
+reel would no longer match its audio_hash. This re-downloads each reel,
+extracts its audio with the current settings and stores the new hash. Reels
+that now hash like an earlier row are left without a hash (audio_hash is
+unique), as _reuse_existing does for duplicates.
+
+Usage:
+    python manage.py backfill_audio_hashes
+    python manage.py backfill_audio_hashes --limit 50 --after-id 1200
+    python manage.py backfill_audio_hashes --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.constants import AUDIO_PROFILE, AUDIO_STREAM_COPY, AUDIO_TRIM_SILENCE
+from core.models import ReelInsight
+
+
+class Command(BaseCommand):
+    help = "Recompute reel audio hashes with the current extraction settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Reels to process at most.")
+        parser.add_argument(
+            "--after-id",
+            type=int,
+            default=0,
+            help="Resume after this insight id (printed as reels are done).",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report changes without saving."
+        )
+
+    def handle(self, *args, **options):
+        from core.services.audio_extractor import extract_audio_artifact
+        from core.services.reel_downloader import download_reel
+
+        insights = (
+            ReelInsight.objects.filter(
+                audio_hash__isnull=False, pk__gt=options["after_id"]
+            )
+            .exclude(source_url__contains="/p/")
+            .order_by("pk")
+        )
+        if options["limit"]:
+            insights = insights[: options["limit"]]
+
+        changed = unchanged = failed = 0
+        for insight in insights.iterator():
+            video_path = audio_path = None
+            try:
+                video_path = download_reel(insight.source_url)
+                audio = extract_audio_artifact(
+                    video_path,
+                    stream_copy=AUDIO_STREAM_COPY,
+                    profile=AUDIO_PROFILE,
+                    trim_silence=AUDIO_TRIM_SILENCE,
+                )
+                audio_path = audio["path"]
+            except Exception as e:
+                failed += 1
+                self.stdout.write(f"{insight.pk} failed: {e}")
+                continue
+            finally:
+                if video_path:
+                    video_path.unlink(missing_ok=True)
+                if audio_path:
+                    audio_path.unlink(missing_ok=True)
+
+            audio_hash = audio["audio_hash"]
+            if audio_hash == insight.audio_hash:
+                unchanged += 1
+                continue
+
+            duplicate = (
+                ReelInsight.objects.filter(audio_hash=audio_hash)
+                .exclude(pk=insight.pk)
+                .exists()
+            )
+            changed += 1
+            self.stdout.write(
+                f"{insight.pk} {'duplicate, hash cleared' if duplicate else 'rehashed'}"
+            )
+            if not options["dry_run"]:
+                ReelInsight.objects.filter(pk=insight.pk).update(
+                    audio_hash=None if duplicate else audio_hash
+                )
+
+        self.stdout.write(
+            f"{changed} changed, {unchanged} unchanged, {failed} failed"
+            + (" (dry run)" if options["dry_run"] else "")
+        )
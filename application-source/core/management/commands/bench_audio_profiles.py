@@ -0,0 +1,80 @@
+"""Management command: compare audio encoding profiles on a local video.
+
+Usage:
+    python manage.py bench_audio_profiles media/sample.mp4
+    python manage.py bench_audio_profiles media/sample.mp4 --repeat 3
+"""
+
+import base64
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.audio_extractor import (
+    AUDIO_PROFILES,
+    can_stream_copy,
+    extract_audio_for_gemini,
+    probe_audio_stream,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark payload size and encode time for each audio profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("video", help="Path to a sample reel video.")
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=1,
+            help="Encode each profile N times and report the fastest run.",
+        )
+
+    def _run_profile(self, video_path: Path, repeat: int, **kwargs) -> dict:
+        best_seconds = None
+        audio_path = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            audio_path = extract_audio_for_gemini(video_path, **kwargs)
+            elapsed = time.perf_counter() - started
+            best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+
+        size = audio_path.stat().st_size
+        b64_size = len(base64.b64encode(audio_path.read_bytes()))
+        audio_path.unlink(missing_ok=True)
+        return {"seconds": best_seconds, "bytes": size, "b64_bytes": b64_size}
+
+    def handle(self, *args, **options):
+        source = Path(options["video"])
+        if not source.is_file():
+            raise CommandError(f"Video not found: {source}")
+
+        probe = probe_audio_stream(source)
+        duration = (probe or {}).get("duration")
+
+        runs = [(name, {"profile": name}) for name in AUDIO_PROFILES]
+        if can_stream_copy(probe):
+            runs.insert(0, ("copy", {"stream_copy": True}))
+
+        self.stdout.write(
+            f"{'profile':<10} {'encode s':>9} {'bytes':>10} {'base64':>10} {'KB/min':>8}"
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Work on a copy so outputs never clobber files next to the source.
+            video_path = Path(tmp_dir) / source.name
+            shutil.copyfile(source, video_path)
+
+            for name, kwargs in runs:
+                result = self._run_profile(video_path, options["repeat"], **kwargs)
+                per_minute = (
+                    f"{result['bytes'] / 1024 / (duration / 60):8.0f}"
+                    if duration
+                    else f"{'-':>8}"
+                )
+                self.stdout.write(
+                    f"{name:<10} {result['seconds']:9.3f} {result['bytes']:10d} "
+                    f"{result['b64_bytes']:10d} {per_minute}"
+                )
@@ -0,0 +1,61 @@
+"""Management command: measure cold import time of the app entry points.
+
+Usage:
+    python manage.py bench_imports                  # default entry points
+    python manage.py bench_imports core.views --top 20
+    python manage.py bench_imports --strict         # exit 1 if heavy deps load
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.services.import_timing import DEFAULT_TARGETS, measure_import
+
+
+class Command(BaseCommand):
+    help = "Report import time per entry point using python -X importtime."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modules",
+            nargs="*",
+            help="Modules to import (defaults to URLs, views and cron commands).",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Show the N slowest imports (by cumulative time) per module.",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Exit with code 1 if a heavy third-party module is imported.",
+        )
+
+    def handle(self, *args, **options):
+        failed = False
+
+        for module in options["modules"] or DEFAULT_TARGETS:
+            result = measure_import(module)
+            self.stdout.write(
+                f"{module}: {result['total_us'] / 1000:.1f} ms total"
+            )
+
+            slowest = sorted(
+                result["entries"], key=lambda entry: entry["cumulative_us"], reverse=True
+            )
+            for entry in slowest[: options["top"]]:
+                self.stdout.write(
+                    f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}"
+                )
+
+            if result["heavy"]:
+                failed = True
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"  heavy modules imported: {', '.join(result['heavy'])}"
+                    )
+                )
+
+        if failed and options["strict"]:
+            raise SystemExit(1)
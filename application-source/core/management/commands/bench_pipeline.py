@@ -0,0 +1,387 @@
+"""Management command: end-to-end benchmark of reel and post processing.
+
+Starts the Gemini and Instagram stand-ins (core.standins) in-process, points
+the pipeline at them and submits synthetic reels and posts through the
+process_reel view at the given concurrency, against a throwaway database
+and the locmem email backend. Reports throughput, job latency, p50/p95/p99
+per pipeline stage (core.services.pipeline_stages) and peak RSS, and writes
+the results as JSON; ``--compare`` diffs them against an earlier run.
+
+Any GEMINI_API_KEY_1/2 values work against the stand-in. Key budgets are
+lifted unless --key-rpm is given, so the numbers measure this code rather
+than the quota. Reels need ffmpeg, for the pipeline and to synthesize them.
+
+Usage:
+    python manage.py bench_pipeline
+    python manage.py bench_pipeline --reels 50 --posts 20 --concurrency 8 \\
+        --gemini-latency 1.5 --quota-error-rate 0.05 --output before.json
+    python manage.py bench_pipeline --compare before.json
+"""
+
+import json
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import RequestFactory, override_settings
+
+from core import constants
+from core.services.pipeline_stages import add_stage_listener, remove_stage_listener
+from core.standins import (
+    GeminiBehavior,
+    GeminiStandIn,
+    InstagramBehavior,
+    InstagramStandIn,
+    serve_in_background,
+)
+from core.warmup import warm_up
+
+RESULTS_DIR = Path(settings.BASE_DIR) / "bench-results"
+# Lifted key budget: high enough never to throttle a benchmark.
+UNTHROTTLED_RPM = 1_000_000
+# Options saved with the results, to tell comparable runs apart.
+CONFIG_OPTIONS = (
+    "reels",
+    "posts",
+    "concurrency",
+    "gemini_latency",
+    "instagram_latency",
+    "jitter",
+    "quota_error_rate",
+    "server_error_rate",
+    "malformed_rate",
+    "reel_seconds",
+    "post_slides",
+    "key_rpm",
+    "seed",
+)
+
+
+class StageRecorder:
+    """Stage listener collecting timings from every worker thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.failures: Counter = Counter()
+
+    def __call__(self, name: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.failures[name] += 1
+
+
+def summarize(samples: list[float]) -> dict:
+    """Count, mean and nearest-rank p50/p95/p99/max of *samples*, in seconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(fraction: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+        return round(ordered[index], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux. Children are left out: a forked
+    # child inherits the parent's peak before it execs ffmpeg.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _git_commit() -> str | None:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        check=False,
+        cwd=settings.BASE_DIR,
+    )
+    return result.stdout.strip() or None
+
+
+@contextmanager
+def throwaway_database(directory: Path):
+    """Run against a fresh, migrated SQLite copy of the schema."""
+    connection.settings_dict.setdefault("TEST", {})["NAME"] = str(
+        directory / "bench.sqlite3"
+    )
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def pipeline_on_standins(
+    gemini_url: str, instagram_url: str, directory: Path, budget
+):
+    """Point the shared Gemini key manager and the downloaders at stand-ins."""
+    from core.services.gemini_key_manager import KeyStateStore, default_key_manager
+
+    manager = default_key_manager()
+    saved = (manager.base_url, manager.store, manager.budget, manager.model_budgets)
+    saved_instagram = constants.INSTAGRAM_BASE_URL
+    manager.base_url = gemini_url
+    manager.store = KeyStateStore(directory / "gemini-keys.sqlite3")
+    manager.budget = budget
+    manager.model_budgets = {}
+    manager.reset_clients()
+    constants.INSTAGRAM_BASE_URL = instagram_url
+    try:
+        yield
+    finally:
+        (
+            manager.base_url,
+            manager.store,
+            manager.budget,
+            manager.model_budgets,
+        ) = saved
+        manager.reset_clients()
+        constants.INSTAGRAM_BASE_URL = saved_instagram
+
+
+class Command(BaseCommand):
+    help = "Benchmark reel/post processing end to end against local stand-ins."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reels", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=10)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--gemini-latency", type=float, default=1.0)
+        parser.add_argument("--instagram-latency", type=float, default=0.05)
+        parser.add_argument("--jitter", type=float, default=0.0)
+        parser.add_argument("--quota-error-rate", type=float, default=0.0)
+        parser.add_argument("--server-error-rate", type=float, default=0.0)
+        parser.add_argument("--malformed-rate", type=float, default=0.0)
+        parser.add_argument("--reel-seconds", type=float, default=20.0)
+        parser.add_argument("--post-slides", type=int, default=3)
+        parser.add_argument(
+            "--key-rpm",
+            type=int,
+            help="Per-key requests/minute budget (default: unthrottled).",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", type=Path, help="JSON results path (default: bench-results/)."
+        )
+        parser.add_argument(
+            "--compare", type=Path, help="Earlier results JSON to diff against."
+        )
+
+    def handle(self, *args, **options):
+        from core.services.gemini_key_manager import KeyBudget
+
+        if options["key_rpm"]:
+            budget = KeyBudget(rpm=options["key_rpm"])
+        else:
+            budget = KeyBudget(
+                rpm=UNTHROTTLED_RPM,
+                tpm=UNTHROTTLED_RPM * 1000,
+                rpd=UNTHROTTLED_RPM * 1000,
+            )
+
+        gemini = GeminiStandIn(
+            behavior=GeminiBehavior(
+                latency_seconds=options["gemini_latency"],
+                jitter_seconds=options["jitter"],
+                quota_error_rate=options["quota_error_rate"],
+                server_error_rate=options["server_error_rate"],
+                malformed_rate=options["malformed_rate"],
+                seed=options["seed"],
+            )
+        )
+        instagram = InstagramStandIn(
+            behavior=InstagramBehavior(
+                latency_seconds=options["instagram_latency"],
+                jitter_seconds=options["jitter"],
+                reel_seconds=options["reel_seconds"],
+                post_slides=options["post_slides"],
+                seed=options["seed"],
+            )
+        )
+        jobs = [
+            ("reel", f"https://www.instagram.com/reel/BENCHREEL{i:05d}/")
+            for i in range(options["reels"])
+        ] + [
+            ("post", f"https://www.instagram.com/p/BENCHPOST{i:05d}/")
+            for i in range(options["posts"])
+        ]
+        if not jobs:
+            raise CommandError("Nothing to run: give --reels and/or --posts.")
+
+        self.stdout.write(f"Synthesizing media for {len(jobs)} jobs...")
+        try:
+            self._synthesize(instagram, jobs, options["post_slides"])
+        except RuntimeError as exc:
+            raise CommandError(str(exc)) from exc
+
+        # Start warm, like a gunicorn worker forked from a preloaded master.
+        warm_up()
+        serve_in_background(gemini)
+        serve_in_background(instagram)
+        recorder = StageRecorder()
+        add_stage_listener(recorder)
+        try:
+            with (
+                tempfile.TemporaryDirectory(prefix="bench-pipeline-") as tmp,
+                throwaway_database(Path(tmp)),
+                pipeline_on_standins(
+                    gemini.base_url, instagram.base_url, Path(tmp), budget
+                ),
+                override_settings(
+                    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+                ),
+            ):
+                latencies, failed, wall = self._run(jobs, options["concurrency"])
+        finally:
+            remove_stage_listener(recorder)
+            for server in (gemini, instagram):
+                server.shutdown()
+                server.server_close()
+
+        results = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "config": {key: options[key] for key in CONFIG_OPTIONS},
+            "jobs": {
+                "total": len(jobs),
+                "failed": failed,
+                "wall_seconds": round(wall, 3),
+                "throughput_per_second": round(len(jobs) / wall, 3),
+            },
+            "latency": {
+                kind: summarize(values) for kind, values in latencies.items()
+            },
+            "stages": {
+                name: {**summarize(values), "failures": recorder.failures[name]}
+                for name, values in sorted(recorder.samples.items())
+            },
+            "peak_rss_mib": _peak_rss_mib(),
+            "standins": {
+                "gemini": dict(gemini.outcomes),
+                "instagram": dict(instagram.outcomes),
+            },
+        }
+        self._report(results)
+
+        output = options["output"] or RESULTS_DIR / (
+            f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        self.stdout.write(f"Results written to {output}")
+
+        if options["compare"]:
+            self._compare(json.loads(options["compare"].read_text()), results)
+
+    def _synthesize(self, instagram: InstagramStandIn, jobs, slides: int) -> None:
+        """Generate every job's media up front so it is not timed as download."""
+        names = []
+        for kind, url in jobs:
+            shortcode = url.rstrip("/").rsplit("/", 1)[-1]
+            if kind == "reel":
+                names.append(f"{shortcode}.mp4")
+            else:
+                names.extend(f"{shortcode}_{index}.jpg" for index in range(slides))
+        with ThreadPoolExecutor() as pool:
+            list(pool.map(instagram.media, names))
+
+    def _run(self, jobs, concurrency: int):
+        from core.views import process_reel
+
+        factory = RequestFactory()
+        latencies: dict[str, list[float]] = defaultdict(list)
+        lock = threading.Lock()
+        failed = 0
+
+        def submit(job) -> None:
+            nonlocal failed
+            kind, url = job
+            request = factory.post(
+                "/api/process-reel/",
+                data=json.dumps({"url": url}),
+                content_type="application/json",
+            )
+            started = time.perf_counter()
+            ok = False
+            try:
+                ok = process_reel(request).status_code == 200
+            finally:
+                connections.close_all()
+            with lock:
+                latencies[kind].append(time.perf_counter() - started)
+                failed += not ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            list(pool.map(submit, jobs))
+        return latencies, failed, time.perf_counter() - started
+
+    def _report(self, results: dict) -> None:
+        jobs = results["jobs"]
+        self.stdout.write(
+            f"{jobs['total']} jobs ({jobs['failed']} failed) in "
+            f"{jobs['wall_seconds']:.2f}s: {jobs['throughput_per_second']:.2f} jobs/s"
+        )
+        self.stdout.write(f"Peak RSS {results['peak_rss_mib']} MiB")
+        self.stdout.write(
+            f"{'stage':<14} {'n':>5} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} "
+            f"{'fail':>5}"
+        )
+        rows = [(f"job:{kind}", stats, 0) for kind, stats in results["latency"].items()]
+        rows += [
+            (name, stats, stats["failures"])
+            for name, stats in results["stages"].items()
+        ]
+        for name, stats, failures in rows:
+            self.stdout.write(
+                f"{name:<14} {stats['count']:>5} {stats['p50']:>8.3f} "
+                f"{stats['p95']:>8.3f} {stats['p99']:>8.3f} {failures:>5}"
+            )
+
+    def _compare(self, before: dict, after: dict) -> None:
+        self.stdout.write(
+            f"Compared with {before.get('git_commit') or 'earlier run'} "
+            f"({before.get('created_at')}):"
+        )
+
+        def change(old: float, new: float) -> str:
+            return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+        old_rate = before["jobs"]["throughput_per_second"]
+        new_rate = after["jobs"]["throughput_per_second"]
+        self.stdout.write(
+            f"  throughput {old_rate:.2f} -> {new_rate:.2f} jobs/s "
+            f"({change(old_rate, new_rate)})"
+        )
+        for name, stats in after["stages"].items():
+            old = before.get("stages", {}).get(name)
+            if not old or not old.get("count"):
+                continue
+            self.stdout.write(
+                f"  {name:<14} p50 {change(old['p50'], stats['p50']):>8} "
+                f"p95 {change(old['p95'], stats['p95']):>8}"
+            )
@@ -0,0 +1,90 @@
+"""Management command: peak memory of building a Gemini audio request.
+
+Each run happens in a forked child so its peak RSS is measured in isolation.
+The child builds the request parts and serializes them the way the SDK does
+before sending, without any network call.
+
+Usage:
+    python manage.py bench_request_memory
+    python manage.py bench_request_memory --sizes 1 5 20 50
+"""
+
+import base64
+import multiprocessing
+import os
+import resource
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from core.services.gemini_request import audio_part, user_contents
+
+MODES = ("base64", "bytes")
+
+
+def _legacy_audio_part(audio_path: str) -> dict:
+    # The pre-builder request shape: base64 str built by hand.
+    with open(audio_path, "rb") as f:
+        audio_b64 = base64.b64encode(f.read()).decode()
+    return {"inline_data": {"mime_type": "audio/mpeg", "data": audio_b64}}
+
+
+def _peak_rss_kib() -> int:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(mode: str, audio_path: str, conn) -> None:
+    from google.genai import types
+
+    baseline = _peak_rss_kib()
+    part = _legacy_audio_part(audio_path) if mode == "base64" else audio_part(audio_path)
+    content = types.Content.model_validate(user_contents([part, {"text": "prompt"}])[0])
+    payload = content.model_dump(mode="json", exclude_none=True)
+    conn.send(
+        {
+            "peak_mib": (_peak_rss_kib() - baseline) / 1024,
+            "request_bytes": len(payload["parts"][0]["inline_data"]["data"]),
+        }
+    )
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = "Measure peak RSS per Gemini request for base64 vs raw-bytes payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1, 5, 20],
+            help="Audio payload sizes in MB.",
+        )
+
+    def _run(self, mode: str, audio_path: Path) -> dict:
+        context = multiprocessing.get_context("fork")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_measure, args=(mode, str(audio_path), sender))
+        process.start()
+        result = receiver.recv()
+        process.join()
+        return result
+
+    def handle(self, *args, **options):
+        # Import once in the parent so children do not count SDK import cost.
+        from google.genai import types  # noqa: F401
+
+        self.stdout.write(f"{'size MB':>7} {'mode':<7} {'peak RSS MiB':>13} {'request bytes':>14}")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for size in options["sizes"]:
+                audio_path = Path(tmp_dir) / f"audio_{size}mb.mp3"
+                audio_path.write_bytes(os.urandom(size * 1024 * 1024))
+                for mode in MODES:
+                    result = self._run(mode, audio_path)
+                    self.stdout.write(
+                        f"{size:7d} {mode:<7} {result['peak_mib']:13.1f} "
+                        f"{result['request_bytes']:14d}"
+                    )
+                audio_path.unlink()
@@ -0,0 +1,70 @@
+"""Management command: inspect or prune the Gemini response cache.
+
+Usage:
+    python manage.py gemini_cache
+    python manage.py gemini_cache --prune
+    python manage.py gemini_cache --prune --unused-days 30 --max-mb 16
+    python manage.py gemini_cache --clear
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import GeminiResponseCache
+from core.services.response_cache import cache_stats, prune
+
+
+class Command(BaseCommand):
+    help = "Show Gemini response cache usage, or prune it."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Evict least recently used entries down to the size budget.",
+        )
+        parser.add_argument(
+            "--unused-days",
+            type=int,
+            help="With --prune, also drop entries unused for this many days.",
+        )
+        parser.add_argument(
+            "--max-mb",
+            type=float,
+            help="With --prune, evict down to this size instead of the setting.",
+        )
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete every cached response."
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            removed, _ = GeminiResponseCache.objects.all().delete()
+            self.stdout.write(f"Deleted {removed} cached responses")
+        elif options["prune"]:
+            unused_since = (
+                timezone.now() - timedelta(days=options["unused_days"])
+                if options["unused_days"]
+                else None
+            )
+            max_bytes = (
+                int(options["max_mb"] * 1024 * 1024)
+                if options["max_mb"] is not None
+                else None
+            )
+            removed = prune(unused_since=unused_since, max_bytes=max_bytes)
+            self.stdout.write(f"Pruned {removed} cached responses")
+
+        stats = cache_stats()
+        self.stdout.write(
+            f"{stats['entries']} entries, {stats['size_bytes'] / 1024:.1f} KiB "
+            f"of {stats['max_bytes'] / 1024 / 1024:.0f} MiB, {stats['hits']} hits"
+        )
+        for row in stats["per_prompt"]:
+            self.stdout.write(
+                f"  {row['prompt_version']:<16} {row['model']:<40} "
+                f"{row['entries']:6d} entries {row['size_bytes'] / 1024:9.1f} KiB "
+                f"{row['hits']:6d} hits"
+            )
@@ -0,0 +1,58 @@
+"""Management command: show or reset the shared Gemini key state.
+
+Keys are listed by their non-secret id (see gemini_key_manager.key_id) with
+their cooldown, disable and per-model budget levels.
+
+Usage:
+    python manage.py gemini_keys
+    python manage.py gemini_keys --enable
+    python manage.py gemini_keys --enable --key 1a2b3c4d5e6f7a8b
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.constants import GEMINI_API_KEYS
+from core.services.gemini_key_manager import KEY_STATE, key_id
+
+
+class Command(BaseCommand):
+    help = "Show Gemini key cooldowns, disables and budgets, or re-enable keys."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--enable",
+            action="store_true",
+            help="Clear disables and cooldowns (of every key unless --key).",
+        )
+        parser.add_argument(
+            "--key",
+            action="append",
+            help="With --enable, only this key id; may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        if options["enable"]:
+            enabled = KEY_STATE.enable(options["key"])
+            self.stdout.write(f"Re-enabled {enabled} keys")
+
+        configured = {
+            key_id(key): index
+            for index, key in enumerate(GEMINI_API_KEYS, 1)
+            if key
+        }
+        now = time.time()
+        for kid, state in sorted(KEY_STATE.snapshot().items()):
+            label = f"GEMINI_API_KEY_{configured[kid]}" if kid in configured else "-"
+            status = "ok"
+            if state["disabled_until"] > now:
+                status = f"disabled {state['disabled_until'] - now:.0f}s"
+            elif state["cooldown_until"] > now:
+                status = f"cooldown {state['cooldown_until'] - now:.0f}s"
+            self.stdout.write(f"{kid} {label:<16} {status}")
+            for model, levels in sorted(state["budgets"].items()):
+                self.stdout.write(
+                    f"  {model:<40} rpm {levels['rpm_level']:.1f} "
+                    f"tpm {levels['tpm_level']:.0f} rpd {levels['rpd_level']:.1f}"
+                )
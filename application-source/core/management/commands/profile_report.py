@@ -0,0 +1,137 @@
+"""Management command: merge saved CPU profiles into one summary.
+
+Collapsed-stack profiles (PROFILE_MODE=sample) are summed into a single
+collapsed file for flamegraph.pl or speedscope; .pstats profiles
+(PROFILE_MODE=cprofile) are merged into one .pstats file. The busiest
+functions are printed either way.
+
+Usage:
+    python manage.py profile_report
+    python manage.py profile_report --match process_reel_task --hours 24
+    python manage.py profile_report --output stacks.collapsed --top 30
+    flamegraph.pl stacks.collapsed > flame.svg
+"""
+
+import io
+import pstats
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.constants import PROFILE_DIR
+
+
+def merge_collapsed(paths: list[Path]) -> Counter[str]:
+    """Sum the sample counts of identical stacks across collapsed files."""
+    stacks: Counter[str] = Counter()
+    for path in paths:
+        for line in path.read_text().splitlines():
+            stack, _, count = line.rpartition(" ")
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+    return stacks
+
+
+def top_frames(stacks: Counter[str], limit: int) -> list[tuple[str, int, int]]:
+    """(frame, self samples, total samples) for the busiest frames."""
+    own: Counter[str] = Counter()
+    total: Counter[str] = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+class Command(BaseCommand):
+    help = "Merge saved CPU profiles into a flamegraph-ready summary."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir", default=PROFILE_DIR, help="Profile directory (PROFILE_DIR)."
+        )
+        parser.add_argument(
+            "--match",
+            default="",
+            help="Only profiles whose file name contains this, e.g. api.process-reel.",
+        )
+        parser.add_argument(
+            "--hours", type=float, help="Only profiles written in the last N hours."
+        )
+        parser.add_argument(
+            "--output",
+            help="Merged file to write (default: profile-report.collapsed or "
+            ".pstats in the current directory).",
+        )
+        parser.add_argument(
+            "--top", type=int, default=20, help="Functions to list (default 20)."
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["dir"])
+        if not directory.is_dir():
+            raise CommandError(f"No profiles in {directory}")
+
+        cutoff = time.time() - options["hours"] * 3600 if options["hours"] else 0
+        selected = sorted(
+            path
+            for path in directory.iterdir()
+            if options["match"] in path.name and path.stat().st_mtime >= cutoff
+        )
+        collapsed = [path for path in selected if path.suffix == ".collapsed"]
+        stats_files = [path for path in selected if path.suffix == ".pstats"]
+        if not collapsed and not stats_files:
+            raise CommandError(f"No matching profiles in {directory}")
+
+        if collapsed:
+            self._report_collapsed(collapsed, options)
+        if stats_files:
+            self._report_pstats(stats_files, options)
+
+    def _report_collapsed(self, paths: list[Path], options) -> None:
+        stacks = merge_collapsed(paths)
+        output = Path(options["output"] or "profile-report.collapsed")
+        if output.suffix == ".pstats":
+            output = output.with_suffix(".collapsed")
+        output.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        )
+
+        samples = sum(stacks.values())
+        self.stdout.write(
+            f"{len(paths)} sampled profiles, {samples} samples -> {output}"
+        )
+        self.stdout.write(f"  {'self %':>7} {'total %':>7}  function")
+        for frame, own, total in top_frames(stacks, options["top"]):
+            self.stdout.write(
+                f"  {100 * own / samples:7.1f} {100 * total / samples:7.1f}  {frame}"
+            )
+
+    def _report_pstats(self, paths: list[Path], options) -> None:
+        output = Path(options["output"] or "profile-report.pstats")
+        if output.suffix != ".pstats":
+            output = output.with_suffix(".pstats")
+        report = io.StringIO()
+        stats = None
+        loaded = 0
+        for path in paths:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(str(path), stream=report)
+                else:
+                    stats.add(str(path))
+            except (EOFError, TypeError, ValueError):
+                # Empty or truncated, e.g. the worker died while writing it.
+                self.stdout.write(f"Skipped unreadable profile {path.name}")
+                continue
+            loaded += 1
+        if stats is None:
+            return
+        stats.dump_stats(output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(options["top"])
+
+        self.stdout.write(f"{loaded} cProfile profiles -> {output}")
+        self.stdout.write(report.getvalue())
@@ -0,0 +1,115 @@
+"""Management command: run the local Gemini and Instagram stand-ins.
+
+Start this, then run the app (or bench_pipeline) with the printed
+GEMINI_BASE_URL and INSTAGRAM_BASE_URL so no request leaves the host.
+
+Usage:
+    python manage.py run_standins
+    python manage.py run_standins --gemini-latency 2 --jitter 0.5 \\
+        --quota-error-rate 0.05 --malformed-rate 0.02 --seed 7
+    python manage.py run_standins --recordings tests/fixtures/instagram
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from core.standins import (
+    GeminiBehavior,
+    GeminiStandIn,
+    InstagramBehavior,
+    InstagramStandIn,
+    serve_in_background,
+)
+
+
+class Command(BaseCommand):
+    help = "Serve fake Gemini and Instagram endpoints for offline load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--gemini-port", type=int, default=8801)
+        parser.add_argument("--instagram-port", type=int, default=8802)
+        parser.add_argument(
+            "--gemini-latency",
+            type=float,
+            default=1.0,
+            help="Seconds each Gemini generate call takes.",
+        )
+        parser.add_argument(
+            "--instagram-latency",
+            type=float,
+            default=0.1,
+            help="Seconds each Instagram page or media request takes.",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.0,
+            help="Uniform ± jitter added to both latencies, in seconds.",
+        )
+        parser.add_argument(
+            "--quota-error-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of Gemini calls answered with 429 RESOURCE_EXHAUSTED.",
+        )
+        parser.add_argument(
+            "--server-error-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of Gemini calls answered with 503 UNAVAILABLE.",
+        )
+        parser.add_argument(
+            "--malformed-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of Gemini calls answered with truncated JSON.",
+        )
+        parser.add_argument("--retry-delay", type=int, default=5)
+        parser.add_argument("--reel-seconds", type=float, default=20.0)
+        parser.add_argument("--post-slides", type=int, default=3)
+        parser.add_argument(
+            "--recordings",
+            type=Path,
+            help="Directory of recorded reel/, embed/, post/ and media/ files.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        gemini = GeminiStandIn(
+            (options["host"], options["gemini_port"]),
+            GeminiBehavior(
+                latency_seconds=options["gemini_latency"],
+                jitter_seconds=options["jitter"],
+                quota_error_rate=options["quota_error_rate"],
+                server_error_rate=options["server_error_rate"],
+                malformed_rate=options["malformed_rate"],
+                retry_delay_seconds=options["retry_delay"],
+                seed=options["seed"],
+            ),
+        )
+        instagram = InstagramStandIn(
+            (options["host"], options["instagram_port"]),
+            InstagramBehavior(
+                latency_seconds=options["instagram_latency"],
+                jitter_seconds=options["jitter"],
+                reel_seconds=options["reel_seconds"],
+                post_slides=options["post_slides"],
+                recordings_dir=options["recordings"],
+                seed=options["seed"],
+            ),
+        )
+        serve_in_background(instagram)
+        self.stdout.write(f"GEMINI_BASE_URL={gemini.base_url}")
+        self.stdout.write(f"INSTAGRAM_BASE_URL={instagram.base_url}")
+        try:
+            gemini.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            instagram.shutdown()
+            gemini.server_close()
+            instagram.server_close()
+            self.stdout.write(f"Gemini calls: {dict(gemini.outcomes)}")
+            self.stdout.write(f"Instagram requests: {dict(instagram.outcomes)}")
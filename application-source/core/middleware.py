@@ -0,0 +1,25 @@
+"""Request middleware for the core app."""
+
+from core.services.profiling import (
+    FILE_HEADER,
+    TOKEN_HEADER,
+    profiled,
+    should_profile,
+)
+
+
+def profiling_middleware(get_response):
+    """Profile sampled or token-bearing /api/ requests (see services.profiling)."""
+
+    def middleware(request):
+        if not request.path.startswith("/api/"):
+            return get_response(request)
+
+        enabled = should_profile(request.headers.get(TOKEN_HEADER))
+        with profiled(request.path.strip("/").replace("/", "."), enabled) as path:
+            response = get_response(request)
+        if path is not None:
+            response[FILE_HEADER] = path.name
+        return response
+
+    return middleware
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_reelinsight_processed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reelinsight',
+            name='audio_trimmed_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
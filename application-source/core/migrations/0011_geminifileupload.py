@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_audiofingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiFileUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audio_hash', models.CharField(db_index=True, max_length=64)),
+                ('key_id', models.CharField(max_length=16)),
+                ('file_name', models.CharField(max_length=200)),
+                ('file_uri', models.URLField(max_length=500)),
+                ('mime_type', models.CharField(max_length=50)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('audio_hash', 'key_id'), name='unique_upload_per_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_geminifileupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_version', models.CharField(max_length=50)),
+                ('response', models.JSONField()),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'model', 'prompt_version'), name='unique_response_per_prompt')],
+            },
+        ),
+    ]
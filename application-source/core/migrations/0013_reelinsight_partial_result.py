@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_geminiresponsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reelinsight',
+            name='partial_result',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
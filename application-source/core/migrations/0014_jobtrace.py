@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_reelinsight_partial_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobTrace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trace_id', models.CharField(max_length=32, unique=True)),
+                ('insight_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('kind', models.CharField(max_length=10)),
+                ('source_url', models.URLField()),
+                ('started_at', models.DateTimeField(db_index=True)),
+                ('duration_ms', models.PositiveIntegerField(db_index=True)),
+                ('ok', models.BooleanField()),
+                ('spans', models.JSONField(default=list)),
+            ],
+        ),
+    ]
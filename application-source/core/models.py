@@ -24,8 +24,94 @@ class ReelInsight(models.Model):
         blank=True,
     )
 
+    # Seconds of silence removed from the audio before transcription.
+    audio_trimmed_seconds = models.FloatField(null=True, blank=True)
+
+    # Fields streamed so far while Gemini is still generating (e.g. title).
+    partial_result = models.JSONField(null=True, blank=True)
+
     processed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return str(self.source_url)
+
+
+class AudioFingerprint(models.Model):
+    """One landmark hash of a reel's audio (inverted index for near-duplicates)."""
+
+    hash = models.IntegerField(db_index=True)
+    insight = models.ForeignKey(
+        ReelInsight, on_delete=models.CASCADE, related_name="fingerprints"
+    )
+    # Anchor position in STFT frames (32 ms each).
+    offset = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.hash}@{self.offset}"
+
+
+class GeminiFileUpload(models.Model):
+    """Audio uploaded to the Gemini Files API, reusable until it expires."""
+
+    audio_hash = models.CharField(max_length=64, db_index=True)
+    # Files belong to the key's project; store a digest, never the key itself.
+    key_id = models.CharField(max_length=16)
+    file_name = models.CharField(max_length=200)
+    file_uri = models.URLField(max_length=500)
+    mime_type = models.CharField(max_length=50)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["audio_hash", "key_id"], name="unique_upload_per_key"
+            )
+        ]
+
+    def __str__(self):
+        return str(self.file_name)
+
+
+class GeminiResponseCache(models.Model):
+    """Parsed Gemini response for one input, model and prompt version."""
+
+    # sha256 of the audio, or of the ordered image set for posts.
+    content_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=50)
+    response = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_hash", "model", "prompt_version"],
+                name="unique_response_per_prompt",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.prompt_version}:{self.content_hash[:12]}"
+
+
+class JobTrace(models.Model):
+    """Span timings of one reel/post processing job (see services.tracing)."""
+
+    trace_id = models.CharField(max_length=32, unique=True)
+    # Not a foreign key: the insight of a failed job is deleted, its trace kept.
+    insight_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    kind = models.CharField(max_length=10)
+    source_url = models.URLField()
+    started_at = models.DateTimeField(db_index=True)
+    duration_ms = models.PositiveIntegerField(db_index=True)
+    ok = models.BooleanField()
+    # [name, parent index, start_ms, duration_ms, ok, attrs] per span.
+    spans = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"{self.kind} {self.trace_id} ({self.duration_ms} ms)"
@@ -1,9 +1,80 @@
 """Audio extraction helpers that wrap ffmpeg."""
 
+import hashlib
+import json
+import logging
+import re
 import shutil
 import subprocess
+import tempfile
 from pathlib import Path
 
+from core.services.audio_hash import HASH_CHUNK_SIZE
+from core.services.ffmpeg_governor import GOVERNOR
+from core.services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Source codecs Gemini accepts as-is (AAC demuxed to ADTS -> audio/aac).
+STREAM_COPY_CODECS = {"aac"}
+# Copied audio is sent inline and grows ~33% when base64-encoded; keep it
+# comfortably below Gemini's 20 MB inline request limit.
+MAX_STREAM_COPY_BYTES = 14 * 1024 * 1024
+
+# Speech-tuned encodings, selectable via the AUDIO_PROFILE setting. All of
+# them downmix to 16 kHz mono, which is what Gemini resamples audio to anyway.
+# "format" is the ffmpeg muxer used when streaming the output through a pipe.
+AUDIO_PROFILES = {
+    # Historical default, ~500KB per minute. Piped without the Xing/LAME
+    # header a file output gets, so hashes differ from older rows.
+    "mp3_64k": {
+        "suffix": ".mp3",
+        "format": "mp3",
+        "codec_args": ["-c:a", "libmp3lame", "-b:a", "64k"],
+    },
+    "mp3_32k": {
+        "suffix": ".mp3",
+        "format": "mp3",
+        "codec_args": ["-c:a", "libmp3lame", "-b:a", "32k"],
+    },
+    # Opus in Ogg with the speech (VoIP) tuning: ~180KB per minute at 24k.
+    "opus_24k": {
+        "suffix": ".ogg",
+        "format": "ogg",
+        "codec_args": ["-c:a", "libopus", "-b:a", "24k", "-application", "voip"],
+    },
+    "opus_16k": {
+        "suffix": ".ogg",
+        "format": "ogg",
+        "codec_args": ["-c:a", "libopus", "-b:a", "16k", "-application", "voip"],
+    },
+}
+
+# Muxer for piping each suffix we extract to, e.g. when splitting segments.
+SEGMENT_MUXERS = {
+    **{profile["suffix"]: profile["format"] for profile in AUDIO_PROFILES.values()},
+    ".aac": "adts",
+}
+
+# Drops leading silence and every pause longer than a second (including the
+# tail). Applied before encoding, so it cannot be combined with stream copy.
+SILENCE_REMOVE_FILTER = (
+    "silenceremove="
+    "start_periods=1:start_duration=0.3:start_threshold=-45dB:"
+    "stop_periods=-1:stop_duration=1:stop_threshold=-45dB"
+)
+
+# MIME types Gemini accepts for each audio container we produce or receive.
+AUDIO_MIME_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac",
+}
+
 
 def get_ffmpeg_path() -> str:
     """Return the system ffmpeg path or raise if it cannot be found."""
@@ -16,45 +87,399 @@ def get_ffmpeg_path() -> str:
     return ffmpeg
 
 
-def extract_audio_for_gemini(video_path: Path, bitrate: str = "64k") -> Path:
-    """
-    Extract audio from video with compression.
+def get_ffprobe_path() -> str | None:
+    """Return the system ffprobe path, or None if it is not installed."""
 
-    Args:
-        video_path: Path to video file
-        bitrate: Audio bitrate (default 64k = ~500KB per minute)
-                Use '128k' for better quality, '192k' for high quality
+    return shutil.which("ffprobe")
+
+
+def audio_mime_type(audio_path: str | Path) -> str:
+    """Best-effort MIME type for an audio file based on its extension."""
+    return AUDIO_MIME_TYPES.get(
+        Path(audio_path).suffix.lower(), "application/octet-stream"
+    )
+
+
+def probe_audio_stream(video_path: Path) -> dict | None:
     """
-    ffmpeg = get_ffmpeg_path()
+    Describe the first audio stream of a media file using ffprobe.
 
-    audio_path = video_path.with_suffix(".mp3")  # MP3 format for compression
+    Returns a dict with ``codec_name``, ``bit_rate`` (bits/s) and ``duration``
+    (seconds), or None when ffprobe is missing, fails, or finds no audio.
+    """
+    ffprobe = get_ffprobe_path()
+    if not ffprobe:
+        return None
 
     command = [
-        ffmpeg,
-        "-y",
-        "-i",
+        ffprobe,
+        "-v",
+        "error",
+        "-select_streams",
+        "a:0",
+        "-show_entries",
+        "stream=codec_name,bit_rate,duration:format=duration",
+        "-of",
+        "json",
         str(video_path),
-        "-vn",  # No video
-        "-ac",
-        "1",  # Mono
-        "-ar",
-        "16000",  # 16kHz sample rate
-        "-b:a",
-        bitrate,  # Audio bitrate for compression
-        str(audio_path),
     ]
 
     try:
-        subprocess.run(
+        completed = subprocess.run(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
             check=True,
         )
+        info = json.loads(completed.stdout or "{}")
+    except (subprocess.CalledProcessError, json.JSONDecodeError) as exc:
+        logger.warning("ffprobe failed for %s: %s", video_path, exc)
+        return None
+
+    streams = info.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+
+    def _number(value) -> float | None:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "codec_name": stream.get("codec_name"),
+        "bit_rate": _number(stream.get("bit_rate")),
+        "duration": _number(stream.get("duration"))
+        or _number(info.get("format", {}).get("duration")),
+    }
+
+
+def can_stream_copy(probe: dict | None) -> bool:
+    """Return True if the probed audio can be sent to Gemini without re-encoding."""
+    if not probe or probe.get("codec_name") not in STREAM_COPY_CODECS:
+        return False
+    if not probe.get("bit_rate") or not probe.get("duration"):
+        return False
+    estimated_bytes = probe["bit_rate"] * probe["duration"] / 8
+    return estimated_bytes <= MAX_STREAM_COPY_BYTES
+
+
+def _run_ffmpeg(command: list[str]) -> subprocess.CompletedProcess:
+    # Size encoder threads to the governor; "-threads" before the output path
+    # is an output option, so it applies to the encoder.
+    command = [*command[:-1], "-threads", str(GOVERNOR.threads), command[-1]]
+    try:
+        with GOVERNOR.slot():
+            return subprocess.run(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
     except subprocess.CalledProcessError as exc:
         raise RuntimeError(
             f"ffmpeg failed\nSTDOUT:\n{exc.stdout}\nSTDERR:\n{exc.stderr}"
         ) from exc
 
+
+def _run_ffmpeg_hashed(command: list[str], output_path: Path) -> str:
+    """
+    Run ffmpeg with its output on stdout, teeing the bytes into
+    ``output_path`` and SHA-256 so the file never has to be re-read.
+
+    ``command`` must end with the output muxer options (``-f <format>``).
+    Returns the hex digest of the written file. The output file is removed
+    if ffmpeg fails or the copy is interrupted.
+
+    A piped MP3 has no Xing/LAME header (ffmpeg cannot seek back to fill it
+    in), so its bytes, and hash, differ from the same encode written to a
+    file as before. ``manage.py backfill_audio_hashes`` recomputes the
+    hashes stored by earlier versions.
+    """
+    command = [*command, "-threads", str(GOVERNOR.threads), "pipe:1"]
+    digest = hashlib.sha256()
+
+    # stderr goes to a temp file: a second pipe could fill up and deadlock
+    # ffmpeg while we are blocked reading stdout.
+    with GOVERNOR.slot(), tempfile.TemporaryFile() as stderr_file:
+        process = None
+        try:
+            with open(output_path, "wb") as output:
+                process = subprocess.Popen(
+                    command, stdout=subprocess.PIPE, stderr=stderr_file
+                )
+                with process.stdout:
+                    for chunk in iter(
+                        lambda: process.stdout.read(HASH_CHUNK_SIZE), b""
+                    ):
+                        output.write(chunk)
+                        digest.update(chunk)
+                returncode = process.wait()
+        except BaseException:
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+            output_path.unlink(missing_ok=True)
+            raise
+
+        if returncode != 0:
+            output_path.unlink(missing_ok=True)
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors="replace")
+            raise RuntimeError(
+                f"ffmpeg failed (exit {returncode})\nSTDERR:\n{stderr}"
+            )
+
+    return digest.hexdigest()
+
+
+def _extract_audio(
+    video_path: Path,
+    bitrate: str = "64k",
+    stream_copy: bool = False,
+    profile: str | None = None,
+    trim_silence: bool = False,
+    source_probe: dict | None = None,
+) -> tuple[Path, str]:
+    """Extract audio and return (path, sha256) hashed while it was written."""
+    if profile is None:
+        suffix = ".mp3"  # MP3 format for compression
+        muxer = "mp3"
+        codec_args = ["-b:a", bitrate]  # Audio bitrate for compression
+    elif profile in AUDIO_PROFILES:
+        suffix = AUDIO_PROFILES[profile]["suffix"]
+        muxer = AUDIO_PROFILES[profile]["format"]
+        codec_args = AUDIO_PROFILES[profile]["codec_args"]
+    else:
+        raise ValueError(f"Unknown audio profile: {profile}")
+
+    ffmpeg = get_ffmpeg_path()
+
+    if stream_copy and not trim_silence:
+        probe = source_probe or probe_audio_stream(video_path)
+    else:
+        probe = None
+
+    if can_stream_copy(probe):
+        copy_path = video_path.with_suffix(".aac")
+        try:
+            digest = _run_ffmpeg_hashed(
+                [
+                    ffmpeg,
+                    "-y",
+                    "-i",
+                    str(video_path),
+                    "-vn",  # No video
+                    "-c:a",
+                    "copy",  # Keep the original AAC stream
+                    "-f",
+                    "adts",  # Raw AAC frames; MP4 cannot be written to a pipe
+                ],
+                copy_path,
+            )
+            return copy_path, digest
+        except RuntimeError:
+            logger.warning("Audio stream copy failed, re-encoding %s", video_path)
+
+    audio_path = video_path.with_suffix(suffix)
+
+    command = [
+        ffmpeg,
+        "-y",
+        "-i",
+        str(video_path),
+        "-vn",  # No video
+        "-ac",
+        "1",  # Mono
+        "-ar",
+        "16000",  # 16kHz sample rate
+        *(["-af", SILENCE_REMOVE_FILTER] if trim_silence else []),
+        *codec_args,
+        "-f",
+        muxer,
+    ]
+
+    return audio_path, _run_ffmpeg_hashed(command, audio_path)
+
+
+@timed("extract_audio_for_gemini")
+def extract_audio_for_gemini(
+    video_path: Path,
+    bitrate: str = "64k",
+    stream_copy: bool = False,
+    profile: str | None = None,
+    trim_silence: bool = False,
+    source_probe: dict | None = None,
+) -> Path:
+    """
+    Extract audio from video with compression.
+
+    Args:
+        video_path: Path to video file
+        bitrate: Audio bitrate (default 64k = ~500KB per minute)
+                Use '128k' for better quality, '192k' for high quality
+        stream_copy: Probe the source first and, if it already carries AAC
+                audio within the inline size limit, demux it into an .aac
+                without re-encoding. Falls back to the MP3 encode otherwise.
+        profile: Name of an AUDIO_PROFILES encoding to use instead of
+                MP3 at ``bitrate``.
+        trim_silence: Remove leading silence and long pauses before encoding
+                (forces a re-encode).
+        source_probe: Result of probe_audio_stream() for ``video_path`` if the
+                caller already has it.
+    """
+    audio_path, _ = _extract_audio(
+        video_path, bitrate, stream_copy, profile, trim_silence, source_probe
+    )
     return audio_path
+
+
+@timed("extract_audio_artifact")
+def extract_audio_artifact(
+    video_path: Path,
+    stream_copy: bool = False,
+    profile: str | None = None,
+    trim_silence: bool = False,
+) -> dict:
+    """
+    Extract Gemini-ready audio and describe the result.
+
+    Returns a dict with ``path``, ``mime_type``, ``audio_hash`` (SHA-256 of
+    the file, computed while it was written), ``source_seconds`` (audio
+    length of the video), ``duration_seconds`` (length of the extracted
+    audio) and ``trimmed_seconds`` (audio removed by silence trimming, None
+    unless ``trim_silence``). Durations are None when ffprobe is unavailable.
+    """
+    source_probe = probe_audio_stream(video_path)
+    audio_path, audio_hash = _extract_audio(
+        video_path,
+        stream_copy=stream_copy,
+        profile=profile,
+        trim_silence=trim_silence,
+        source_probe=source_probe,
+    )
+
+    source_seconds = (source_probe or {}).get("duration")
+    duration_seconds = (probe_audio_stream(audio_path) or {}).get("duration")
+    # Without trimming, a length difference is only ADTS duration estimates
+    # or encoder padding, not removed silence.
+    trimmed_seconds = None
+    if trim_silence and source_seconds is not None and duration_seconds is not None:
+        trimmed_seconds = round(max(source_seconds - duration_seconds, 0.0), 2)
+
+    return {
+        "path": audio_path,
+        "mime_type": audio_mime_type(audio_path),
+        "audio_hash": audio_hash,
+        "source_seconds": source_seconds,
+        "duration_seconds": duration_seconds,
+        "trimmed_seconds": trimmed_seconds,
+    }
+
+
+def detect_silences(
+    audio_path: Path, noise: str = "-35dB", min_duration: float = 0.4
+) -> list[tuple[float, float]]:
+    """Return (start, end) seconds of every silence found by ffmpeg silencedetect."""
+    ffmpeg = get_ffmpeg_path()
+    command = [
+        ffmpeg,
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        str(audio_path),
+        "-af",
+        f"silencedetect=noise={noise}:d={min_duration}",
+        "-f",
+        "null",
+        "-",
+    ]
+    completed = _run_ffmpeg(command)
+
+    starts = re.findall(r"silence_start: (-?[\d.]+)", completed.stderr)
+    ends = re.findall(r"silence_end: (-?[\d.]+)", completed.stderr)
+    return [(float(start), float(end)) for start, end in zip(starts, ends)]
+
+
+def plan_segments(
+    duration: float,
+    silences: list[tuple[float, float]],
+    target_seconds: float = 60.0,
+    max_seconds: float = 90.0,
+) -> list[tuple[float, float]]:
+    """
+    Choose (start, end) segments of roughly ``target_seconds`` for ``duration``.
+
+    Cuts are placed in the middle of the silence closest to each target
+    boundary; a hard cut is used only when a stretch of ``max_seconds`` has
+    no silence at all.
+    """
+    candidates = sorted((start + end) / 2 for start, end in silences)
+    cuts: list[float] = []
+    start = 0.0
+    while duration - start > max_seconds:
+        ideal = start + target_seconds
+        earliest = start + target_seconds / 2
+        window = [c for c in candidates if earliest <= c <= start + max_seconds]
+        cut = min(window, key=lambda c: abs(c - ideal)) if window else ideal
+        cuts.append(cut)
+        start = cut
+
+    bounds = [0.0, *cuts, duration]
+    return list(zip(bounds, bounds[1:]))
+
+
+def split_audio_at_silence(
+    audio_path: Path,
+    duration: float,
+    target_seconds: float = 60.0,
+    max_seconds: float = 90.0,
+) -> list[tuple[Path, str | None]]:
+    """Split encoded audio into ordered segment files cut at silences.
+
+    Segments are stream-copied from ``audio_path`` (no re-encode) and written
+    next to it as ``<stem>_part<N><suffix>``. Returns (path, sha256) pairs,
+    each hashed while it was written; audio too short to split comes back as
+    ``[(audio_path, None)]``. Parts already written are removed if a later
+    split fails.
+    """
+    segments = plan_segments(
+        duration, detect_silences(audio_path), target_seconds, max_seconds
+    )
+    if len(segments) == 1:
+        return [(audio_path, None)]
+
+    ffmpeg = get_ffmpeg_path()
+    muxer = SEGMENT_MUXERS.get(audio_path.suffix.lower(), audio_path.suffix[1:])
+    parts = []
+    try:
+        for index, (start, end) in enumerate(segments):
+            part_path = audio_path.with_name(
+                f"{audio_path.stem}_part{index}{audio_path.suffix}"
+            )
+            digest = _run_ffmpeg_hashed(
+                [
+                    ffmpeg,
+                    "-y",
+                    "-ss",
+                    f"{start:.3f}",
+                    "-i",
+                    str(audio_path),
+                    "-t",
+                    f"{end - start:.3f}",
+                    "-c",
+                    "copy",
+                    "-f",
+                    muxer,
+                ],
+                part_path,
+            )
+            parts.append((part_path, digest))
+    except BaseException:
+        for part_path, _ in parts:
+            part_path.unlink(missing_ok=True)
+        raise
+    return parts
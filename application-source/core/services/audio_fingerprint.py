@@ -0,0 +1,217 @@
+"""Perceptual audio fingerprints for near-duplicate reel detection.
+
+Landmark hashing in the style of Shazam: find spectral peaks in the 16 kHz
+mono PCM, pair each peak with a few peaks shortly after it, and hash
+(freq1, freq2, time delta). Re-encodes, different containers, trims and
+overlays keep most landmarks, so reposts still match even though their
+exact ``audio_hash`` differs. Hashes live in an inverted index
+(``AudioFingerprint``); a match needs many hashes that agree on the same
+time offset, covering a large share of both reels' landmarks, and the two
+reels must be about as long. Reels that merely share a trending sound (a
+few seconds of the same music under different speech) do not match.
+"""
+
+import logging
+import subprocess
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+from django.db.models import Count, Max
+
+from core.models import AudioFingerprint, ReelInsight
+from core.services.audio_extractor import get_ffmpeg_path
+from core.services.ffmpeg_governor import GOVERNOR
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 1024  # 64 ms
+HOP_SIZE = 512  # 32 ms
+# Peak neighbourhood: a bin is a peak if it is the maximum of this window.
+PEAK_FREQ_NEIGHBOURHOOD = 15
+PEAK_TIME_NEIGHBOURHOOD = 7
+# Pair each anchor with up to FAN_OUT peaks within MAX_DELTA frames (~2s).
+FAN_OUT = 5
+MAX_DELTA = 63
+# Matching thresholds: hashes agreeing on one offset, absolute and relative
+# to the landmark count of the query and of the candidate, whichever is
+# larger. Audio mixed over the same music stays around 2%.
+MIN_ALIGNED_MATCHES = 25
+MIN_MATCH_RATIO = 0.05
+# Candidate and query lengths (last landmark) may differ by this share of
+# the longer one, e.g. a repost trimmed by a second or two.
+MAX_DURATION_DIFFERENCE = 0.1
+# Frames transformed at once, bounding the FFT's temporary arrays.
+SPECTROGRAM_CHUNK_FRAMES = 2048
+# Stay well under SQLite's bound-parameter limit.
+QUERY_BATCH_SIZE = 500
+
+
+def decode_pcm(media_path: Path) -> np.ndarray:
+    """Decode any media file to 16 kHz mono float32 samples using ffmpeg."""
+    command = [
+        get_ffmpeg_path(),
+        "-nostdin",
+        "-i",
+        str(media_path),
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-f",
+        "s16le",
+        "-threads",
+        str(GOVERNOR.threads),
+        "pipe:1",
+    ]
+    with GOVERNOR.slot():
+        completed = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg PCM decode failed\nSTDERR:\n{completed.stderr.decode(errors='replace')}"
+        )
+    return np.frombuffer(completed.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _spectrogram(samples: np.ndarray) -> np.ndarray:
+    """Float32 log-magnitude STFT with shape (frames, FRAME_SIZE // 2).
+
+    The Nyquist bin is dropped so every bin fits the 8 bits a landmark
+    gives it after halving. Frames are transformed in chunks so the
+    windowed copy and complex spectrum never cover the whole reel.
+    """
+    bins = FRAME_SIZE // 2
+    if len(samples) < FRAME_SIZE:
+        return np.empty((0, bins), dtype=np.float32)
+    samples = np.asarray(samples, dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    spectrogram = np.empty((len(frames), bins), dtype=np.float32)
+    for start in range(0, len(frames), SPECTROGRAM_CHUNK_FRAMES):
+        chunk = frames[start : start + SPECTROGRAM_CHUNK_FRAMES] * window
+        spectrum = np.abs(np.fft.rfft(chunk, axis=1)[:, :bins])
+        spectrogram[start : start + len(chunk)] = np.log1p(spectrum * 100.0)
+    return spectrogram
+
+
+def _sliding_max(values: np.ndarray, size: int, axis: int) -> np.ndarray:
+    """Maximum over a centred window of *size* along *axis*, edges padded."""
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (size // 2, size // 2)
+    padded = np.pad(values, pad, constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, size, axis=axis)
+    return windows.max(axis=-1)
+
+
+def _find_peaks(spectrogram: np.ndarray) -> list[tuple[int, int]]:
+    """Return (frame, bin) local maxima that stand out from the background."""
+    if spectrogram.size == 0:
+        return []
+    # A 2D maximum filter is separable: frequency first, then time.
+    local_max = _sliding_max(
+        _sliding_max(spectrogram, PEAK_FREQ_NEIGHBOURHOOD, axis=1),
+        PEAK_TIME_NEIGHBOURHOOD,
+        axis=0,
+    )
+    threshold = spectrogram.mean() + spectrogram.std()
+    frames, bins = np.nonzero((spectrogram == local_max) & (spectrogram > threshold))
+    return sorted(zip(frames.tolist(), bins.tolist()))
+
+
+def fingerprint_samples(samples: np.ndarray) -> list[tuple[int, int]]:
+    """Return (hash, anchor_frame) landmarks for PCM samples."""
+    peaks = _find_peaks(_spectrogram(samples))
+    landmarks = []
+    for index, (t1, f1) in enumerate(peaks):
+        paired = 0
+        for t2, f2 in peaks[index + 1 :]:
+            delta = t2 - t1
+            if delta > MAX_DELTA:
+                break
+            if delta == 0:
+                continue
+            # 8 bits per frequency (512 bins halved), 6 bits for the delta.
+            landmark = ((f1 >> 1) << 14) | ((f2 >> 1) << 6) | delta
+            landmarks.append((landmark, t1))
+            paired += 1
+            if paired == FAN_OUT:
+                break
+    return landmarks
+
+
+def fingerprint_file(media_path: Path) -> list[tuple[int, int]]:
+    """Decode *media_path* and return its (hash, anchor_frame) landmarks."""
+    return fingerprint_samples(decode_pcm(media_path))
+
+
+def find_near_duplicate(
+    landmarks: list[tuple[int, int]], exclude_id: int | None = None
+) -> ReelInsight | None:
+    """Return the processed insight whose audio best matches *landmarks*."""
+    if not landmarks:
+        return None
+
+    query_offsets: dict[int, list[int]] = defaultdict(list)
+    for landmark, offset in landmarks:
+        query_offsets[landmark].append(offset)
+
+    votes: Counter = Counter()
+    hashes = list(query_offsets)
+    for start in range(0, len(hashes), QUERY_BATCH_SIZE):
+        rows = AudioFingerprint.objects.filter(
+            hash__in=hashes[start : start + QUERY_BATCH_SIZE]
+        ).values_list("insight_id", "hash", "offset")
+        for insight_id, landmark, offset in rows:
+            if insight_id == exclude_id:
+                continue
+            for query_offset in query_offsets[landmark]:
+                votes[(insight_id, offset - query_offset)] += 1
+
+    if not votes:
+        return None
+
+    query_count = len(set(landmarks))
+    query_length = max(offset for _landmark, offset in landmarks)
+    checked = set()
+    for (insight_id, _delta), count in votes.most_common():
+        if count < max(MIN_ALIGNED_MATCHES, query_count * MIN_MATCH_RATIO):
+            return None
+        if insight_id in checked:
+            continue
+        checked.add(insight_id)
+        indexed = AudioFingerprint.objects.filter(insight_id=insight_id).aggregate(
+            count=Count("id"), length=Max("offset")
+        )
+        if count < indexed["count"] * MIN_MATCH_RATIO:
+            continue
+        longer = max(query_length, indexed["length"])
+        if abs(query_length - indexed["length"]) > longer * MAX_DURATION_DIFFERENCE:
+            continue
+        insight = ReelInsight.objects.filter(
+            pk=insight_id, processed_at__isnull=False
+        ).first()
+        if insight:
+            logger.info(
+                "Fingerprint match: insight %s (%d aligned landmarks)",
+                insight_id,
+                count,
+            )
+            return insight
+    return None
+
+
+def index_fingerprints(insight: ReelInsight, landmarks: list[tuple[int, int]]) -> int:
+    """Store *landmarks* for *insight* in the inverted index."""
+    unique = set(landmarks)
+    AudioFingerprint.objects.bulk_create(
+        [
+            AudioFingerprint(insight=insight, hash=landmark, offset=offset)
+            for landmark, offset in unique
+        ],
+        batch_size=1000,
+    )
+    return len(unique)
@@ -5,10 +5,13 @@ import logging
 from django.template.loader import render_to_string
 
 from .email_utils import attach_audio_if_small, build_daily_email
+from .metrics import timed
+from .pipeline_stages import stage
 
 logger = logging.getLogger(__name__)
 
 
+@timed("send_new_reel_email")
 def send_new_reel_email(insight, audio_path: str | None = None):
     """Notify subscribers when a new reel has been processed."""
     heading = insight.title or "New Reel Processed"
@@ -34,16 +37,18 @@ def send_new_reel_email(insight, audio_path: str | None = None):
         audio_attached = False
     logger.info("Audio attachment result: %s", audio_attached)
 
-    html_body = render_to_string(
-        "emails/reel_processed.html",
-        {
-            "insight": insight,
-            "heading": heading,
-            "triggers": triggers,
-            "audio_attached": audio_attached,
-        },
-    )
+    with stage("email_render"):
+        html_body = render_to_string(
+            "emails/reel_processed.html",
+            {
+                "insight": insight,
+                "heading": heading,
+                "triggers": triggers,
+                "audio_attached": audio_attached,
+            },
+        )
 
     email.attach_alternative(html_body, "text/html")
 
-    email.send()
+    with stage("email_send"):
+        email.send()
@@ -0,0 +1,117 @@
+"""Host-wide limit on concurrent ffmpeg processes.
+
+Every ffmpeg run takes a slot first. Slots are enforced inside a process by
+a semaphore and across gunicorn workers by ``flock``-ed slot files, so a
+burst of reels never oversubscribes a small VM. Queue wait and run times are
+tracked so the box can be sized from real numbers.
+"""
+
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.constants import FFMPEG_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIR = Path(tempfile.gettempdir()) / "trigger-engine-ffmpeg"
+
+
+def default_slots() -> int:
+    """One ffmpeg per CPU; audio encoding is effectively single-threaded."""
+    return max(1, os.cpu_count() or 1)
+
+
+class FfmpegGovernor:
+    """Counting semaphore for ffmpeg shared by threads and worker processes."""
+
+    def __init__(
+        self,
+        slots: int | None = None,
+        lock_dir: Path = LOCK_DIR,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.slots = slots or default_slots()
+        # Split the CPUs between the slots that can run at once.
+        self.threads = max(1, (os.cpu_count() or 1) // self.slots)
+        self.lock_dir = lock_dir
+        self.poll_interval = poll_interval
+        self._semaphore = threading.BoundedSemaphore(self.slots)
+        self._stats_lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._runs = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def _acquire_file_slot(self) -> int:
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        while True:
+            for index in range(self.slots):
+                path = self.lock_dir / f"slot-{index}.lock"
+                fd = os.open(path, os.O_CREAT | os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            time.sleep(self.poll_interval)
+
+    @contextmanager
+    def slot(self):
+        """Block until an ffmpeg slot is free, then hold it for the block."""
+        queued_at = time.perf_counter()
+        with self._stats_lock:
+            self._waiting += 1
+        try:
+            self._semaphore.acquire()
+            try:
+                fd = self._acquire_file_slot()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            with self._stats_lock:
+                self._waiting -= 1
+
+        started_at = time.perf_counter()
+        wait = started_at - queued_at
+        with self._stats_lock:
+            self._active += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            self._semaphore.release()
+            elapsed = time.perf_counter() - started_at
+            with self._stats_lock:
+                self._active -= 1
+                self._runs += 1
+                self._run_total += elapsed
+            logger.debug("ffmpeg slot: waited %.3fs, ran %.3fs", wait, elapsed)
+
+    def stats(self) -> dict:
+        """Snapshot of slot usage, queue wait and encode time in this process."""
+        with self._stats_lock:
+            return {
+                "slots": self.slots,
+                "threads": self.threads,
+                "active": self._active,
+                "waiting": self._waiting,
+                "runs": self._runs,
+                "wait_seconds_total": round(self._wait_total, 3),
+                "wait_seconds_max": round(self._wait_max, 3),
+                "run_seconds_total": round(self._run_total, 3),
+            }
+
+
+GOVERNOR = FfmpegGovernor(slots=FFMPEG_MAX_CONCURRENCY or None)
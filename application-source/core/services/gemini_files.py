@@ -0,0 +1,94 @@
+"""Gemini Files API uploads cached per audio hash.
+
+Large audio is uploaded once and referenced by URI instead of being
+base64-encoded into every request. Files live for 48 hours and belong to the
+API key's project, so the cache is keyed by (audio_hash, key) and an upload
+is reused for retries and re-analysis on the same key until it expires.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.models import GeminiFileUpload
+from core.services.audio_extractor import audio_mime_type
+from core.services.gemini_key_manager import key_id
+
+logger = logging.getLogger(__name__)
+
+# Used when the API does not report an expiration time.
+FILE_LIFETIME = timedelta(hours=47)
+# Never hand out a file that may expire before the request finishes.
+EXPIRY_MARGIN = timedelta(minutes=10)
+PROCESSING_TIMEOUT_SECONDS = 60.0
+PROCESSING_POLL_SECONDS = 1.0
+
+
+def _state_name(uploaded) -> str:
+    state = getattr(uploaded, "state", None)
+    return str(getattr(state, "name", state) or "")
+
+
+def _wait_until_active(client, uploaded):
+    deadline = time.monotonic() + PROCESSING_TIMEOUT_SECONDS
+    while _state_name(uploaded) == "PROCESSING":
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Gemini file {uploaded.name} still processing")
+        time.sleep(PROCESSING_POLL_SECONDS)
+        uploaded = client.files.get(name=uploaded.name)
+    if _state_name(uploaded) == "FAILED":
+        raise RuntimeError(f"Gemini file {uploaded.name} failed processing")
+    return uploaded
+
+
+def get_uploaded_audio(client, api_key: str, audio_path: str, audio_hash: str):
+    """Return a cached, unexpired upload for this key, uploading if needed."""
+    now = timezone.now()
+    GeminiFileUpload.objects.filter(expires_at__lte=now).delete()
+
+    cached = GeminiFileUpload.objects.filter(
+        audio_hash=audio_hash,
+        key_id=key_id(api_key),
+        expires_at__gt=now + EXPIRY_MARGIN,
+    ).first()
+    if cached:
+        logger.info("Reusing Gemini upload %s", cached.file_name)
+        return cached
+
+    mime_type = audio_mime_type(audio_path)
+    uploaded = client.files.upload(file=audio_path, config={"mime_type": mime_type})
+    uploaded = _wait_until_active(client, uploaded)
+    logger.info("Uploaded %s to Gemini as %s", audio_path, uploaded.name)
+
+    keys = {"audio_hash": audio_hash, "key_id": key_id(api_key)}
+    values = {
+        "file_name": uploaded.name,
+        "file_uri": uploaded.uri,
+        "mime_type": uploaded.mime_type or mime_type,
+        "expires_at": uploaded.expiration_time or now + FILE_LIFETIME,
+    }
+    # Insert first and only update on a conflict, like response_cache.store:
+    # long reels upload from several segment threads at once, and on SQLite
+    # update_or_create's read-then-write fails with "database is locked".
+    try:
+        with transaction.atomic():
+            return GeminiFileUpload.objects.create(**keys, **values)
+    except IntegrityError:
+        # An expiring upload, or one a concurrent segment just cached.
+        GeminiFileUpload.objects.filter(**keys).update(**values)
+        return GeminiFileUpload.objects.get(**keys)
+
+
+def file_part(upload: GeminiFileUpload) -> dict:
+    """Content part referencing an uploaded file."""
+    return {"file_data": {"file_uri": upload.file_uri, "mime_type": upload.mime_type}}
+
+
+def forget_upload(api_key: str, audio_hash: str) -> None:
+    """Drop a cached upload, e.g. after the API rejected its URI."""
+    GeminiFileUpload.objects.filter(
+        audio_hash=audio_hash, key_id=key_id(api_key)
+    ).delete()
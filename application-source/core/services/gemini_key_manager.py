@@ -1,67 +1,539 @@
-"""Shared helper for rotating Gemini API keys."""
+"""Shared helper for scheduling Gemini API keys.
 
+Rotation position, cooldowns, disabled keys and per-key quota buckets live in
+a small SQLite file (``GEMINI_KEY_STATE_PATH``) rather than in instance
+dicts, so every module, thread and gunicorn worker on the host sees the same
+quota picture: a key cooled down by the transcriber is skipped by post
+extraction and by every other process. Keys are stored only as short digests.
+
+Each request is charged against RPM/TPM/RPD token buckets and sent to the
+key with the most headroom, so keys stay under their limits instead of
+being benched after a 429. Gemini quotas are per project and model, so every
+(key, model) pair has its own buckets, sized by GEMINI_MODEL_BUDGETS.
+Cooldowns still apply when the API rejects a request, using its retryDelay
+hint when present. A key rejected as invalid is disabled for
+GEMINI_KEY_DISABLE_SECONDS, so a key fixed or re-enabled in the console comes
+back on its own; ``manage.py gemini_keys --enable`` clears it sooner.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
 import time
-from typing import Iterable
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable
+
+from core.constants import (
+    GEMINI_API_KEYS,
+    GEMINI_BASE_URL,
+    GEMINI_KEY_DISABLE_SECONDS,
+    GEMINI_KEY_RPD,
+    GEMINI_KEY_RPM,
+    GEMINI_KEY_STATE_PATH,
+    GEMINI_KEY_TPM,
+    GEMINI_MAX_IN_FLIGHT,
+    GEMINI_MODEL_BUDGETS,
+    GEMINI_QUOTA_MAX_WAIT_SECONDS,
+)
+from core.services.tracing import span
+
+if TYPE_CHECKING:
+    from google import genai
+
+# Used when a 429 carries no retryDelay. Budgets keep keys under their
+# limits, so a rejection means a short burst rather than a spent day.
+DEFAULT_COOLDOWN_SECONDS = 60
+
+RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s")
+
+# Every live manager, so pooled clients can be dropped after a fork.
+_MANAGERS: "weakref.WeakSet[GeminiKeyManager]" = weakref.WeakSet()
+
+
+def key_id(api_key: str) -> str:
+    """Stable, non-secret identifier for an API key."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class KeyBudget:
+    """Per-key quota: requests/minute, input tokens/minute, requests/day."""
+
+    rpm: int = GEMINI_KEY_RPM
+    tpm: int = GEMINI_KEY_TPM
+    rpd: int = GEMINI_KEY_RPD
+
+    def __post_init__(self) -> None:
+        if min(self.rpm, self.tpm, self.rpd) <= 0:
+            raise ValueError("Gemini key budgets must be positive.")
+
+    def capacities(self) -> tuple[float, float, float]:
+        return (float(self.rpm), float(self.tpm), float(self.rpd))
+
+    def refill_rates(self) -> tuple[float, float, float]:
+        """Units regained per second for each bucket."""
+        return (self.rpm / 60.0, self.tpm / 60.0, self.rpd / 86400.0)
+
+
+def _model_name(model: str) -> str:
+    return model.removeprefix("models/")
+
+
+def parse_model_budgets(spec: str) -> dict[str, KeyBudget]:
+    """Budgets from ``"model=rpm/tpm/rpd,..."``, keyed without ``models/``."""
+    budgets = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, limits = entry.partition("=")
+        try:
+            rpm, tpm, rpd = (int(limit) for limit in limits.split("/"))
+        except ValueError:
+            raise ValueError(
+                f"GEMINI_MODEL_BUDGETS entry {entry!r} is not model=rpm/tpm/rpd"
+            ) from None
+        budgets[_model_name(model.strip())] = KeyBudget(rpm=rpm, tpm=tpm, rpd=rpd)
+    return budgets
+
+
+class KeyStateStore:
+    """Cross-process key state in a SQLite file.
+
+    Each operation opens a short-lived connection and runs in a
+    ``BEGIN IMMEDIATE`` transaction, which takes SQLite's write lock up front
+    so concurrent read-modify-write rotations from other processes serialize.
+    A thread lock does the same cheaply within a process.
+
+    Besides cooldowns, each key has three token buckets (RPM, TPM, RPD) per
+    model that refill continuously; picking a key for a model spends from
+    that model's buckets.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0) -> None:
+        self.path = str(path)
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._ready_path: str | None = None
+
+    @contextmanager
+    def transaction(self):
+        """Yield a connection holding the database write lock."""
+        with self._lock:
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None
+            )
+            try:
+                if self._ready_path != self.path:
+                    self._create_tables(conn)
+                    self._ready_path = self.path
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection) -> None:
+        # ``disabled`` is the epoch time the key stays disabled until; the
+        # 1 written by older versions has long expired.
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS key_state ("
+            " key_id TEXT PRIMARY KEY,"
+            " cooldown_until REAL NOT NULL DEFAULT 0,"
+            " disabled REAL NOT NULL DEFAULT 0)"
+        )
+        # No row until a key is first used for a model (i.e. full buckets).
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS key_budget ("
+            " key_id TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " rpm_level REAL NOT NULL,"
+            " tpm_level REAL NOT NULL,"
+            " rpd_level REAL NOT NULL,"
+            " refilled_at REAL NOT NULL,"
+            " PRIMARY KEY (key_id, model))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rotation ("
+            " pool_id TEXT PRIMARY KEY,"
+            " next_index INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    @staticmethod
+    def _levels(row, budget: KeyBudget, now: float) -> list[float]:
+        capacities = budget.capacities()
+        if row is None:
+            return list(capacities)
+        elapsed = max(0.0, now - row[3])
+        return [
+            min(capacity, level + rate * elapsed)
+            for capacity, level, rate in zip(
+                capacities, row[:3], budget.refill_rates()
+            )
+        ]
+
+    def pick(
+        self,
+        key_ids: list[str],
+        pool_id: str,
+        now: float,
+        tokens: int = 0,
+        budget: KeyBudget | None = None,
+        model: str = "",
+    ) -> tuple[int | None, float | None]:
+        """Spend *model*'s budget on the key with the most headroom for it.
+
+        Returns (index, None) on success, or (None, seconds) until some key
+        could serve the request; seconds is None if every key is disabled.
+        Ties go to the next key in rotation order.
+        """
+        budget = budget or KeyBudget()
+        capacities = budget.capacities()
+        # A request larger than a whole minute of TPM can only wait for a full bucket.
+        need = (1.0, float(min(tokens, budget.tpm)), 1.0)
+
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT next_index FROM rotation WHERE pool_id = ?", (pool_id,)
+            ).fetchone()
+            start = row[0] if row else 0
+            rows = {
+                state[0]: state
+                for state in conn.execute(
+                    "SELECT key_id, cooldown_until, disabled FROM key_state"
+                )
+            }
+            buckets = {
+                kid: levels
+                for kid, *levels in conn.execute(
+                    "SELECT key_id, rpm_level, tpm_level, rpd_level, refilled_at"
+                    " FROM key_budget WHERE model = ?",
+                    (model,),
+                )
+            }
+
+            best = None
+            waits = []
+            for offset in range(len(key_ids)):
+                index = (start + offset) % len(key_ids)
+                state = rows.get(key_ids[index])
+                if state and now < state[2]:
+                    continue
+                if state and now < state[1]:
+                    waits.append(state[1] - now)
+                    continue
+
+                levels = self._levels(buckets.get(key_ids[index]), budget, now)
+                shortfall = [max(0.0, n - level) for n, level in zip(need, levels)]
+                if any(shortfall):
+                    waits.append(
+                        max(s / rate for s, rate in zip(shortfall, budget.refill_rates()))
+                    )
+                    continue
+
+                headroom = min(
+                    (level - n) / capacity
+                    for level, n, capacity in zip(levels, need, capacities)
+                )
+                if best is None or headroom > best[0]:
+                    best = (headroom, index, levels)
 
-from google import genai
+            if best is None:
+                return None, min(waits) if waits else None
 
-from core.constants import GEMINI_API_KEYS
+            _, index, levels = best
+            spent = [level - n for level, n in zip(levels, need)]
+            conn.execute(
+                "INSERT INTO key_budget"
+                " (key_id, model, rpm_level, tpm_level, rpd_level, refilled_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(key_id, model) DO UPDATE SET"
+                " rpm_level = excluded.rpm_level, tpm_level = excluded.tpm_level,"
+                " rpd_level = excluded.rpd_level, refilled_at = excluded.refilled_at",
+                (key_ids[index], model, *spent, now),
+            )
+            conn.execute(
+                "INSERT INTO rotation (pool_id, next_index) VALUES (?, ?)"
+                " ON CONFLICT(pool_id) DO UPDATE SET next_index = excluded.next_index",
+                (pool_id, (index + 1) % len(key_ids)),
+            )
+            return index, None
 
-DEFAULT_COOLDOWN_SECONDS = 60 * 60  # 1 hour
+    def set_cooldown(self, kid: str, until: float) -> None:
+        """Bench a key until the given epoch time."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO key_state (key_id, cooldown_until) VALUES (?, ?)"
+                " ON CONFLICT(key_id) DO UPDATE SET cooldown_until = excluded.cooldown_until",
+                (kid, until),
+            )
+
+    def disable(self, kid: str, until: float) -> None:
+        """Mark a key as unusable until the given epoch time."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO key_state (key_id, disabled) VALUES (?, ?)"
+                " ON CONFLICT(key_id) DO UPDATE SET disabled = excluded.disabled",
+                (kid, until),
+            )
+
+    def enable(self, kids: Iterable[str] | None = None) -> int:
+        """Clear disables and cooldowns of *kids* (all keys if None)."""
+        with self.transaction() as conn:
+            if kids is None:
+                cursor = conn.execute(
+                    "UPDATE key_state SET disabled = 0, cooldown_until = 0"
+                )
+            else:
+                cursor = conn.executemany(
+                    "UPDATE key_state SET disabled = 0, cooldown_until = 0"
+                    " WHERE key_id = ?",
+                    [(kid,) for kid in kids],
+                )
+            return cursor.rowcount
+
+    def snapshot(self) -> dict[str, dict]:
+        """Current state per key id and its buckets per model, for diagnostics."""
+        with self.transaction() as conn:
+            state = {
+                kid: {
+                    "cooldown_until": cooldown_until,
+                    "disabled_until": disabled_until,
+                    "budgets": {},
+                }
+                for kid, cooldown_until, disabled_until in conn.execute(
+                    "SELECT key_id, cooldown_until, disabled FROM key_state"
+                )
+            }
+            for kid, model, rpm_level, tpm_level, rpd_level, refilled_at in (
+                conn.execute(
+                    "SELECT key_id, model, rpm_level, tpm_level, rpd_level,"
+                    " refilled_at FROM key_budget"
+                )
+            ):
+                key_state = state.setdefault(
+                    kid, {"cooldown_until": 0, "disabled_until": 0, "budgets": {}}
+                )
+                key_state["budgets"][model] = {
+                    "rpm_level": rpm_level,
+                    "tpm_level": tpm_level,
+                    "rpd_level": rpd_level,
+                    "refilled_at": refilled_at,
+                }
+            return state
+
+
+KEY_STATE = KeyStateStore(GEMINI_KEY_STATE_PATH)
+
+
+def retry_hint(error: Exception) -> dict[str, float]:
+    """Cooldown kwargs from a 429's RetryInfo, e.g. ``"retryDelay": "37s"``.
+
+    Returns ``{"seconds": 37.0}``, or ``{}`` when the error carries no hint.
+    """
+    match = RETRY_DELAY_RE.search(str(error))
+    return {"seconds": float(match.group(1))} if match else {}
 
 
 class GeminiKeyManager:
-    """Stateful manager for Gemini API key rotation and client pooling."""
+    """Gemini API key scheduling over shared state, with per-process client pooling."""
 
     def __init__(
         self,
         keys: Iterable[str] | None = None,
         cooldown_seconds: int = DEFAULT_COOLDOWN_SECONDS,
+        store: KeyStateStore | None = None,
+        budget: KeyBudget | None = None,
+        max_wait_seconds: float = GEMINI_QUOTA_MAX_WAIT_SECONDS,
+        base_url: str | None = None,
+        model_budgets: dict[str, KeyBudget] | None = None,
     ) -> None:
         raw_keys = list(keys) if keys is not None else list(GEMINI_API_KEYS)
         self._keys: list[str] = [key for key in raw_keys if key]
         if not self._keys:
             raise RuntimeError("No Gemini API keys configured.")
-        self._index = 0
+        self._key_ids = [key_id(key) for key in self._keys]
+        # Managers over the same key set share one rotation position.
+        self._pool_id = key_id(",".join(self._key_ids))
         self.cooldown_seconds = cooldown_seconds
-        self._cooldowns: dict[str, float] = {key: 0.0 for key in self._keys}
+        self.store = store or KEY_STATE
+        # Models without an entry in model_budgets get the default budget.
+        self.budget = budget or KeyBudget()
+        self.model_budgets = (
+            parse_model_budgets(GEMINI_MODEL_BUDGETS)
+            if model_budgets is None
+            else model_budgets
+        )
+        self.max_wait_seconds = max_wait_seconds
+        # API endpoint for new clients; empty means Google's.
+        self.base_url = GEMINI_BASE_URL if base_url is None else base_url
         # Client pool: key -> Client instance
-        self._clients: dict[str, genai.Client] = {}
+        self._clients: dict[str, "genai.Client"] = {}
+        self._lock = threading.Lock()
+        _MANAGERS.add(self)
 
     @property
     def key_count(self) -> int:
         """Return how many keys are managed."""
         return len(self._keys)
 
-    def get_client(self) -> tuple[str, genai.Client]:
-        """Return (api_key, Client) for the next available key, pooling instances."""
-        now = time.time()
-        checked = 0
+    def budget_for(self, model: str) -> KeyBudget:
+        """Per-key budget of *model*."""
+        return self.model_budgets.get(_model_name(model), self.budget)
+
+    def get_client(
+        self, tokens: int = 0, exclude: Iterable[str] = (), model: str = ""
+    ) -> tuple[str, "genai.Client"]:
+        """Return (api_key, Client) for the key with the most quota headroom.
 
-        while checked < len(self._keys):
-            key = self._keys[self._index]
-            self._index = (self._index + 1) % len(self._keys)
-            checked += 1
+        Args:
+            tokens: Estimated input tokens of the request (see
+                    gemini_request.estimate_tokens), charged to the key's TPM.
+            exclude: Keys not to use, e.g. the one a hedged request is on.
+            model: Model the request is for; each model has its own budget.
 
-            if now >= self._cooldowns[key]:
-                if key not in self._clients:
-                    self._clients[key] = genai.Client(api_key=key)
-                return key, self._clients[key]
+        Waits up to max_wait_seconds for budget to refill before giving up.
+        """
+        # google-genai is slow to import; defer it until a client is needed.
+        from google import genai
 
-        raise RuntimeError("All Gemini API keys are exhausted. Please retry later.")
+        keys, key_ids, pool_id = self._keys, self._key_ids, self._pool_id
+        excluded = set(exclude)
+        if excluded:
+            keys = [key for key in self._keys if key not in excluded]
+            if not keys:
+                raise RuntimeError("No other Gemini API key is available.")
+            key_ids = [key_id(key) for key in keys]
+            pool_id = key_id(",".join(key_ids))
+
+        budget = self.budget_for(model)
+        deadline = time.monotonic() + self.max_wait_seconds
+        while True:
+            index, wait = self.store.pick(
+                key_ids, pool_id, time.time(), tokens, budget, _model_name(model)
+            )
+            if index is not None:
+                break
+            if wait is None or time.monotonic() + wait > deadline:
+                raise RuntimeError(
+                    "All Gemini API keys are exhausted. Please retry later."
+                )
+            with span("gemini_key_wait", seconds=round(wait, 2)):
+                time.sleep(wait)
+
+        key = keys[index]
+        with self._lock:
+            if key not in self._clients:
+                options = (
+                    {"http_options": {"base_url": self.base_url}} if self.base_url else {}
+                )
+                self._clients[key] = genai.Client(api_key=key, **options)
+            return key, self._clients[key]
 
     def next_key(self) -> str:
         """Legacy helper - preferred to use get_client() for session reuse."""
         key, _ = self.get_client()
         return key
 
-    def cooldown_key(self, key: str) -> None:
-        """Put a key on cooldown for the configured duration."""
-        self._cooldowns[key] = time.time() + self.cooldown_seconds
-        # Optionally drop client on error? Usually better to keep if it's just quota
-        # If it's INVALID_KEY, disable_key will handle it
+    def cooldown_key(self, key: str, seconds: float | None = None) -> None:
+        """Bench a key for *seconds* (e.g. a retry_hint()) or the default."""
+        duration = self.cooldown_seconds if seconds is None else seconds
+        self.store.set_cooldown(key_id(key), time.time() + duration)
+
+    def disable_key(self, key: str, seconds: float | None = None) -> None:
+        """Disable a key for *seconds* (default GEMINI_KEY_DISABLE_SECONDS)."""
+        duration = GEMINI_KEY_DISABLE_SECONDS if seconds is None else seconds
+        self.store.disable(key_id(key), time.time() + duration)
+        with self._lock:
+            self._clients.pop(key, None)
+
+    def reset_clients(self) -> None:
+        """Drop pooled clients; they are re-created lazily on next use."""
+        self._clients.clear()
+
+
+class AsyncGeminiKeyManager:
+    """Awaitable front end over a GeminiKeyManager for ``client.aio`` calls.
+
+    Rotation, cooldowns and the client pool stay in the wrapped manager, so
+    sync and async callers share one quota picture. Each event loop gets a
+    semaphore capping how many requests it keeps in flight.
+    """
+
+    def __init__(self, manager: GeminiKeyManager, max_in_flight: int = 32) -> None:
+        self.manager = manager
+        self.max_in_flight = max_in_flight
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def key_count(self) -> int:
+        """Return how many keys are managed."""
+        return self.manager.key_count
+
+    def in_flight_limit(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent requests on the running loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+        return semaphore
+
+    async def get_client(
+        self, tokens: int = 0, model: str = ""
+    ) -> tuple[str, "genai.Client"]:
+        """Return (api_key, Client); use ``client.aio`` for requests."""
+        # Scheduling is a short SQLite transaction but may wait for budget to
+        # refill; run it off the loop so other requests keep going.
+        return await asyncio.to_thread(
+            self.manager.get_client, tokens, model=model
+        )
+
+    async def cooldown_key(self, key: str, seconds: float | None = None) -> None:
+        """Bench a key for *seconds* or the configured default."""
+        await asyncio.to_thread(self.manager.cooldown_key, key, seconds)
+
+    async def disable_key(self, key: str) -> None:
+        """Disable a key for GEMINI_KEY_DISABLE_SECONDS."""
+        await asyncio.to_thread(self.manager.disable_key, key)
+
+
+_default_manager: GeminiKeyManager | None = None
+_default_async_manager: AsyncGeminiKeyManager | None = None
+_default_lock = threading.Lock()
+
+
+def default_key_manager() -> GeminiKeyManager:
+    """The process-wide manager shared by every Gemini service module."""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = GeminiKeyManager()
+        return _default_manager
+
+
+def default_async_key_manager() -> AsyncGeminiKeyManager:
+    """Async front end over default_key_manager()."""
+    global _default_async_manager
+    manager = default_key_manager()
+    with _default_lock:
+        if _default_async_manager is None:
+            _default_async_manager = AsyncGeminiKeyManager(manager, GEMINI_MAX_IN_FLIGHT)
+        return _default_async_manager
+
+
+def _reset_clients_after_fork() -> None:
+    """Forked workers must not share the parent's HTTP connection pools."""
+    for manager in list(_MANAGERS):
+        manager.reset_clients()
+
 
-    def disable_key(self, key: str) -> None:
-        """Disable a key permanently."""
-        self._cooldowns[key] = float("inf")
-        self._clients.pop(key, None)
+os.register_at_fork(after_in_child=_reset_clients_after_fork)
@@ -0,0 +1,53 @@
+"""Shared request builder for Gemini generate_content calls.
+
+Media is passed as raw bytes. The SDK base64-encodes inline data itself when
+it serializes the request, so encoding here would only add a bytes copy and
+a str copy that the SDK immediately decodes again.
+
+estimate_tokens() sizes a request for the key scheduler's TPM budget.
+"""
+
+from core.services.audio_extractor import audio_mime_type
+
+# Gemini bills audio at 32 tokens/second and a (small) image at 258 tokens.
+AUDIO_TOKENS_PER_SECOND = 32
+IMAGE_TOKENS = 258
+# Default mp3_64k audio is ~8 kB/s; lower-bitrate profiles over-estimate,
+# which only makes scheduling more conservative.
+AUDIO_BYTES_PER_SECOND = 8000
+CHARS_PER_TOKEN = 4
+
+
+def inline_part(data: bytes, mime_type: str) -> dict:
+    """Inline media part; *data* must be raw (not base64) bytes."""
+    return {"inline_data": {"mime_type": mime_type, "data": data}}
+
+
+def audio_part(audio_path: str) -> dict:
+    """Inline part for an audio file, typed from its extension."""
+    with open(audio_path, "rb") as f:
+        data = f.read()
+    return inline_part(data, audio_mime_type(audio_path))
+
+
+def user_contents(parts: list[dict]) -> list[dict]:
+    """Wrap parts in the single user turn both pipelines send."""
+    return [{"role": "user", "parts": parts}]
+
+
+def estimate_tokens(parts: list[dict], audio_bytes: int = 0) -> int:
+    """Rough input-token count for parts plus audio sent by reference."""
+    tokens = AUDIO_TOKENS_PER_SECOND * audio_bytes / AUDIO_BYTES_PER_SECOND
+    for part in parts:
+        if "text" in part:
+            tokens += len(part["text"]) / CHARS_PER_TOKEN
+        inline = part.get("inline_data")
+        if not inline:
+            continue
+        if inline["mime_type"].startswith("image/"):
+            tokens += IMAGE_TOKENS
+        else:
+            tokens += (
+                AUDIO_TOKENS_PER_SECOND * len(inline["data"]) / AUDIO_BYTES_PER_SECOND
+            )
+    return int(tokens)
@@ -0,0 +1,142 @@
+"""Circuit breakers and request hedging for Gemini calls.
+
+A ``CircuitBreaker`` opens for a name (an API key id or a model) after
+GEMINI_BREAKER_THRESHOLD consecutive errors or timeouts, rejects it for
+GEMINI_BREAKER_OPEN_SECONDS, then lets a single trial call through
+(half-open) while still rejecting concurrent callers: success closes it,
+another failure re-opens it.
+
+``hedged()`` runs a call and, if it has not finished after a delay, starts
+a duplicate (on another key) and returns whichever succeeds first, so one
+stalled connection does not set the request's latency.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TypeVar
+
+from core.constants import GEMINI_BREAKER_OPEN_SECONDS, GEMINI_BREAKER_THRESHOLD
+from core.services.gemini_key_manager import GeminiKeyManager, key_id
+from core.services.tracing import in_current_trace
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker over named targets."""
+
+    def __init__(
+        self,
+        threshold: int = GEMINI_BREAKER_THRESHOLD,
+        open_seconds: float = GEMINI_BREAKER_OPEN_SECONDS,
+    ) -> None:
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._failures: dict[str, int] = {}
+        self._open_until: dict[str, float] = {}
+
+    def allow(self, name: str) -> bool:
+        """True when *name* is closed, or for the one caller taking its trial."""
+        with self._lock:
+            open_until = self._open_until.get(name)
+            if open_until is None:
+                return True
+            now = time.monotonic()
+            if now < open_until:
+                return False
+            # Half-open: this caller makes the trial call. Everyone else is
+            # rejected until it is recorded, or for another open period if it
+            # never is (e.g. it failed with a client error).
+            self._open_until[name] = now + self.open_seconds
+            return True
+
+    def record_success(self, name: str) -> None:
+        with self._lock:
+            self._failures.pop(name, None)
+            self._open_until.pop(name, None)
+
+    def record_failure(self, name: str) -> bool:
+        """Count a failure; return True when this opens the breaker."""
+        with self._lock:
+            failures = self._failures.get(name, 0) + 1
+            self._failures[name] = failures
+            if failures < self.threshold:
+                return False
+            self._open_until[name] = time.monotonic() + self.open_seconds
+        logger.warning(
+            "Gemini circuit open for %s after %d consecutive failures",
+            name,
+            failures,
+        )
+        return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures.clear()
+            self._open_until.clear()
+
+
+KEY_BREAKER = CircuitBreaker()
+
+
+def report_key_success(api_key: str) -> None:
+    KEY_BREAKER.record_success(key_id(api_key))
+
+
+def report_key_failure(
+    manager: GeminiKeyManager, api_key: str, error: Exception
+) -> None:
+    """Count a timeout/server error; bench the key once its breaker opens."""
+    kid = key_id(api_key)
+    logger.warning("Gemini request failed on key %s: %s", kid, error)
+    if KEY_BREAKER.record_failure(kid):
+        manager.cooldown_key(api_key, KEY_BREAKER.open_seconds)
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for 5xx responses, timeouts and connection failures.
+
+    These say nothing about the request itself, so it is worth retrying on
+    another key.
+    """
+    # Both are slow to import; this module is also loaded by the health check.
+    import requests
+    from google.genai.errors import ServerError
+
+    return isinstance(error, (ServerError, requests.exceptions.RequestException))
+
+
+def hedged(primary: Callable[[], T], hedge: Callable[[], T], delay: float) -> T:
+    """Return primary(), starting hedge() too if primary is slower than *delay*.
+
+    The first call to succeed wins; the other is left to finish in the
+    background and its result is dropped. When both fail, primary's error is
+    raised.
+    """
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini-hedge")
+    try:
+        first = pool.submit(in_current_trace(primary))
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        logger.info("Gemini request still running after %.2fs; hedging", delay)
+        pending = {first, pool.submit(in_current_trace(hedge))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                if future is not first:
+                    logger.warning(
+                        "Hedged Gemini request failed", exc_info=future.exception()
+                    )
+        return first.result()
+    finally:
+        pool.shutdown(wait=False)
@@ -0,0 +1,88 @@
+"""Response schemas for Gemini structured output.
+
+Each model is passed as ``response_schema`` together with
+``response_mime_type="application/json"``, so the API constrains decoding to
+the schema and the SDK validates the reply into ``response.parsed``. Fields
+carry no defaults: the Gemini API rejects ``default`` in schemas, and
+required fields make the model always emit them.
+"""
+
+import logging
+
+from pydantic import BaseModel, ValidationError
+
+from core.utils import parse_first_json
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionResult(BaseModel):
+    language: str
+    transcript_native: str
+    transcript_english: str
+    triggers: list[str]
+    title: str
+
+
+class SegmentResult(BaseModel):
+    language: str
+    transcript_native: str
+    transcript_english: str
+
+
+class SummaryResult(BaseModel):
+    triggers: list[str]
+    title: str
+
+
+class PostTextResult(BaseModel):
+    language: str
+    transcript_native: str
+    transcript_english: str
+    triggers: list[str]
+    title: str
+
+
+def json_config(
+    schema: type[BaseModel], timeout_seconds: float | None = None
+) -> dict:
+    """generate_content() config requesting JSON that matches *schema*.
+
+    timeout_seconds sets the request's HTTP deadline.
+    """
+    config = {"response_mime_type": "application/json", "response_schema": schema}
+    if timeout_seconds:
+        config["http_options"] = {"timeout": int(timeout_seconds * 1000)}
+    return config
+
+
+def parse_structured(
+    text: str, schema: type[BaseModel], parsed: object = None
+) -> dict | None:
+    """Return response *text* as a dict validated against *schema*.
+
+    *parsed* is the SDK's ``response.parsed``; when it is already a *schema*
+    instance the text is not decoded again. Text that is not bare JSON (e.g.
+    a model that wrapped its JSON in markdown) falls back to
+    parse_first_json(), and what that finds is validated too. Returns None
+    when no JSON object matching *schema* can be found.
+    """
+    if isinstance(parsed, schema):
+        return parsed.model_dump()
+
+    text = text.strip()
+    try:
+        return schema.model_validate_json(text).model_dump()
+    except ValidationError:
+        pass
+
+    fallback = parse_first_json(text)
+    if fallback is None:
+        return None
+    try:
+        return schema.model_validate(fallback).model_dump()
+    except ValidationError as e:
+        logger.warning(
+            "Gemini response did not match %s schema: %s", schema.__name__, e
+        )
+        return None
@@ -1,45 +1,77 @@
 """Gemini transcription helpers with rotating API keys."""
 
-import base64
+import asyncio
 import logging
+import os
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+from asgiref.sync import sync_to_async
 from google.genai.errors import ClientError
+from pydantic import BaseModel
 
-from core.constants import GEMINI_API_KEYS
-from core.services.gemini_key_manager import GeminiKeyManager
-from core.utils import parse_first_json
+from core.constants import (
+    GEMINI_API_KEYS,
+    GEMINI_FILES_API_MIN_BYTES,
+    GEMINI_HEDGE_ENABLED,
+    GEMINI_HEDGE_MIN_DELAY_SECONDS,
+    GEMINI_REQUEST_TIMEOUT_SECONDS,
+)
+from core.services.audio_extractor import split_audio_at_silence
+from core.services.gemini_files import file_part, forget_upload, get_uploaded_audio
+from core.services.gemini_key_manager import (
+    default_async_key_manager,
+    default_key_manager,
+    retry_hint,
+)
+from core.services.gemini_request import audio_part, estimate_tokens, user_contents
+from core.services.gemini_resilience import (
+    hedged,
+    is_transient,
+    report_key_failure,
+    report_key_success,
+)
+from core.services.gemini_schemas import (
+    SegmentResult,
+    SummaryResult,
+    TranscriptionResult,
+    json_config,
+    parse_structured,
+)
+from core.services.json_stream import IncrementalJSONObject
+from core.services.metrics import gemini_attempt
+from core.services.model_router import (
+    ROUTER,
+    InvalidOutputError,
+    is_truncated,
+    route_audio,
+)
+from core.services.response_cache import (
+    cached_response,
+    cached_response_async,
+    lookup,
+    store,
+)
+from core.services.tracing import in_current_trace
 
 logger = logging.getLogger(__name__)
 
 MODEL = "models/gemini-flash-lite-latest"
-KEY_MANAGER = GeminiKeyManager()
+# Shared with post_gemini so both see the same key rotation and cooldowns.
+KEY_MANAGER = default_key_manager()
+ASYNC_KEY_MANAGER = default_async_key_manager()
 
+# Cache keys for stored responses; bump when the matching prompt changes.
+TRANSCRIBE_PROMPT_VERSION = "transcribe-v1"
+LONG_PROMPT_VERSION = "segments-v1"
 
-def gemini_transcribe(audio_path: str) -> dict:
-    """
-    Returns:
-    {
-      "language": "hi" | "mr" | "en",
-      "transcript_native": "...",
-      "transcript_english": "..."
-    }
-    """
-
-    with open(audio_path, "rb") as f:
-        audio_b64 = base64.b64encode(f.read()).decode()
-
-    # Best-effort MIME type based on file extension
-    lower_path = audio_path.lower()
-    if lower_path.endswith(".mp3"):
-        mime_type = "audio/mpeg"
-    elif lower_path.endswith(".wav"):
-        mime_type = "audio/wav"
-    elif lower_path.endswith(".m4a"):
-        mime_type = "audio/mp4"
-    else:
-        mime_type = "application/octet-stream"
+# Segment sizes for gemini_transcribe_long().
+SEGMENT_TARGET_SECONDS = 60.0
+SEGMENT_MAX_SECONDS = 90.0
 
-    prompt = """
+TRANSCRIBE_PROMPT = """
 You are a behavioral coaching system and transcription engine.
 
 Tasks:
@@ -63,75 +95,539 @@ Output STRICT JSON only:
 }
 """
 
-    last_error = None
+SEGMENT_PROMPT = """
+You are a transcription engine. This audio is one part of a longer recording.
 
-    for _ in range(KEY_MANAGER.key_count):
-        api_key, client = KEY_MANAGER.get_client()
+Tasks:
+1. Detect spoken language (Hindi, Marathi, or English).
+2. Transcribe the ENTIRE audio word-for-word (verbatim) from start to finish. Do not summarize or truncate:
+   - If Hindi or Marathi: Output in DEVANAGARI script.
+   - Preserve English words if spoken.
+3. Provide a full and complete clean English translation of the entire transcript. Do not leave anything out.
 
-        try:
-            logger.info(
-                "Gemini transcription attempt",
-                extra={"key_index": GEMINI_API_KEYS.index(api_key)},
-            )
+Output STRICT JSON only:
+{
+  "language": "hi|mr|en",
+  "transcript_native": "...",
+  "transcript_english": "..."
+}
+"""
 
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=[
-                    {
-                        "role": "user",
-                        "parts": [
-                            {
-                                "inline_data": {
-                                    "mime_type": mime_type,
-                                    "data": audio_b64,
-                                }
-                            },
-                            {"text": prompt},
-                        ],
-                    }
-                ],
-            )
+SUMMARY_PROMPT = """
+You are a behavioral coaching system. Below is the English transcript of a short video.
+
+Tasks:
+1. Extract behavior triggers:
+   - Clear, actionable, short, and concrete.
+   - One trigger per line in the JSON array.
+2. Create a catchy title (max 5-6 words).
+
+Output STRICT JSON only:
+{
+  "triggers": ["...", "..."],
+  "title": "..."
+}
+
+Transcript:
+"""
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _parse_response(response, schema: type[BaseModel]) -> dict:
+    if is_truncated(response):
+        logger.error("Gemini response hit the output token limit")
+        raise InvalidOutputError("AI response was truncated. Please try again.")
+    return _parse_text(response.text, schema, getattr(response, "parsed", None))
+
+
+def _parse_text(text: str | None, schema: type[BaseModel], parsed=None) -> dict:
+    response_text = text.strip() if text else ""
+    if not response_text:
+        logger.error("Gemini returned empty response text")
+        raise InvalidOutputError("AI returned empty response. Please try again.")
+
+    parsed = parse_structured(response_text, schema, parsed)
+    if parsed:
+        return parsed
+
+    logger.error("Gemini returned non-JSON response: %s", response_text[:500])
+    raise InvalidOutputError("AI returned invalid JSON. Please try again.")
+
+
+def _classify_client_error(error: ClientError, api_key: str) -> str:
+    """Log a ClientError and return "quota", "invalid_key" or "fatal"."""
+    error_text = str(error)
+
+    # ---- QUOTA / RATE LIMIT ----
+    if "RESOURCE_EXHAUSTED" in error_text or "quota" in error_text.lower():
+        logger.warning(
+            "Gemini quota exceeded for key",
+            extra={"key_index": GEMINI_API_KEYS.index(api_key)},
+        )
+        return "quota"
+
+    # ---- INVALID KEY (disable for GEMINI_KEY_DISABLE_SECONDS) ----
+    if "API_KEY_INVALID" in error_text or "not valid" in error_text.lower() or "PERMISSION_DENIED" in error_text:
+        logger.error(
+            "Gemini API key invalid or permission denied",
+            extra={"key_index": GEMINI_API_KEYS.index(api_key)},
+        )
+        return "invalid_key"
+
+    # ---- other errors ----
+    logger.exception("Gemini processing failed")
+    return "fatal"
+
+
+def _estimate(parts: list[dict], audio_upload: tuple[str, str] | None) -> int:
+    audio_bytes = _file_size(audio_upload[0]) if audio_upload else 0
+    return estimate_tokens(parts, audio_bytes)
 
-            response_text = response.text.strip() if response.text else ""
-            if not response_text:
-                logger.error("Gemini returned empty response text")
-                raise RuntimeError("AI returned empty response. Please try again.")
-
-            parsed = parse_first_json(response_text)
-            if parsed:
-                return parsed
-            
-            logger.error(
-                "Gemini returned non-JSON response: %s", response_text[:500]
+
+def _stream_text(
+    client,
+    model: str,
+    contents: list[dict],
+    schema: type[BaseModel],
+    on_partial: Callable[[dict], None],
+) -> str:
+    """Stream a response, reporting top-level fields as they complete."""
+    parser = IncrementalJSONObject()
+    chunks = []
+    chunk = None
+    for chunk in client.models.generate_content_stream(
+        model=model,
+        contents=contents,
+        config=json_config(schema, GEMINI_REQUEST_TIMEOUT_SECONDS),
+    ):
+        text = chunk.text or ""
+        chunks.append(text)
+        if parser.feed(text):
+            try:
+                on_partial(dict(parser.fields))
+            except Exception:
+                logger.warning("Partial result callback failed", exc_info=True)
+    if chunk is not None and is_truncated(chunk):
+        logger.error("Gemini streamed response hit the output token limit")
+        raise InvalidOutputError("AI response was truncated. Please try again.")
+    return "".join(chunks)
+
+
+def _request_json(
+    api_key: str,
+    client,
+    parts: list[dict],
+    schema: type[BaseModel],
+    audio_upload: tuple[str, str] | None,
+    on_partial: Callable[[dict], None] | None,
+    model: str,
+) -> dict:
+    """One request on one key; see _generate_json() for the arguments."""
+    logger.info(
+        "Gemini transcription attempt",
+        extra={"key_index": GEMINI_API_KEYS.index(api_key)},
+    )
+
+    with gemini_attempt("transcribe", api_key, model):
+        request_parts = parts
+        if audio_upload:
+            upload = get_uploaded_audio(client, api_key, *audio_upload)
+            request_parts = [file_part(upload), *parts]
+
+        if on_partial:
+            text = _stream_text(
+                client, model, user_contents(request_parts), schema, on_partial
             )
-            raise RuntimeError("AI returned invalid JSON. Please try again.")
+            return _parse_text(text, schema)
+
+        response = client.models.generate_content(
+            model=model,
+            contents=user_contents(request_parts),
+            config=json_config(schema, GEMINI_REQUEST_TIMEOUT_SECONDS),
+        )
+        return _parse_response(response, schema)
+
+
+def _retry_after_client_error(
+    error: ClientError, api_key: str, audio_upload: tuple[str, str] | None
+) -> bool:
+    """Bench or disable the key as needed; True if another key may succeed."""
+    kind = _classify_client_error(error, api_key)
+    if kind == "quota":
+        KEY_MANAGER.cooldown_key(api_key, **retry_hint(error))
+        return True
+
+    # Any other rejection may mean the uploaded file is gone.
+    if audio_upload:
+        forget_upload(api_key, audio_upload[1])
 
+    if kind == "invalid_key":
+        KEY_MANAGER.disable_key(api_key)
+        return True
+    return False
+
+
+def _hedge_delay(model: str) -> float | None:
+    p95 = ROUTER.latency_percentile(model, 0.95)
+    if p95 is None:
+        return None
+    return max(GEMINI_HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+def _hedged_request(
+    api_key: str,
+    client,
+    tokens: int,
+    parts: list[dict],
+    schema: type[BaseModel],
+    audio_upload: tuple[str, str] | None,
+    model: str,
+) -> dict:
+    """_request_json(), duplicated on a second key if it runs past p95."""
+
+    def primary() -> dict:
+        return _request_json(
+            api_key, client, parts, schema, audio_upload, None, model
+        )
+
+    delay = _hedge_delay(model)
+    if delay is None or KEY_MANAGER.key_count < 2:
+        return primary()
+
+    def hedge() -> dict:
+        hedge_key, hedge_client = KEY_MANAGER.get_client(
+            tokens, exclude=[api_key], model=model
+        )
+        try:
+            result = _request_json(
+                hedge_key, hedge_client, parts, schema, audio_upload, None, model
+            )
         except ClientError as e:
-            error_text = str(e)
-            last_error = e
+            _retry_after_client_error(e, hedge_key, audio_upload)
+            raise
+        except Exception as e:
+            if is_transient(e):
+                report_key_failure(KEY_MANAGER, hedge_key, e)
+            raise
+        report_key_success(hedge_key)
+        return result
 
-            # ---- QUOTA / RATE LIMIT ----
-            if "RESOURCE_EXHAUSTED" in error_text or "quota" in error_text.lower():
-                logger.warning(
-                    "Gemini quota exceeded for key",
-                    extra={"key_index": GEMINI_API_KEYS.index(api_key)},
+    return hedged(primary, hedge, delay)
+
+
+def _generate_json(
+    parts: list[dict],
+    schema: type[BaseModel],
+    audio_upload: tuple[str, str] | None = None,
+    on_partial: Callable[[dict], None] | None = None,
+    model: str = MODEL,
+) -> dict:
+    """Send one request, rotating across keys on quota, key and server errors.
+
+    Each call has a GEMINI_REQUEST_TIMEOUT_SECONDS deadline; timeouts and 5xx
+    errors move on to the next key and count toward that key's circuit
+    breaker. With GEMINI_HEDGE_ENABLED, non-streamed requests are hedged.
+
+    Args:
+        parts: Content parts for the user turn.
+        schema: Structured-output schema the response must follow.
+        audio_upload: Optional (audio_path, audio_hash); the audio is sent as a
+                      Files API reference (uploaded once per key) ahead of parts.
+        on_partial: When given, the response is streamed and this is called
+                    with the fields completed so far each time one finishes.
+        model: Gemini model to call (see model_router).
+    """
+    last_error = None
+    tokens = _estimate(parts, audio_upload)
+
+    for _ in range(KEY_MANAGER.key_count):
+        api_key, client = KEY_MANAGER.get_client(tokens, model=model)
+
+        try:
+            if GEMINI_HEDGE_ENABLED and not on_partial:
+                result = _hedged_request(
+                    api_key, client, tokens, parts, schema, audio_upload, model
                 )
-                KEY_MANAGER.cooldown_key(api_key)
+            else:
+                result = _request_json(
+                    api_key, client, parts, schema, audio_upload, on_partial, model
+                )
+            report_key_success(api_key)
+            return result
+
+        except ClientError as e:
+            last_error = e
+            if _retry_after_client_error(e, api_key, audio_upload):
                 continue
+            raise RuntimeError("AI processing failed. Please try again later.") from e
+
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            last_error = e
+            report_key_failure(KEY_MANAGER, api_key, e)
+
+    if last_error is not None and not isinstance(last_error, ClientError):
+        raise RuntimeError(
+            "Gemini did not respond on any key. Please retry later."
+        ) from last_error
+    raise RuntimeError(
+        "AI quota exceeded on all Gemini keys. Please retry later."
+    ) from last_error
+
+
+async def _generate_json_async(
+    parts: list[dict],
+    schema: type[BaseModel],
+    audio_upload: tuple[str, str] | None = None,
+    model: str = MODEL,
+) -> dict:
+    """Async twin of _generate_json() on the SDK's ``client.aio`` surface."""
+    last_error = None
+    tokens = _estimate(parts, audio_upload)
+
+    async with ASYNC_KEY_MANAGER.in_flight_limit():
+        for _ in range(ASYNC_KEY_MANAGER.key_count):
+            api_key, client = await ASYNC_KEY_MANAGER.get_client(tokens, model)
 
-            # ---- INVALID KEY (disable permanently) ----
-            if "API_KEY_INVALID" in error_text or "not valid" in error_text.lower() or "PERMISSION_DENIED" in error_text:
-                logger.error(
-                    "Gemini API key invalid or permission denied",
+            try:
+                logger.info(
+                    "Gemini async transcription attempt",
                     extra={"key_index": GEMINI_API_KEYS.index(api_key)},
                 )
-                KEY_MANAGER.disable_key(api_key)
-                continue
 
-            # ---- other errors ----
-            logger.exception("Gemini processing failed")
-            raise RuntimeError("AI processing failed. Please try again later.") from e
+                with gemini_attempt("transcribe", api_key, model):
+                    request_parts = parts
+                    if audio_upload:
+                        upload = await sync_to_async(get_uploaded_audio)(
+                            client, api_key, *audio_upload
+                        )
+                        request_parts = [file_part(upload), *parts]
+
+                    response = await client.aio.models.generate_content(
+                        model=model,
+                        contents=user_contents(request_parts),
+                        config=json_config(schema, GEMINI_REQUEST_TIMEOUT_SECONDS),
+                    )
+                    result = _parse_response(response, schema)
+                report_key_success(api_key)
+                return result
+
+            except ClientError as e:
+                last_error = e
+                kind = _classify_client_error(e, api_key)
+                if kind == "quota":
+                    await ASYNC_KEY_MANAGER.cooldown_key(api_key, **retry_hint(e))
+                    continue
+
+                if audio_upload:
+                    await sync_to_async(forget_upload)(api_key, audio_upload[1])
+
+                if kind == "invalid_key":
+                    await ASYNC_KEY_MANAGER.disable_key(api_key)
+                    continue
+
+                raise RuntimeError(
+                    "AI processing failed. Please try again later."
+                ) from e
+
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                last_error = e
+                await asyncio.to_thread(
+                    report_key_failure, KEY_MANAGER, api_key, e
+                )
 
+    if last_error is not None and not isinstance(last_error, ClientError):
+        raise RuntimeError(
+            "Gemini did not respond on any key. Please retry later."
+        ) from last_error
     raise RuntimeError(
         "AI quota exceeded on all Gemini keys. Please retry later."
     ) from last_error
+
+
+def gemini_transcribe(
+    audio_path: str,
+    audio_hash: str | None = None,
+    on_partial: Callable[[dict], None] | None = None,
+    duration_seconds: float | None = None,
+) -> dict:
+    """
+    Transcribe audio. The model is picked by model_router from
+    duration_seconds, falling back to the other model on invalid or
+    truncated output. When audio_hash is given, the parsed response is
+    cached per (hash, model, prompt version), and files of at least
+    GEMINI_FILES_API_MIN_BYTES are uploaded via the Files API (cached per
+    hash and key) instead of being inlined as base64.
+
+    When on_partial is given, the response is streamed and on_partial is
+    called with the completed top-level fields (e.g. language, title) while
+    the rest is still being generated. Cache hits return without calling it.
+
+    Returns:
+    {
+      "language": "hi" | "mr" | "en",
+      "transcript_native": "...",
+      "transcript_english": "..."
+    }
+    """
+    models = route_audio(MODEL, duration_seconds)
+    return cached_response(
+        audio_hash,
+        models[0],
+        TRANSCRIBE_PROMPT_VERSION,
+        lambda: _transcribe_whole(audio_path, audio_hash, models, on_partial),
+    )
+
+
+def _audio_request(
+    audio_path: str, audio_hash: str | None, prompt: str
+) -> tuple[list[dict], tuple[str, str] | None]:
+    """Parts and upload for *audio_path*; large files go via the Files API."""
+    if audio_hash and _file_size(audio_path) >= GEMINI_FILES_API_MIN_BYTES:
+        return [{"text": prompt}], (audio_path, audio_hash)
+    return [audio_part(audio_path), {"text": prompt}], None
+
+
+def _transcribe_whole(
+    audio_path: str,
+    audio_hash: str | None,
+    models: list[str],
+    on_partial: Callable[[dict], None] | None = None,
+) -> dict:
+    parts, audio_upload = _audio_request(audio_path, audio_hash, TRANSCRIBE_PROMPT)
+    return ROUTER.call(
+        models,
+        lambda model: _generate_json(
+            parts,
+            TranscriptionResult,
+            audio_upload=audio_upload,
+            on_partial=on_partial,
+            model=model,
+        ),
+    )
+
+
+async def gemini_transcribe_async(
+    audio_path: str,
+    audio_hash: str | None = None,
+    duration_seconds: float | None = None,
+) -> dict:
+    """Async gemini_transcribe(); many calls can share one event loop."""
+    models = route_audio(MODEL, duration_seconds)
+    return await cached_response_async(
+        audio_hash,
+        models[0],
+        TRANSCRIBE_PROMPT_VERSION,
+        lambda: _transcribe_whole_async(audio_path, audio_hash, models),
+    )
+
+
+async def _transcribe_whole_async(
+    audio_path: str, audio_hash: str | None, models: list[str]
+) -> dict:
+    if audio_hash and _file_size(audio_path) >= GEMINI_FILES_API_MIN_BYTES:
+        parts = [{"text": TRANSCRIBE_PROMPT}]
+        audio_upload = (audio_path, audio_hash)
+    else:
+        part = await asyncio.to_thread(audio_part, audio_path)
+        parts = [part, {"text": TRANSCRIBE_PROMPT}]
+        audio_upload = None
+    return await ROUTER.call_async(
+        models,
+        lambda model: _generate_json_async(
+            parts, TranscriptionResult, audio_upload=audio_upload, model=model
+        ),
+    )
+
+
+def _transcribe_segment(segment: tuple[Path, str]) -> dict:
+    # Segments are at most SEGMENT_MAX_SECONDS, so they route like short clips.
+    # Uploads are cached per hash; a segment's own hash (taken while it was
+    # split) keeps retries and fallbacks on the same key from re-uploading it.
+    segment_path, segment_hash = segment
+    parts, audio_upload = _audio_request(
+        str(segment_path), segment_hash, SEGMENT_PROMPT
+    )
+    return ROUTER.call(
+        route_audio(MODEL, None),
+        lambda model: _generate_json(
+            parts, SegmentResult, audio_upload=audio_upload, model=model
+        ),
+    )
+
+
+def gemini_transcribe_long(
+    audio_path: str, duration_seconds: float, audio_hash: str | None = None
+) -> dict:
+    """
+    Transcribe long audio as parallel segments split at silences.
+
+    Segments are transcribed concurrently (one worker per API key), each
+    uploaded via the Files API when it is at least GEMINI_FILES_API_MIN_BYTES,
+    merged in order, and a final text-only request derives triggers and title from
+    the merged English transcript. Returns the same shape as
+    gemini_transcribe().
+    """
+    if audio_hash:
+        cached = lookup(audio_hash, MODEL, LONG_PROMPT_VERSION)
+        if cached is not None:
+            return cached
+
+    source = Path(audio_path)
+    segment_files = split_audio_at_silence(
+        source, duration_seconds, SEGMENT_TARGET_SECONDS, SEGMENT_MAX_SECONDS
+    )
+    if len(segment_files) == 1:
+        return gemini_transcribe(
+            audio_path, audio_hash, duration_seconds=duration_seconds
+        )
+
+    logger.info(
+        "Transcribing %s in %d segments", source.name, len(segment_files)
+    )
+    try:
+        workers = max(1, min(len(segment_files), KEY_MANAGER.key_count))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # map() yields results in submission order, i.e. audio order.
+            segments = list(
+                pool.map(in_current_trace(_transcribe_segment), segment_files)
+            )
+    finally:
+        for segment_path, _ in segment_files:
+            segment_path.unlink(missing_ok=True)
+
+    transcript_native = "\n".join(
+        str(segment.get("transcript_native", "")).strip() for segment in segments
+    ).strip()
+    transcript_english = "\n".join(
+        str(segment.get("transcript_english", "")).strip() for segment in segments
+    ).strip()
+    languages = Counter(
+        segment.get("language") for segment in segments if segment.get("language")
+    )
+
+    summary_parts = [{"text": SUMMARY_PROMPT + transcript_english}]
+    summary = ROUTER.call(
+        route_audio(MODEL, None),
+        lambda model: _generate_json(summary_parts, SummaryResult, model=model),
+    )
+
+    result = {
+        "language": languages.most_common(1)[0][0] if languages else "en",
+        "transcript_native": transcript_native,
+        "transcript_english": transcript_english,
+        "triggers": summary.get("triggers", []),
+        "title": summary.get("title", "New Reel Processed"),
+    }
+    if audio_hash:
+        store(audio_hash, MODEL, LONG_PROMPT_VERSION, result)
+    return result
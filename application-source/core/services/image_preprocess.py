@@ -0,0 +1,81 @@
+"""Shrink post images before they are sent to Gemini.
+
+Carousel slides arrive as full-resolution JPEGs with EXIF/ICC metadata.
+Each slide is decoded, rotated upright, downscaled so its long edge is at
+most POST_IMAGE_MAX_EDGE and re-encoded as a metadata-free JPEG at
+POST_IMAGE_JPEG_QUALITY, with transparency flattened onto white. Slides are
+processed in a thread pool; Pillow releases the GIL while resizing and
+encoding. Files Pillow cannot decode (or refuses as decompression bombs) and
+slides the re-encode would not make smaller are sent unchanged.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from mimetypes import guess_type
+from pathlib import Path
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.constants import POST_IMAGE_JPEG_QUALITY, POST_IMAGE_MAX_EDGE
+from core.services.gemini_request import inline_part
+
+logger = logging.getLogger(__name__)
+
+
+def shrink_image(
+    data: bytes,
+    max_edge: int = POST_IMAGE_MAX_EDGE,
+    quality: int = POST_IMAGE_JPEG_QUALITY,
+) -> bytes:
+    """Return *data* downscaled to *max_edge* and re-encoded as plain JPEG."""
+    with Image.open(io.BytesIO(data)) as image:
+        # Apply the EXIF orientation before the metadata is dropped.
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+            # Flatten onto white; a plain convert("RGB") turns it black.
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        # No exif/icc_profile arguments: the new file carries no metadata.
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def prepared_image_part(image_path: Path) -> dict:
+    """Inline part for a post image, shrunk when that makes it smaller."""
+    with image_path.open("rb") as image_file:
+        data = image_file.read()
+    try:
+        shrunk = shrink_image(data)
+    except (
+        UnidentifiedImageError,
+        Image.DecompressionBombError,
+        OSError,
+        ValueError,
+    ):
+        logger.warning("Could not re-encode %s; sending it as is", image_path.name)
+        shrunk = None
+
+    if shrunk is None or len(shrunk) >= len(data):
+        mime_type, _ = guess_type(str(image_path))
+        return inline_part(data, mime_type or "image/jpeg")
+
+    logger.debug(
+        "Shrunk %s from %d to %d bytes", image_path.name, len(data), len(shrunk)
+    )
+    return inline_part(shrunk, "image/jpeg")
+
+
+def prepared_image_parts(image_paths: list[Path]) -> list[dict]:
+    """prepared_image_part() for every slide, in order, in parallel."""
+    if len(image_paths) <= 1:
+        return [prepared_image_part(image_path) for image_path in image_paths]
+    workers = min(len(image_paths), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(prepared_image_part, image_paths))
@@ -0,0 +1,97 @@
+"""Measure module import cost with ``python -X importtime``."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Third-party packages that must only be imported on first use.
+HEAVY_MODULES = (
+    "google.genai",
+    "yt_dlp",
+    "instaloader",
+    "curl_cffi",
+    "parsel",
+)
+
+# Entry points that should stay cheap: URL loading (every worker boot and the
+# health check) and the cron commands.
+DEFAULT_TARGETS = (
+    "core.urls",
+    "core.views",
+    "core.management.commands.send_daily_recall",
+    "core.management.commands.cleanup_media",
+)
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Parse ``-X importtime`` output into a list of per-module entries.
+
+    Each entry has ``module``, ``depth``, ``self_us`` and ``cumulative_us``
+    keys; ``depth`` 0 marks imports made directly by the measured code.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # Header line: "self [us] | cumulative | imported package"
+            continue
+        name = parts[2].rstrip()
+        entries.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_us": self_us,
+                "cumulative_us": cumulative_us,
+            }
+        )
+    return entries
+
+
+def find_heavy_modules(entries: list[dict]) -> list[str]:
+    """Return the heavy top-level packages present in *entries*."""
+    imported = {entry["module"] for entry in entries}
+    return [module for module in HEAVY_MODULES if module in imported]
+
+
+def measure_import(module: str, settings_module: str | None = None) -> dict:
+    """Import *module* after ``django.setup()`` in a fresh interpreter.
+
+    Django's own import cost is measured too, so ``total_us`` is the time a
+    cold process spends before *module* is usable.
+    """
+    env = os.environ.copy()
+    env["DJANGO_SETTINGS_MODULE"] = settings_module or env.get(
+        "DJANGO_SETTINGS_MODULE", "trigger_engine.settings"
+    )
+    code = f"import django; django.setup(); import {module}"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = parse_importtime(completed.stderr)
+    return {
+        "module": module,
+        "total_us": sum(
+            entry["cumulative_us"] for entry in entries if entry["depth"] == 0
+        ),
+        "entries": entries,
+        "heavy": find_heavy_modules(entries),
+    }
@@ -0,0 +1,86 @@
+"""Incremental parsing of a JSON object that arrives in chunks.
+
+Streamed Gemini responses deliver one JSON object a few tokens at a time.
+``IncrementalJSONObject`` consumes the chunks and reports each top-level
+field as soon as its value is complete, so e.g. the title can be shown
+long before the full transcript has been generated.
+"""
+
+import json
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class IncrementalJSONObject:
+    """Collect the completed top-level fields of a streamed JSON object."""
+
+    def __init__(self) -> None:
+        self.fields: dict = {}
+        self.done = False
+        self._buffer = ""
+        # Index just past the last fully parsed field (or the opening brace).
+        self._pos = -1
+
+    def feed(self, chunk: str) -> dict:
+        """Add *chunk* and return the fields it completed (may be empty)."""
+        self._buffer += chunk
+        completed: dict = {}
+        if self.done:
+            return completed
+
+        if self._pos < 0:
+            # Skip anything before the object, e.g. a ```json fence.
+            start = self._buffer.find("{")
+            if start < 0:
+                return completed
+            self._pos = start + 1
+
+        while True:
+            field = self._next_field()
+            if field is None:
+                break
+            key, value = field
+            self.fields[key] = value
+            completed[key] = value
+        return completed
+
+    def _skip(self, index: int) -> int:
+        while index < len(self._buffer) and self._buffer[index] in _WHITESPACE:
+            index += 1
+        return index
+
+    def _next_field(self) -> tuple[str, object] | None:
+        buffer = self._buffer
+        index = self._skip(self._pos)
+        if index < len(buffer) and buffer[index] == ",":
+            index = self._skip(index + 1)
+        if index >= len(buffer):
+            return None
+        if buffer[index] == "}":
+            self.done = True
+            return None
+        if buffer[index] != '"':
+            # Not a JSON object after all; stop rather than guess.
+            self.done = True
+            return None
+
+        try:
+            key, index = json.decoder.scanstring(buffer, index + 1)
+        except json.JSONDecodeError:
+            return None
+        index = self._skip(index)
+        if index >= len(buffer) or buffer[index] != ":":
+            return None
+        index = self._skip(index + 1)
+
+        try:
+            value, end = _DECODER.raw_decode(buffer, index)
+        except json.JSONDecodeError:
+            return None
+        # A number at the very end of the buffer may still gain digits.
+        if isinstance(value, (int, float)) and end == len(buffer):
+            return None
+
+        self._pos = end
+        return key, value
@@ -0,0 +1,353 @@
+"""In-process counters and histograms exposed at ``/metrics``.
+
+Rendered in the Prometheus text format (version 0.0.4) without any client
+library. Values live in the worker process and start from zero when gunicorn
+recycles it; Prometheus' ``rate()`` and ``increase()`` treat that as a
+counter reset.
+
+What is recorded:
+
+* ``trigger_engine_job_seconds{kind,outcome}`` - a whole reel/post job;
+* ``trigger_engine_stage_seconds{stage,outcome}`` - every ``stage()`` (see
+  pipeline_stages);
+* ``trigger_engine_service_seconds{service,outcome}`` - download, audio,
+  hashing and email service calls;
+* ``trigger_engine_post_strategy_seconds{strategy,outcome}`` - each post
+  download strategy tried (outcome ok, empty or error);
+* ``trigger_engine_gemini_request_seconds{service,key,model,outcome}`` -
+  each Gemini attempt on one key (outcome ok, quota, client_error,
+  transient, invalid_output or error; ``key`` is the key's non-secret id);
+* ``trigger_engine_cache_lookups_total{cache,result}`` - the URL, source_id,
+  audio_hash and fingerprint dedup checks and the Gemini response cache,
+  with ``trigger_engine_cache_hit_ratio{cache}`` derived from it.
+
+Nothing heavy is imported here, so the view stays cheap to import.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+
+from core.services.pipeline_stages import add_stage_listener
+from core.services.tracing import span
+
+T = TypeVar("T")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cache hit (milliseconds) to a long reel on a slow key.
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], **extra) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict[str, object]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, value in sorted(self.samples().items()):
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed upper-bound buckets per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last is +Inf), sum, count.
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the block's duration; ``outcome`` is filled in if a label."""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            if "outcome" in self.labelnames:
+                labels = {"outcome": outcome, **labels}
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def samples(self) -> dict[tuple[str, ...], tuple[list[int], float, int]]:
+        with self._lock:
+            return {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            }
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, (counts, total, count) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, key, le=_format_value(float(bound))
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Named metrics, rendered together in registration order."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric):
+            raise ValueError(f"{metric.name} is already a {existing.kind}")
+        return existing
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def reset(self) -> None:
+        """Zero every metric (tests)."""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        lines.extend(_cache_hit_ratio_lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+JOB_SECONDS = REGISTRY.histogram(
+    "trigger_engine_job_seconds",
+    "Wall-clock time of a whole reel or post processing job.",
+    ("kind", "outcome"),
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "trigger_engine_stage_seconds",
+    "Time spent in each processing stage.",
+    ("stage", "outcome"),
+)
+SERVICE_SECONDS = REGISTRY.histogram(
+    "trigger_engine_service_seconds",
+    "Time spent in download, audio, hashing and email service calls.",
+    ("service", "outcome"),
+)
+POST_STRATEGY_SECONDS = REGISTRY.histogram(
+    "trigger_engine_post_strategy_seconds",
+    "Time spent in each Instagram post download strategy attempt.",
+    ("strategy", "outcome"),
+)
+GEMINI_REQUEST_SECONDS = REGISTRY.histogram(
+    "trigger_engine_gemini_request_seconds",
+    "Time spent in each Gemini request attempt, per API key and model.",
+    ("service", "key", "model", "outcome"),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "trigger_engine_cache_lookups_total",
+    "Dedup and response cache lookups by result.",
+    ("cache", "result"),
+)
+
+
+def _cache_hit_ratio_lines() -> list[str]:
+    totals: dict[str, list[float]] = {}
+    for (cache, result), value in CACHE_LOOKUPS.samples().items():
+        hits_and_lookups = totals.setdefault(cache, [0, 0])
+        hits_and_lookups[1] += value
+        if result == "hit":
+            hits_and_lookups[0] += value
+
+    name = "trigger_engine_cache_hit_ratio"
+    lines = [
+        f"# HELP {name} Share of lookups that were hits since the worker started.",
+        f"# TYPE {name} gauge",
+    ]
+    for cache, (hits, lookups) in sorted(totals.items()):
+        labels = _format_labels(("cache",), (cache,))
+        lines.append(f"{name}{labels} {_format_value(hits / lookups)}")
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text format."""
+    return REGISTRY.render()
+
+
+def observe_cache(cache: str, hit: bool) -> None:
+    """Count one lookup of *cache* (url, source_id, audio_hash, ...)."""
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def timed(service: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator recording the function's calls as *service* (and a span)."""
+
+    def decorate(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with SERVICE_SECONDS.time(service=service), span(service):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def gemini_outcome(error: BaseException | None) -> str:
+    """Label for how a Gemini attempt ended."""
+    if error is None:
+        return "ok"
+    # Only reached once the Gemini services (and the SDK) are loaded.
+    from google.genai.errors import ClientError
+
+    from core.services.gemini_resilience import is_transient
+    from core.services.model_router import InvalidOutputError
+
+    if isinstance(error, ClientError):
+        quota = error.code == 429 or "RESOURCE_EXHAUSTED" in str(error)
+        return "quota" if quota else "client_error"
+    if isinstance(error, InvalidOutputError):
+        return "invalid_output"
+    if is_transient(error):
+        return "transient"
+    return "error"
+
+
+@contextmanager
+def gemini_attempt(service: str, api_key: str, model: str) -> Iterator[None]:
+    """Time one Gemini request on *api_key*, labelled by how it ended."""
+    from core.services.gemini_key_manager import key_id
+
+    labels = {"service": service, "key": key_id(api_key), "model": model}
+    started = time.perf_counter()
+    error = None
+    with span("gemini_request", **labels) as attrs:
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            attrs["outcome"] = outcome = gemini_outcome(error)
+            GEMINI_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, outcome=outcome, **labels
+            )
+
+
+def _observe_stage(name: str, seconds: float, ok: bool) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name, outcome="ok" if ok else "error")
+
+
+add_stage_listener(_observe_stage)
@@ -0,0 +1,245 @@
+"""Per-request Gemini model selection with fallback and latency tracking.
+
+Short clips and single images go to the service's lite model; audio of at
+least GEMINI_ROUTE_LONG_AUDIO_SECONDS and multi-slide or large posts go to
+GEMINI_CAPACITY_MODEL first. The other model is always the fallback, used
+when the first returns empty, invalid or truncated output
+(``InvalidOutputError``). Models that failed most of their recent calls are
+tried last, and a model whose circuit breaker is open is skipped; only
+unusable output, 5xx errors and timeouts count as a model's failures. Every
+call's latency is logged and kept for ``stats()`` so the thresholds can be
+tuned from real numbers.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Awaitable, Callable, Iterator
+from typing import TypeVar
+
+from core.constants import (
+    GEMINI_CAPACITY_MODEL,
+    GEMINI_ROUTE_LONG_AUDIO_SECONDS,
+    GEMINI_ROUTE_MAX_LITE_IMAGE_BYTES,
+    GEMINI_ROUTE_MAX_LITE_IMAGES,
+)
+from core.services.gemini_resilience import CircuitBreaker, is_transient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Outcomes remembered per model when judging its health.
+HISTORY_SIZE = 20
+# A model is demoted once it has this many recent calls and fails this share.
+UNHEALTHY_MIN_CALLS = 4
+UNHEALTHY_FAILURE_RATE = 0.5
+# Latencies kept per model for the percentiles in stats().
+LATENCY_SAMPLES = 200
+# Calls needed before latency_percentile() reports anything.
+MIN_LATENCY_SAMPLES = 10
+
+
+class InvalidOutputError(RuntimeError):
+    """The model answered, but with empty, invalid or truncated output."""
+
+
+def is_truncated(response) -> bool:
+    """True when generation stopped at the output token limit."""
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return False
+    return str(getattr(reason, "value", reason)) == "MAX_TOKENS"
+
+
+def _route(fast_model: str, heavy: bool) -> list[str]:
+    if heavy:
+        preferred, fallback = GEMINI_CAPACITY_MODEL, fast_model
+    else:
+        preferred, fallback = fast_model, GEMINI_CAPACITY_MODEL
+    return [preferred] if preferred == fallback else [preferred, fallback]
+
+
+def route_audio(fast_model: str, duration_seconds: float | None) -> list[str]:
+    """Candidate models for audio, preferred first."""
+    heavy = bool(
+        duration_seconds and duration_seconds >= GEMINI_ROUTE_LONG_AUDIO_SECONDS
+    )
+    return _route(fast_model, heavy)
+
+
+def route_images(fast_model: str, image_count: int, total_bytes: int) -> list[str]:
+    """Candidate models for post images, preferred first."""
+    heavy = (
+        image_count > GEMINI_ROUTE_MAX_LITE_IMAGES
+        or total_bytes > GEMINI_ROUTE_MAX_LITE_IMAGE_BYTES
+    )
+    return _route(fast_model, heavy)
+
+
+def _is_model_failure(error: BaseException) -> bool:
+    """True for 5xx and timeouts, also once wrapped after trying every key.
+
+    Quota exhaustion and other rejections of a key (ClientError) say nothing
+    about the model and must not open its breaker.
+    """
+    while error is not None:
+        if is_transient(error):
+            return True
+        error = error.__cause__
+    return False
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ModelRouter:
+    """Orders candidate models by recent health and records call outcomes."""
+
+    def __init__(
+        self,
+        history_size: int = HISTORY_SIZE,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.history_size = history_size
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all recorded outcomes and latencies and close the breaker."""
+        self.breaker.reset()
+        self._outcomes: dict[str, deque[bool]] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self._calls: Counter = Counter()
+        self._failures: Counter = Counter()
+
+    def record(self, model: str, seconds: float, ok: bool) -> None:
+        """Remember one call's outcome and latency."""
+        with self._lock:
+            outcomes = self._outcomes.setdefault(
+                model, deque(maxlen=self.history_size)
+            )
+            outcomes.append(ok)
+            latencies = self._latencies.setdefault(
+                model, deque(maxlen=LATENCY_SAMPLES)
+            )
+            latencies.append(seconds)
+            self._calls[model] += 1
+            if not ok:
+                self._failures[model] += 1
+        if ok:
+            self.breaker.record_success(model)
+        else:
+            self.breaker.record_failure(model)
+        logger.info(
+            "Gemini model %s %s in %.3fs",
+            model,
+            "answered" if ok else "failed",
+            seconds,
+            extra={"model": model, "latency_ms": round(seconds * 1000)},
+        )
+
+    def healthy(self, model: str) -> bool:
+        with self._lock:
+            outcomes = list(self._outcomes.get(model, ()))
+        if len(outcomes) < UNHEALTHY_MIN_CALLS:
+            return True
+        return outcomes.count(False) / len(outcomes) < UNHEALTHY_FAILURE_RATE
+
+    def order(self, models: list[str]) -> list[str]:
+        """Return *models* with recently failing ones moved to the end."""
+        return sorted(models, key=lambda model: not self.healthy(model))
+
+    def latency_percentile(self, model: str, fraction: float) -> float | None:
+        """Recent latency percentile of *model*, or None without enough calls."""
+        with self._lock:
+            latencies = list(self._latencies.get(model, ()))
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        return _percentile(latencies, fraction)
+
+    def _candidates(self, models: list[str]) -> Iterator[str]:
+        # Lazy, so a half-open model's single trial is only claimed when the
+        # call actually reaches it.
+        allowed = False
+        for model in self.order(models):
+            if self.breaker.allow(model):
+                allowed = True
+                yield model
+        if not allowed:
+            raise RuntimeError(
+                "Gemini models are failing repeatedly. Please retry later."
+            )
+
+    def call(self, models: list[str], attempt: Callable[[str], T]) -> T:
+        """Run *attempt(model)* on each candidate until one gives usable output."""
+        last_error = None
+        for model in self._candidates(models):
+            started = time.perf_counter()
+            try:
+                result = attempt(model)
+            except InvalidOutputError as exc:
+                self.record(model, time.perf_counter() - started, ok=False)
+                logger.warning("Gemini model %s returned unusable output", model)
+                last_error = exc
+                continue
+            except Exception as exc:
+                if _is_model_failure(exc):
+                    self.record(model, time.perf_counter() - started, ok=False)
+                raise
+            self.record(model, time.perf_counter() - started, ok=True)
+            return result
+        raise last_error
+
+    async def call_async(
+        self, models: list[str], attempt: Callable[[str], Awaitable[T]]
+    ) -> T:
+        """Async call()."""
+        last_error = None
+        for model in self._candidates(models):
+            started = time.perf_counter()
+            try:
+                result = await attempt(model)
+            except InvalidOutputError as exc:
+                self.record(model, time.perf_counter() - started, ok=False)
+                logger.warning("Gemini model %s returned unusable output", model)
+                last_error = exc
+                continue
+            except Exception as exc:
+                if _is_model_failure(exc):
+                    self.record(model, time.perf_counter() - started, ok=False)
+                raise
+            self.record(model, time.perf_counter() - started, ok=True)
+            return result
+        raise last_error
+
+    def stats(self) -> dict:
+        """Per-model call counts, failures and latency percentiles."""
+        with self._lock:
+            snapshot = {
+                model: (list(latencies), list(self._outcomes[model]))
+                for model, latencies in self._latencies.items()
+            }
+            calls = dict(self._calls)
+            failures = dict(self._failures)
+        return {
+            model: {
+                "calls": calls[model],
+                "failures": failures.get(model, 0),
+                "recent_failure_rate": round(
+                    outcomes.count(False) / len(outcomes), 3
+                ),
+                "latency_p50_seconds": round(_percentile(latencies, 0.5), 3),
+                "latency_p95_seconds": round(_percentile(latencies, 0.95), 3),
+            }
+            for model, (latencies, outcomes) in snapshot.items()
+        }
+
+
+ROUTER = ModelRouter()
@@ -0,0 +1,58 @@
+"""Named stages of reel/post processing and a hook for timing them.
+
+``process_reel_task`` and the services it calls wrap each step in
+``stage(name)``. Every registered listener is called with the stage name,
+its wall-clock seconds and whether it finished without raising. With no
+listeners a stage costs two ``perf_counter()`` calls. Each stage is also a
+span of the job's trace (see tracing).
+
+Stage names: metadata, dedup_query, download, ffmpeg (audio extraction; the
+audio hash is computed in the same pass), hash (post images), fingerprint,
+ai_call, db_save, email_render, email_send.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from core.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+StageListener = Callable[[str, float, bool], None]
+
+_listeners: tuple[StageListener, ...] = ()
+_lock = threading.Lock()
+
+
+def add_stage_listener(listener: StageListener) -> None:
+    """Call *listener(name, seconds, ok)* after every stage."""
+    global _listeners
+    with _lock:
+        _listeners = (*_listeners, listener)
+
+
+def remove_stage_listener(listener: StageListener) -> None:
+    global _listeners
+    with _lock:
+        _listeners = tuple(item for item in _listeners if item is not listener)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage *name*."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        with span(name):
+            yield
+        ok = True
+    finally:
+        seconds = time.perf_counter() - started
+        for listener in _listeners:
+            try:
+                listener(name, seconds, ok)
+            except Exception:
+                logger.exception("Stage listener failed for %s", name)
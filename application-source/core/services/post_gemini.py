@@ -1,42 +1,44 @@
 """Gemini helpers for extracting text from Instagram post images."""
 
-import json
+import asyncio
 import logging
-from mimetypes import guess_type
 from pathlib import Path
 
 from google.genai.errors import ClientError
 
-from core.constants import GEMINI_API_KEYS
-from core.services.gemini_key_manager import GeminiKeyManager
-from core.utils import parse_first_json
+from core.constants import GEMINI_API_KEYS, GEMINI_REQUEST_TIMEOUT_SECONDS
+from core.services.gemini_key_manager import (
+    default_async_key_manager,
+    default_key_manager,
+    retry_hint,
+)
+from core.services.gemini_request import estimate_tokens, user_contents
+from core.services.gemini_resilience import (
+    is_transient,
+    report_key_failure,
+    report_key_success,
+)
+from core.services.gemini_schemas import PostTextResult, json_config, parse_structured
+from core.services.image_preprocess import prepared_image_parts
+from core.services.metrics import gemini_attempt
+from core.services.model_router import (
+    ROUTER,
+    InvalidOutputError,
+    is_truncated,
+    route_images,
+)
+from core.services.response_cache import cached_response, cached_response_async
 
 logger = logging.getLogger(__name__)
 
 MODEL = "models/gemini-2.5-flash-lite"
-KEY_MANAGER = GeminiKeyManager()
+# Shared with gemini_transcriber so both see the same key rotation and cooldowns.
+KEY_MANAGER = default_key_manager()
+ASYNC_KEY_MANAGER = default_async_key_manager()
+# Cache key for stored responses; bump when the prompt changes.
+PROMPT_VERSION = "post-v1"
 
-
-def _safe_key_index(api_key: str) -> int:
-    try:
-        return GEMINI_API_KEYS.index(api_key)
-    except ValueError:
-        return -1
-
-
-def _parse_json_object(response_text: str) -> dict[str, object]:
-    parsed = parse_first_json(response_text)
-    if parsed is not None:
-        return parsed
-    raise RuntimeError("AI returned invalid post text JSON")
-
-
-def extract_post_text(image_paths: list[Path]) -> dict[str, str]:
-    """Extract language + text content from a list of post images."""
-    if not image_paths:
-        raise RuntimeError("No images found in Instagram post")
-
-    prompt = """
+PROMPT = """
 You are an OCR and behavioral analysis engine.
 
 Tasks:
@@ -57,84 +59,214 @@ Return STRICT JSON only:
 }
 """
 
-    contents: list[dict[str, object]] = []
-    for image_path in image_paths:
-        mime_type, _ = guess_type(str(image_path))
-        with image_path.open("rb") as image_file:
-            contents.append(
-                {
-                    "inline_data": {
-                        "mime_type": mime_type or "image/jpeg",
-                        "data": image_file.read(),
-                    }
-                }
-            )
-    contents.append({"text": prompt})
 
-    last_error = None
+def _safe_key_index(api_key: str) -> int:
+    try:
+        return GEMINI_API_KEYS.index(api_key)
+    except ValueError:
+        return -1
 
-    for _ in range(KEY_MANAGER.key_count):
-        api_key, client = KEY_MANAGER.get_client()
 
+def extract_post_text(
+    image_paths: list[Path], content_hash: str | None = None
+) -> dict[str, str]:
+    """Extract language + text content from a list of post images.
+
+    The model is picked by model_router from the slide count and image
+    bytes. When content_hash (see response_cache.hash_files) is given, the
+    result is cached per (hash, model, prompt version).
+    """
+    if not image_paths:
+        raise RuntimeError("No images found in Instagram post")
+    models = _route(image_paths)
+    return cached_response(
+        content_hash,
+        models[0],
+        PROMPT_VERSION,
+        lambda: ROUTER.call(
+            models, lambda model: _extract_post_text(image_paths, model)
+        ),
+    )
+
+
+async def extract_post_text_async(
+    image_paths: list[Path], content_hash: str | None = None
+) -> dict[str, str]:
+    """Async extract_post_text() on the SDK's ``client.aio`` surface."""
+    if not image_paths:
+        raise RuntimeError("No images found in Instagram post")
+    models = await asyncio.to_thread(_route, image_paths)
+    return await cached_response_async(
+        content_hash,
+        models[0],
+        PROMPT_VERSION,
+        lambda: ROUTER.call_async(
+            models, lambda model: _extract_post_text_async(image_paths, model)
+        ),
+    )
+
+
+def _route(image_paths: list[Path]) -> list[str]:
+    total_bytes = 0
+    for image_path in image_paths:
         try:
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=[{"role": "user", "parts": contents}],
-            )
+            total_bytes += image_path.stat().st_size
+        except OSError:
+            pass
+    return route_images(MODEL, len(image_paths), total_bytes)
 
-            response_text = response.text.strip() if response.text else ""
-            if not response_text:
-                raise RuntimeError("AI returned empty post text response")
 
-            try:
-                parsed = _parse_json_object(response_text)
-            except (json.JSONDecodeError, RuntimeError) as exc:
-                logger.error(
-                    "Gemini post response was not JSON: %s",
-                    response_text[:500],
-                )
-                raise RuntimeError("AI returned invalid post text JSON") from exc
+def _post_contents(image_paths: list[Path]) -> list[dict[str, object]]:
+    contents: list[dict[str, object]] = prepared_image_parts(image_paths)
+    contents.append({"text": PROMPT})
+    return contents
 
-            transcript_native = str(parsed.get("transcript_native", "")).strip()
-            transcript_english = str(parsed.get("transcript_english", "")).strip()
 
-            if not transcript_english:
-                raise RuntimeError("AI could not extract readable text from the post")
+def _parse_post_response(response) -> dict[str, str]:
+    if is_truncated(response):
+        logger.error("Gemini post response hit the output token limit")
+        raise InvalidOutputError("AI returned truncated post text")
 
-            if not transcript_native:
-                transcript_native = transcript_english
+    response_text = response.text.strip() if response.text else ""
+    if not response_text:
+        raise InvalidOutputError("AI returned empty post text response")
 
-            return {
-                "language": str(parsed.get("language", "mixed")),
-                "transcript_native": transcript_native,
-                "transcript_english": transcript_english,
-                "triggers": parsed.get("triggers", []),
-                "title": str(parsed.get("title", "New Post Processed")),
-            }
+    parsed = parse_structured(
+        response_text, PostTextResult, getattr(response, "parsed", None)
+    )
+    if parsed is None:
+        logger.error(
+            "Gemini post response was not JSON: %s",
+            response_text[:500],
+        )
+        raise InvalidOutputError("AI returned invalid post text JSON")
 
-        except ClientError as exc:
-            error_text = str(exc)
-            last_error = exc
+    transcript_native = str(parsed.get("transcript_native", "")).strip()
+    transcript_english = str(parsed.get("transcript_english", "")).strip()
 
-            if "RESOURCE_EXHAUSTED" in error_text or "quota" in error_text.lower():
-                logger.warning(
-                    "Gemini post extraction quota exceeded for key",
-                    extra={"key_index": _safe_key_index(api_key)},
-                )
-                KEY_MANAGER.cooldown_key(api_key)
-                continue
+    if not transcript_english:
+        raise RuntimeError("AI could not extract readable text from the post")
+
+    if not transcript_native:
+        transcript_native = transcript_english
+
+    return {
+        "language": str(parsed.get("language", "mixed")),
+        "transcript_native": transcript_native,
+        "transcript_english": transcript_english,
+        "triggers": parsed.get("triggers", []),
+        "title": str(parsed.get("title", "New Post Processed")),
+    }
+
+
+def _classify_client_error(exc: ClientError, api_key: str) -> str:
+    """Log a ClientError and return "quota", "invalid_key" or "fatal"."""
+    error_text = str(exc)
+
+    if "RESOURCE_EXHAUSTED" in error_text or "quota" in error_text.lower():
+        logger.warning(
+            "Gemini post extraction quota exceeded for key",
+            extra={"key_index": _safe_key_index(api_key)},
+        )
+        return "quota"
+
+    if "API_KEY_INVALID" in error_text or "not valid" in error_text.lower():
+        logger.error(
+            "Gemini post extraction API key invalid",
+            extra={"key_index": _safe_key_index(api_key)},
+        )
+        return "invalid_key"
+
+    logger.exception("Gemini post text extraction failed")
+    return "fatal"
 
-            if "API_KEY_INVALID" in error_text or "not valid" in error_text.lower():
-                logger.error(
-                    "Gemini post extraction API key invalid",
-                    extra={"key_index": _safe_key_index(api_key)},
+
+def _extract_post_text(image_paths: list[Path], model: str = MODEL) -> dict[str, str]:
+    contents = _post_contents(image_paths)
+    tokens = estimate_tokens(contents)
+    last_error = None
+
+    for _ in range(KEY_MANAGER.key_count):
+        api_key, client = KEY_MANAGER.get_client(tokens, model=model)
+
+        try:
+            with gemini_attempt("post", api_key, model):
+                response = client.models.generate_content(
+                    model=model,
+                    contents=user_contents(contents),
+                    config=json_config(
+                        PostTextResult, GEMINI_REQUEST_TIMEOUT_SECONDS
+                    ),
                 )
+                result = _parse_post_response(response)
+            report_key_success(api_key)
+            return result
+
+        except ClientError as exc:
+            last_error = exc
+            kind = _classify_client_error(exc, api_key)
+            if kind == "quota":
+                KEY_MANAGER.cooldown_key(api_key, **retry_hint(exc))
+                continue
+            if kind == "invalid_key":
                 KEY_MANAGER.disable_key(api_key)
                 continue
-
-            logger.exception("Gemini post text extraction failed")
             raise RuntimeError("Post text extraction failed") from exc
 
+        except Exception as exc:
+            if not is_transient(exc):
+                raise
+            last_error = exc
+            report_key_failure(KEY_MANAGER, api_key, exc)
+
+    raise RuntimeError(
+        "All Gemini keys exhausted for post text extraction"
+    ) from last_error
+
+
+async def _extract_post_text_async(
+    image_paths: list[Path], model: str = MODEL
+) -> dict[str, str]:
+    contents = await asyncio.to_thread(_post_contents, image_paths)
+    tokens = estimate_tokens(contents)
+    last_error = None
+
+    async with ASYNC_KEY_MANAGER.in_flight_limit():
+        for _ in range(ASYNC_KEY_MANAGER.key_count):
+            api_key, client = await ASYNC_KEY_MANAGER.get_client(tokens, model)
+
+            try:
+                with gemini_attempt("post", api_key, model):
+                    response = await client.aio.models.generate_content(
+                        model=model,
+                        contents=user_contents(contents),
+                        config=json_config(
+                            PostTextResult, GEMINI_REQUEST_TIMEOUT_SECONDS
+                        ),
+                    )
+                    result = _parse_post_response(response)
+                report_key_success(api_key)
+                return result
+
+            except ClientError as exc:
+                last_error = exc
+                kind = _classify_client_error(exc, api_key)
+                if kind == "quota":
+                    await ASYNC_KEY_MANAGER.cooldown_key(api_key, **retry_hint(exc))
+                    continue
+                if kind == "invalid_key":
+                    await ASYNC_KEY_MANAGER.disable_key(api_key)
+                    continue
+                raise RuntimeError("Post text extraction failed") from exc
+
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                last_error = exc
+                await asyncio.to_thread(
+                    report_key_failure, KEY_MANAGER, api_key, exc
+                )
+
     raise RuntimeError(
         "All Gemini keys exhausted for post text extraction"
     ) from last_error
@@ -10,6 +10,7 @@ Robust multi-strategy approach (all cookie-aware):
 import json
 import logging
 import re
+import time
 from http.cookiejar import MozillaCookieJar
 from pathlib import Path
 
@@ -18,6 +19,10 @@ import requests as plain_requests
 from curl_cffi import requests as curl_requests
 from parsel import Selector
 
+from core.services.metrics import POST_STRATEGY_SECONDS, timed
+from core.services.tracing import span
+from core.utils import instagram_url
+
 logger = logging.getLogger(__name__)
 
 MEDIA_DIR = Path(__file__).resolve().parent.parent.parent / "media"
@@ -221,7 +226,9 @@ def _try_instaloader(post_url: str, shortcode: str) -> list[Path]:
 def _try_embed_page(shortcode: str) -> list[Path]:
     """Fetch the /embed/ page — sometimes works without auth, better with cookies."""
     cookies = _load_cookies_dict()
-    embed_url = f"https://www.instagram.com/p/{shortcode}/embed/captioned/"
+    embed_url = instagram_url(
+        f"https://www.instagram.com/p/{shortcode}/embed/captioned/"
+    )
 
     resp = curl_requests.get(
         embed_url, impersonate="chrome", timeout=20, cookies=cookies or None
@@ -307,7 +314,10 @@ def _try_direct_page(post_url: str, shortcode: str) -> list[Path]:
     for strategy in strategies:
         try:
             resp = curl_requests.get(
-                post_url, timeout=15, cookies=cookies or None, **strategy
+                instagram_url(post_url),
+                timeout=15,
+                cookies=cookies or None,
+                **strategy,
             )
             if resp.status_code != 200:
                 continue
@@ -373,12 +383,17 @@ def _try_ytdlp_thumbnail(post_url: str, shortcode: str) -> list[Path]:
 # ---------------------------------------------------------------------------
 
 
+@timed("download_instagram_post")
 def download_instagram_post(post_url: str) -> list[Path]:
     """Download an Instagram post and return local image paths.
 
     Tries four strategies in order, stopping at the first that succeeds.
     All strategies are cookie-aware when /opt/cookies/instagram.txt exists.
+    With INSTAGRAM_BASE_URL set only the page-scraping strategies run;
+    Instaloader and yt-dlp always talk to the real site.
     """
+    from core.constants import INSTAGRAM_BASE_URL
+
     shortcode = _extract_shortcode(post_url)
 
     fallback_chain = [
@@ -387,11 +402,17 @@ def download_instagram_post(post_url: str) -> list[Path]:
         ("Direct page", lambda: _try_direct_page(post_url, shortcode)),
         ("yt-dlp thumbnail", lambda: _try_ytdlp_thumbnail(post_url, shortcode)),
     ]
+    if INSTAGRAM_BASE_URL:
+        fallback_chain = fallback_chain[1:3]
 
     last_err = None
     for name, strategy_fn in fallback_chain:
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            paths = strategy_fn()
+            with span("post_strategy", strategy=name) as attrs:
+                paths = strategy_fn()
+                attrs["outcome"] = outcome = "ok" if paths else "empty"
             if paths:
                 logger.info("Strategy '%s' succeeded for post %s", name, shortcode)
                 return paths
@@ -400,6 +421,10 @@ def download_instagram_post(post_url: str) -> list[Path]:
                 "Strategy '%s' failed for post %s: %s", name, shortcode, e
             )
             last_err = e
+        finally:
+            POST_STRATEGY_SECONDS.observe(
+                time.perf_counter() - started, strategy=name, outcome=outcome
+            )
 
     raise RuntimeError(
         f"All download strategies failed for post {shortcode}"
@@ -0,0 +1,168 @@
+"""Opt-in CPU profiles of reel jobs and API requests.
+
+``profiled(name, enabled)`` profiles the enclosed block of the calling thread
+and writes the result to PROFILE_DIR, keeping only the newest
+PROFILE_MAX_FILES files. ``should_profile()`` decides whether to: for a
+random PROFILE_SAMPLE_RATE fraction of calls, or when the request carried an
+X-Profile-Token header matching PROFILE_TOKEN. One profile runs at a time per
+process; a block that starts while another is being profiled (e.g. the task
+inside a profiled request) is not profiled again.
+
+PROFILE_MODE picks the profiler:
+
+* ``sample`` - a background thread records the profiled thread's Python
+  stack every PROFILE_SAMPLE_INTERVAL_SECONDS and saves them as collapsed
+  stacks (``frame;frame;frame count`` lines, ``.collapsed``), the input of
+  flamegraph.pl and speedscope. Overhead does not grow with call counts.
+* ``cprofile`` - deterministic ``cProfile`` stats (``.pstats``).
+
+Work the profiled thread hands to a pool (hedged Gemini calls, long-audio
+segments) shows up only as time spent waiting on it.
+
+``manage.py profile_report`` merges saved profiles.
+"""
+
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.constants import (
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL_SECONDS,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_TOKEN,
+)
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = "X-Profile-Token"
+# Response header naming the profile a request was written to.
+FILE_HEADER = "X-Profile-File"
+SUFFIXES = {"sample": ".collapsed", "cprofile": ".pstats"}
+
+_active = threading.Lock()
+_serial = itertools.count(1)
+
+
+def should_profile(token: str | None = None) -> bool:
+    """True for a sampled fraction of calls or a matching profile token."""
+    if PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def collapse(frame) -> str:
+    """The stack ending in *frame* as ``outermost;...;innermost``."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Counts one thread's stacks, sampled every *interval* seconds."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def dump(self, path: Path) -> None:
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+        )
+
+
+def profile_path(name: str, directory: Path | None = None) -> Path:
+    """A new, unique file name for a profile of *name*."""
+    directory = Path(PROFILE_DIR) if directory is None else directory
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "profile"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    suffix = SUFFIXES.get(PROFILE_MODE, ".collapsed")
+    return directory / f"{stamp}-{safe_name}-{os.getpid()}-{next(_serial)}{suffix}"
+
+
+def rotate(directory: Path, keep: int) -> None:
+    """Delete all but the newest *keep* profiles in *directory*."""
+    profiles = []
+    for path in directory.iterdir():
+        if path.suffix not in SUFFIXES.values():
+            continue
+        try:
+            profiles.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            # Another worker rotated it away.
+            continue
+    profiles.sort(reverse=True)
+    for _, path in profiles[keep:]:
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def profiled(name: str, enabled: bool = True) -> Iterator[Path | None]:
+    """Profile the block when *enabled*; yields the profile's path or None."""
+    if not enabled or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    try:
+        path = profile_path(name)
+        if PROFILE_MODE == "cprofile":
+            profiler = cProfile.Profile()
+            start, stop, save = profiler.enable, profiler.disable, profiler.dump_stats
+        else:
+            sampler = StackSampler(
+                threading.get_ident(), PROFILE_SAMPLE_INTERVAL_SECONDS
+            )
+            start, stop, save = sampler.start, sampler.stop, sampler.dump
+
+        start()
+        try:
+            yield path
+        finally:
+            stop()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                save(path)
+                rotate(path.parent, PROFILE_MAX_FILES)
+            except OSError:
+                logger.exception("Could not save profile %s", path)
+    finally:
+        _active.release()
@@ -10,6 +10,9 @@ import yt_dlp
 from curl_cffi import requests as curl_requests
 from parsel import Selector
 
+from core.services.metrics import timed
+from core.utils import instagram_url
+
 logger = logging.getLogger(__name__)
 
 MEDIA_DIR = Path(__file__).resolve().parent.parent.parent / "media"
@@ -65,7 +68,11 @@ def _download_file(url: str, save_path: Path) -> Path:
 
 def get_reel_metadata(url: str) -> dict:
     """Fetches metadata for a reel without downloading it."""
-    from core.constants import INSTAGRAM_COOKIES_PATH
+    from core.constants import INSTAGRAM_BASE_URL, INSTAGRAM_COOKIES_PATH
+
+    if INSTAGRAM_BASE_URL:
+        # yt-dlp only knows the real site; a stand-in reel's id is its shortcode.
+        return {"id": _extract_shortcode(url), "title": None}
 
     cookies_path = Path(INSTAGRAM_COOKIES_PATH)
     ydl_opts = {
@@ -88,6 +95,7 @@ def get_reel_metadata(url: str) -> dict:
 # ---------------------------------------------------------------------------
 
 
+@timed("download_reel")
 def download_reel(url: str) -> Path:
     """
     Downloads an Instagram reel and returns the video file path.
@@ -103,7 +111,7 @@ def download_reel(url: str) -> Path:
 
     logger.info("Starting reel download: %s  (shortcode=%s)", url, shortcode)
 
-    resp = curl_requests.get(url, impersonate="chrome")
+    resp = curl_requests.get(instagram_url(url), impersonate="chrome")
     if resp.status_code != 200:
         raise RuntimeError(
             f"Failed to fetch reel page (HTTP {resp.status_code}): {url}"
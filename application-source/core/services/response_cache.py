@@ -0,0 +1,170 @@
+"""Persistent cache of parsed Gemini responses.
+
+Entries are keyed by (content hash, model, prompt version), so reprocessing
+the same audio or image set after a failure, deletion or manual re-analysis
+returns instantly without spending quota. Bump a module's prompt version
+constant whenever its prompt changes. The table is bounded by
+GEMINI_RESPONSE_CACHE_MAX_BYTES with least-recently-used eviction.
+"""
+
+import hashlib
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from core.constants import GEMINI_RESPONSE_CACHE_MAX_BYTES
+from core.models import GeminiResponseCache
+from core.services.audio_hash import HASH_CHUNK_SIZE
+from core.services.metrics import observe_cache
+
+logger = logging.getLogger(__name__)
+
+
+def hash_files(paths: list[Path]) -> str:
+    """sha256 over the ordered contents of several files (e.g. post slides)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        file_digest = hashlib.sha256()
+        with path.open("rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                file_digest.update(chunk)
+        digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+
+def lookup(content_hash: str, model: str, prompt_version: str) -> dict | None:
+    """Return the cached response and mark it as recently used."""
+    entries = GeminiResponseCache.objects.filter(
+        content_hash=content_hash, model=model, prompt_version=prompt_version
+    )
+    entry = entries.first()
+    if entry is None:
+        return None
+    entries.update(last_used_at=timezone.now(), hits=F("hits") + 1)
+    return entry.response
+
+
+def store(content_hash: str, model: str, prompt_version: str, response: dict) -> None:
+    """Save a response and evict old entries beyond the size budget."""
+    size = len(json.dumps(response, ensure_ascii=False).encode())
+    values = {"response": response, "size_bytes": size, "last_used_at": timezone.now()}
+    # Insert first and only update on a conflict: update_or_create reads
+    # before writing, and on SQLite a transaction that upgrades its read lock
+    # fails with "database is locked" instead of waiting for other writers.
+    try:
+        with transaction.atomic():
+            GeminiResponseCache.objects.create(
+                content_hash=content_hash,
+                model=model,
+                prompt_version=prompt_version,
+                **values,
+            )
+    except IntegrityError:
+        # Already cached, e.g. by a concurrent worker; keep the newer response.
+        GeminiResponseCache.objects.filter(
+            content_hash=content_hash, model=model, prompt_version=prompt_version
+        ).update(**values)
+        return
+    evict(GEMINI_RESPONSE_CACHE_MAX_BYTES)
+
+
+def cached_response(
+    content_hash: str | None,
+    model: str,
+    prompt_version: str,
+    compute: Callable[[], dict],
+) -> dict:
+    """Return the cached response for this key or compute and cache it."""
+    if not content_hash or GEMINI_RESPONSE_CACHE_MAX_BYTES <= 0:
+        return compute()
+
+    cached = lookup(content_hash, model, prompt_version)
+    observe_cache("gemini_response", cached is not None)
+    if cached is not None:
+        logger.info(
+            "Gemini response cache hit (%s, %s)", prompt_version, content_hash[:12]
+        )
+        return cached
+
+    response = compute()
+    store(content_hash, model, prompt_version, response)
+    return response
+
+
+async def cached_response_async(
+    content_hash: str | None,
+    model: str,
+    prompt_version: str,
+    compute: Callable[[], Awaitable[dict]],
+) -> dict:
+    """cached_response() for coroutines; the ORM work runs off the loop."""
+    if not content_hash or GEMINI_RESPONSE_CACHE_MAX_BYTES <= 0:
+        return await compute()
+
+    cached = await sync_to_async(lookup)(content_hash, model, prompt_version)
+    observe_cache("gemini_response", cached is not None)
+    if cached is not None:
+        logger.info(
+            "Gemini response cache hit (%s, %s)", prompt_version, content_hash[:12]
+        )
+        return cached
+
+    response = await compute()
+    await sync_to_async(store)(content_hash, model, prompt_version, response)
+    return response
+
+
+def evict(max_bytes: int) -> int:
+    """Delete least recently used entries until the cache fits in max_bytes."""
+    total = GeminiResponseCache.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+    if total <= max_bytes:
+        return 0
+
+    doomed = []
+    for pk, size in GeminiResponseCache.objects.order_by("last_used_at").values_list(
+        "pk", "size_bytes"
+    ):
+        if total <= max_bytes:
+            break
+        doomed.append(pk)
+        total -= size
+
+    GeminiResponseCache.objects.filter(pk__in=doomed).delete()
+    logger.info("Evicted %d Gemini cache entries", len(doomed))
+    return len(doomed)
+
+
+def prune(unused_since: datetime | None = None, max_bytes: int | None = None) -> int:
+    """Drop entries unused since a cutoff, then evict down to max_bytes."""
+    removed = 0
+    if unused_since is not None:
+        removed, _ = GeminiResponseCache.objects.filter(
+            last_used_at__lt=unused_since
+        ).delete()
+    return removed + evict(GEMINI_RESPONSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+
+def cache_stats() -> dict:
+    """Entry count, size and hit totals, overall and per prompt version."""
+    totals = GeminiResponseCache.objects.aggregate(
+        entries=Count("pk"), size_bytes=Sum("size_bytes"), hits=Sum("hits")
+    )
+    per_prompt = (
+        GeminiResponseCache.objects.values("model", "prompt_version")
+        .annotate(entries=Count("pk"), size_bytes=Sum("size_bytes"), hits=Sum("hits"))
+        .order_by("prompt_version", "model")
+    )
+    return {
+        "entries": totals["entries"],
+        "size_bytes": totals["size_bytes"] or 0,
+        "hits": totals["hits"] or 0,
+        "max_bytes": GEMINI_RESPONSE_CACHE_MAX_BYTES,
+        "per_prompt": list(per_prompt),
+    }
@@ -0,0 +1,185 @@
+"""Per-job traces: where the time of one reel or post went.
+
+``trace_job()`` starts a trace for a ``ReelInsight`` job and puts it in a
+context variable, so every ``span()`` opened further down the call stack
+(pipeline stages, service calls, post download strategies, Gemini attempts on
+each key) is recorded against it without passing anything around. Outside a
+trace ``span()`` does nothing. Work handed to a thread pool keeps the trace
+when wrapped with ``in_current_trace()``.
+
+When the job ends the trace is saved as one ``JobTrace`` row whose ``spans``
+list holds, per span, ``[name, parent, start_ms, duration_ms, ok, attrs]``
+(``parent`` is the index of the enclosing span or -1). Only the newest
+JOB_TRACE_MAX_ROWS traces are kept.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TypeVar
+
+from django.utils import timezone
+
+from core.constants import JOB_TRACE_MAX_ROWS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Positions in a stored span.
+NAME, PARENT, START_MS, DURATION_MS, OK, ATTRS = range(6)
+
+
+@dataclass
+class Trace:
+    """Spans recorded so far for one job."""
+
+    insight_id: int | None
+    url: str
+    kind: str
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started_at: datetime = field(default_factory=timezone.now)
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[list] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def open_span(self, name: str, parent: int, attrs: dict) -> int:
+        with self._lock:
+            self.spans.append([name, parent, self.elapsed_ms(), None, None, attrs])
+            return len(self.spans) - 1
+
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "job_trace", default=None
+)
+_parent: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "job_trace_parent", default=-1
+)
+
+
+def current_trace_id() -> str | None:
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[dict]:
+    """Record the enclosed block in the current trace, if there is one.
+
+    Yields the span's attributes; values added to it inside the block (e.g.
+    an outcome) are stored with the span.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield attrs
+        return
+
+    index = trace.open_span(name, _parent.get(), attrs)
+    token = _parent.set(index)
+    ok = False
+    try:
+        yield attrs
+        ok = True
+    finally:
+        _parent.reset(token)
+        record = trace.spans[index]
+        record[DURATION_MS] = round(trace.elapsed_ms() - record[START_MS], 1)
+        record[OK] = ok
+        record[ATTRS] = {key: str(value) for key, value in attrs.items()}
+
+
+def in_current_trace(func: Callable[..., T]) -> Callable[..., T]:
+    """Wrap *func* so calls on other threads are recorded in this trace."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered once at a time; pool threads each
+        # get their own copy.
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+@contextmanager
+def trace_job(insight_id: int | None, url: str, kind: str) -> Iterator[Trace]:
+    """Trace one reel/post job and save it when the block exits."""
+    trace = Trace(insight_id=insight_id, url=url, kind=kind)
+    if JOB_TRACE_MAX_ROWS <= 0:
+        yield trace
+        return
+
+    token = _trace.set(trace)
+    parent_token = _parent.set(-1)
+    ok = False
+    try:
+        yield trace
+        ok = True
+    finally:
+        _parent.reset(parent_token)
+        _trace.reset(token)
+        try:
+            save_trace(trace, ok)
+        except Exception:
+            logger.exception("Could not save trace %s", trace.trace_id)
+
+
+def save_trace(trace: Trace, ok: bool) -> None:
+    """Store *trace* and drop the oldest beyond JOB_TRACE_MAX_ROWS."""
+    from core.models import JobTrace
+
+    JobTrace.objects.create(
+        trace_id=trace.trace_id,
+        insight_id=trace.insight_id,
+        kind=trace.kind,
+        source_url=trace.url,
+        started_at=trace.started_at,
+        duration_ms=round(trace.elapsed_ms()),
+        ok=ok,
+        spans=trace.spans,
+    )
+    oldest_kept = (
+        JobTrace.objects.order_by("-id")
+        .values_list("id", flat=True)[JOB_TRACE_MAX_ROWS - 1 : JOB_TRACE_MAX_ROWS]
+        .first()
+    )
+    if oldest_kept is not None:
+        JobTrace.objects.filter(id__lt=oldest_kept).delete()
+
+
+def slowest_traces(limit: int = 10, since=None):
+    """The *limit* slowest stored traces, optionally started after *since*."""
+    from core.models import JobTrace
+
+    traces = JobTrace.objects.all()
+    if since is not None:
+        traces = traces.filter(started_at__gte=since)
+    return traces.order_by("-duration_ms")[:limit]
+
+
+def waterfall(trace) -> list[dict]:
+    """A stored trace's spans in start order, each with its nesting depth."""
+    depths: list[int] = []
+    rows = []
+    for name, parent, start_ms, duration_ms, ok, attrs in trace.spans:
+        depth = depths[parent] + 1 if parent >= 0 else 0
+        depths.append(depth)
+        rows.append(
+            {
+                "name": name,
+                "depth": depth,
+                "start_ms": start_ms,
+                "duration_ms": duration_ms,
+                "ok": ok,
+                "attrs": attrs,
+            }
+        )
+    return sorted(rows, key=lambda row: row["start_ms"])
@@ -0,0 +1,36 @@
+"""Local stand-ins for Gemini and Instagram, for offline load tests.
+
+``GeminiStandIn`` speaks enough of the Gemini REST API for the SDK
+(generateContent, streamGenerateContent and the Files API) with configurable
+latency, quota errors, server errors and malformed JSON. ``InstagramStandIn``
+serves reel pages, embed pages and CDN media, either recorded files or
+synthetic ones generated per shortcode.
+
+Point GEMINI_BASE_URL and INSTAGRAM_BASE_URL at them (see
+``manage.py run_standins``) and the whole pipeline runs without leaving the
+host. Both draw their randomness from a seeded generator so a run can be
+repeated exactly.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer
+
+from core.standins.gemini import GeminiBehavior, GeminiStandIn
+from core.standins.instagram import InstagramBehavior, InstagramStandIn
+
+__all__ = [
+    "GeminiBehavior",
+    "GeminiStandIn",
+    "InstagramBehavior",
+    "InstagramStandIn",
+    "serve_in_background",
+]
+
+
+def serve_in_background(server: ThreadingHTTPServer) -> threading.Thread:
+    """Run *server* on a daemon thread; stop it with ``server.shutdown()``."""
+    thread = threading.Thread(
+        target=server.serve_forever, name=type(server).__name__, daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,81 @@
+"""Shared plumbing for the stand-in HTTP servers."""
+
+import logging
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a seeded random source and outcome counts."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], handler, seed: int) -> None:
+        super().__init__(address, handler)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.outcomes: Counter = Counter()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def jittered(self, seconds: float, jitter: float) -> float:
+        """*seconds* ± up to *jitter*, never negative."""
+        if not jitter:
+            return max(0.0, seconds)
+        with self._lock:
+            return max(0.0, seconds + self._random.uniform(-jitter, jitter))
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler that logs through ``logging`` instead of stderr."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_body(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def start_chunked(self, status: int, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data: bytes) -> None:
+        """One chunk of a chunked response; empty *data* ends the body."""
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
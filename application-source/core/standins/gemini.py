@@ -0,0 +1,287 @@
+"""Fake Gemini REST endpoint.
+
+Handles ``models/{model}:generateContent``, ``:streamGenerateContent``
+(server-sent events) and the resumable Files API upload, get and delete the
+SDK uses. Each generate request sleeps for the configured latency and then,
+by seeded dice roll, answers with a 429 quota error (with a retryDelay
+hint), a 503, a truncated JSON body, or a JSON object filled in from the
+request's ``responseSchema``.
+"""
+
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+
+from core.standins.base import StandInHandler, StandInServer
+
+GENERATE_RE = re.compile(
+    r"/v1beta/models/(?P<model>[^/:]+)"
+    r":(?P<method>generateContent|streamGenerateContent)"
+)
+FILE_RE = re.compile(r"/v1beta/(?P<name>files/[A-Za-z0-9_-]+)")
+UPLOAD_PATH = "/upload/v1beta/files"
+
+# Uploaded files "expire" like real ones do.
+FILE_TTL = timedelta(hours=48)
+
+# Used when a request carries no responseSchema.
+DEFAULT_FIELDS = {
+    "language": "STRING",
+    "transcript_native": "STRING",
+    "transcript_english": "STRING",
+    "triggers": "ARRAY",
+    "title": "STRING",
+}
+
+
+@dataclass(frozen=True)
+class GeminiBehavior:
+    """How the fake Gemini behaves; rates are fractions of generate calls."""
+
+    latency_seconds: float = 1.0
+    jitter_seconds: float = 0.0
+    quota_error_rate: float = 0.0
+    server_error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    retry_delay_seconds: int = 5
+    stream_chunks: int = 4
+    seed: int = 0
+
+
+def _error_body(code: int, status: str, message: str, details=None) -> bytes:
+    error = {"code": code, "message": message, "status": status}
+    if details:
+        error["details"] = details
+    return json.dumps({"error": error}).encode()
+
+
+def _sample_value(name: str, schema: dict, serial: int):
+    kind = str(schema.get("type", "STRING")).upper()
+    if kind == "ARRAY":
+        item = schema.get("items") or {"type": "STRING"}
+        return [_sample_value(f"{name} {i}", item, serial) for i in (1, 2)]
+    if kind == "OBJECT":
+        return _sample_object(schema, serial)
+    if kind in {"INTEGER", "NUMBER"}:
+        return serial
+    if kind == "BOOLEAN":
+        return True
+    if name == "language":
+        return "en"
+    return f"Stand-in {name.replace('_', ' ')} #{serial}"
+
+
+def _sample_object(schema: dict | None, serial: int) -> dict:
+    properties = (schema or {}).get("properties")
+    if not properties:
+        properties = {name: {"type": kind} for name, kind in DEFAULT_FIELDS.items()}
+    return {
+        name: _sample_value(name, prop, serial) for name, prop in properties.items()
+    }
+
+
+def _response_chunk(text: str, model: str, prompt_tokens: int, final: bool) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    output_tokens = max(1, len(text) // 4)
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+        "modelVersion": model,
+    }
+
+
+def _split(text: str, parts: int) -> list[str]:
+    size = max(1, -(-len(text) // max(1, parts)))
+    return [text[i : i + size] for i in range(0, len(text), size)] or [""]
+
+
+class GeminiStandIn(StandInServer):
+    """In-process fake of the Gemini API; ``base_url`` goes in GEMINI_BASE_URL."""
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        behavior: GeminiBehavior | None = None,
+    ) -> None:
+        self.behavior = behavior or GeminiBehavior()
+        super().__init__(address, _GeminiHandler, self.behavior.seed)
+        self._serial = count(1)
+        self._files: dict[str, dict] = {}
+        self._uploads: dict[str, dict] = {}
+        self._files_lock = threading.Lock()
+
+    def next_serial(self) -> int:
+        return next(self._serial)
+
+    def draw_outcome(self) -> str:
+        """Pick "quota", "unavailable", "malformed" or "ok" for one call."""
+        b = self.behavior
+        roll = self.random()
+        for outcome, rate in (
+            ("quota", b.quota_error_rate),
+            ("unavailable", b.server_error_rate),
+            ("malformed", b.malformed_rate),
+        ):
+            if roll < rate:
+                return outcome
+            roll -= rate
+        return "ok"
+
+    def start_upload(self, metadata: dict, mime_type: str) -> str:
+        upload_id = f"upload-{self.next_serial()}"
+        with self._files_lock:
+            self._uploads[upload_id] = {"metadata": metadata, "mime_type": mime_type}
+        return upload_id
+
+    def finish_upload(self, upload_id: str, size: int) -> dict | None:
+        with self._files_lock:
+            upload = self._uploads.pop(upload_id, None)
+            if upload is None:
+                return None
+            name = f"files/standin{self.next_serial()}"
+            now = datetime.now(timezone.utc)
+            record = {
+                "name": name,
+                "mimeType": upload["mime_type"],
+                "sizeBytes": str(size),
+                "createTime": now.isoformat(),
+                "expirationTime": (now + FILE_TTL).isoformat(),
+                "uri": f"{self.base_url}/v1beta/{name}",
+                "state": "ACTIVE",
+            }
+            self._files[name] = record
+            return record
+
+    def get_file(self, name: str) -> dict | None:
+        with self._files_lock:
+            return self._files.get(name)
+
+    def delete_file(self, name: str) -> bool:
+        with self._files_lock:
+            return self._files.pop(name, None) is not None
+
+
+class _GeminiHandler(StandInHandler):
+    server: GeminiStandIn
+
+    def _json(self, status: int, payload: dict | bytes, headers=None) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_body(status, body, "application/json; charset=UTF-8", headers)
+
+    def _not_found(self) -> None:
+        self._json(404, _error_body(404, "NOT_FOUND", f"{self.path} not found"))
+
+    def do_POST(self):
+        body = self.read_body()
+        path = urlsplit(self.path).path
+        if path == UPLOAD_PATH:
+            self._upload(body)
+            return
+        match = GENERATE_RE.fullmatch(path)
+        if not match:
+            self._not_found()
+            return
+        self._generate(
+            match["model"], match["method"] == "streamGenerateContent", body
+        )
+
+    def do_GET(self):
+        match = FILE_RE.fullmatch(urlsplit(self.path).path)
+        record = match and self.server.get_file(match["name"])
+        if not record:
+            self._not_found()
+            return
+        self._json(200, record)
+
+    def do_DELETE(self):
+        match = FILE_RE.fullmatch(urlsplit(self.path).path)
+        if not match or not self.server.delete_file(match["name"]):
+            self._not_found()
+            return
+        self._json(200, {})
+
+    def _upload(self, body: bytes) -> None:
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        if command == "start":
+            metadata = json.loads(body or b"{}")
+            upload_id = self.server.start_upload(
+                metadata,
+                self.headers.get("X-Goog-Upload-Header-Content-Type", ""),
+            )
+            upload_url = f"{self.server.base_url}{UPLOAD_PATH}?upload_id={upload_id}"
+            self._json(200, {}, {"X-Goog-Upload-URL": upload_url})
+            return
+
+        upload_id = parse_qs(urlsplit(self.path).query).get("upload_id", [""])[0]
+        if "finalize" not in command:
+            # Every chunk but the last: acknowledge and wait for more.
+            self._json(200, {}, {"X-Goog-Upload-Status": "active"})
+            return
+        offset = int(self.headers.get("X-Goog-Upload-Offset") or 0)
+        record = self.server.finish_upload(upload_id, offset + len(body))
+        if record is None:
+            self._not_found()
+            return
+        self._json(200, {"file": record}, {"X-Goog-Upload-Status": "final"})
+
+    def _generate(self, model: str, stream: bool, body: bytes) -> None:
+        server = self.server
+        behavior = server.behavior
+        outcome = server.draw_outcome()
+        server.count(outcome)
+
+        if outcome == "quota":
+            details = [
+                {
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": f"{behavior.retry_delay_seconds}s",
+                }
+            ]
+            self._json(
+                429,
+                _error_body(
+                    429, "RESOURCE_EXHAUSTED", "Resource has been exhausted", details
+                ),
+            )
+            return
+
+        latency = server.jittered(behavior.latency_seconds, behavior.jitter_seconds)
+        if outcome == "unavailable":
+            time.sleep(latency)
+            self._json(
+                503, _error_body(503, "UNAVAILABLE", "The model is overloaded.")
+            )
+            return
+
+        request = json.loads(body or b"{}")
+        schema = (request.get("generationConfig") or {}).get("responseSchema")
+        text = json.dumps(_sample_object(schema, server.next_serial()))
+        if outcome == "malformed":
+            text = text[: len(text) // 2]
+        prompt_tokens = max(1, len(body) // 4)
+
+        if not stream:
+            time.sleep(latency)
+            self._json(200, _response_chunk(text, model, prompt_tokens, final=True))
+            return
+
+        chunks = _split(text, behavior.stream_chunks)
+        self.start_chunked(200, "text/event-stream")
+        for index, chunk in enumerate(chunks, 1):
+            time.sleep(latency / len(chunks))
+            event = _response_chunk(
+                chunk, model, prompt_tokens, final=index == len(chunks)
+            )
+            self.write_chunk(b"data: " + json.dumps(event).encode() + b"\r\n\r\n")
+        self.write_chunk(b"")
@@ -0,0 +1,238 @@
+"""Fake Instagram pages and CDN.
+
+Serves, for any shortcode:
+
+* ``/reel/{code}/`` - a reel page whose JSON carries ``video_versions``;
+* ``/p/{code}/embed/captioned/`` - an embed page with a carousel of
+  ``post_slides`` images;
+* ``/p/{code}/`` - a post page with an ``og:image`` tag;
+* ``/media/{code}.mp4`` and ``/media/{code}_{n}.jpg`` - the media.
+
+Recorded responses take precedence: ``{recordings}/reel/{code}.html``,
+``embed/{code}.html``, ``post/{code}.html`` and ``media/{file}``. In
+recorded pages ``{{base_url}}`` is replaced with the server's URL so media
+links point back here. Without a recording, pages are generated and media
+is synthesized once per shortcode: an MP4 of pink noise seeded by the
+shortcode (so every reel has distinct audio and is not deduplicated), and
+JPEG slides in a shortcode-derived colour.
+"""
+
+import io
+import json
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from core.standins.base import StandInHandler, StandInServer
+
+REEL_RE = re.compile(r"/reels?/(?P<code>[A-Za-z0-9_-]+)/?")
+EMBED_RE = re.compile(r"/p/(?P<code>[A-Za-z0-9_-]+)/embed(/captioned)?/?")
+POST_RE = re.compile(r"/p/(?P<code>[A-Za-z0-9_-]+)/?")
+MEDIA_RE = re.compile(r"/media/(?P<name>[A-Za-z0-9_-]+\.(mp4|jpg))")
+# Checked in order: an embed URL also matches POST_RE's prefix.
+PAGE_ROUTES = (("reel", REEL_RE), ("embed", EMBED_RE), ("post", POST_RE))
+
+CONTENT_TYPES = {".mp4": "video/mp4", ".jpg": "image/jpeg"}
+
+
+@dataclass(frozen=True)
+class InstagramBehavior:
+    """How the fake Instagram behaves."""
+
+    latency_seconds: float = 0.1
+    jitter_seconds: float = 0.0
+    reel_seconds: float = 20.0
+    post_slides: int = 3
+    recordings_dir: Path | None = None
+    seed: int = 0
+
+
+def _shortcode_seed(name: str) -> int:
+    return zlib.crc32(name.encode())
+
+
+def synthesize_reel(path: Path, shortcode: str, seconds: float) -> None:
+    """Write a small MP4 whose audio is noise seeded by *shortcode*."""
+    from core.services.audio_extractor import get_ffmpeg_path
+
+    colour = f"0x{_shortcode_seed(shortcode) & 0xFFFFFF:06x}"
+    subprocess.run(
+        [
+            get_ffmpeg_path(),
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"color=c={colour}:s=360x640:r=15:d={seconds}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"anoisesrc=d={seconds}:c=pink:r=44100:a=0.3:"
+            f"s={_shortcode_seed(shortcode)}",
+            "-shortest",
+            "-c:v",
+            "mpeg4",
+            "-q:v",
+            "10",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "96k",
+            str(path),
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+def synthesize_slide(name: str) -> bytes:
+    """A 1080x1350 JPEG in a colour derived from *name*."""
+    from PIL import Image, ImageDraw
+
+    seed = _shortcode_seed(name)
+    colour = ((seed >> 16) & 0xFF, (seed >> 8) & 0xFF, seed & 0xFF)
+    image = Image.new("RGB", (1080, 1350), colour)
+    draw = ImageDraw.Draw(image)
+    for row in range(8):
+        draw.text((80, 120 + row * 140), f"{name} line {row + 1}", fill="white")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+class InstagramStandIn(StandInServer):
+    """In-process fake of Instagram; ``base_url`` goes in INSTAGRAM_BASE_URL."""
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        behavior: InstagramBehavior | None = None,
+    ) -> None:
+        self.behavior = behavior or InstagramBehavior()
+        super().__init__(address, _InstagramHandler, self.behavior.seed)
+        self._media_dir = Path(tempfile.mkdtemp(prefix="instagram-standin-"))
+        self._media_locks: dict[str, threading.Lock] = {}
+
+    def recorded(self, kind: str, name: str) -> bytes | None:
+        recordings = self.behavior.recordings_dir
+        if recordings is None:
+            return None
+        path = Path(recordings) / kind / name
+        return path.read_bytes() if path.is_file() else None
+
+    def page(self, kind: str, shortcode: str) -> bytes:
+        recorded = self.recorded(kind, f"{shortcode}.html")
+        if recorded is not None:
+            return recorded.replace(b"{{base_url}}", self.base_url.encode())
+        return _PAGES[kind](self, shortcode).encode()
+
+    def media(self, name: str) -> bytes:
+        recorded = self.recorded("media", name)
+        if recorded is not None:
+            return recorded
+
+        path = self._media_dir / name
+        with self._lock:
+            lock = self._media_locks.setdefault(name, threading.Lock())
+        with lock:
+            if not path.exists():
+                stem = path.stem
+                if path.suffix == ".mp4":
+                    synthesize_reel(path, stem, self.behavior.reel_seconds)
+                else:
+                    path.write_bytes(synthesize_slide(stem))
+        return path.read_bytes()
+
+
+def _reel_page(server: InstagramStandIn, shortcode: str) -> str:
+    data = {
+        "items": [
+            {
+                "code": shortcode,
+                "video_versions": [
+                    {"url": f"{server.base_url}/media/{shortcode}.mp4"}
+                ],
+            }
+        ]
+    }
+    return (
+        "<html><head><title>Instagram</title></head><body>"
+        f'<script type="application/json">{json.dumps(data)}</script>'
+        "</body></html>"
+    )
+
+
+def _embed_page(server: InstagramStandIn, shortcode: str) -> str:
+    edges = [
+        {
+            "node": {
+                "display_url": f"{server.base_url}/media/{shortcode}_{index}.jpg",
+                "is_video": False,
+            }
+        }
+        for index in range(max(1, server.behavior.post_slides))
+    ]
+    media = {
+        "shortcode_media": {
+            "shortcode": shortcode,
+            "display_url": edges[0]["node"]["display_url"],
+            "edge_sidecar_to_children": {"edges": edges},
+        }
+    }
+    return (
+        "<html><body>"
+        f"<script>window.__additionalData = {json.dumps(media)};</script>"
+        "</body></html>"
+    )
+
+
+def _post_page(server: InstagramStandIn, shortcode: str) -> str:
+    image_url = f"{server.base_url}/media/{shortcode}_0.jpg"
+    return (
+        "<html><head>"
+        f'<meta property="og:image" content="{image_url}" />'
+        "</head><body></body></html>"
+    )
+
+
+_PAGES = {"reel": _reel_page, "embed": _embed_page, "post": _post_page}
+
+
+class _InstagramHandler(StandInHandler):
+    server: InstagramStandIn
+
+    def do_GET(self):
+        server = self.server
+        behavior = server.behavior
+        path = urlsplit(self.path).path
+        latency = server.jittered(behavior.latency_seconds, behavior.jitter_seconds)
+        time.sleep(latency)
+
+        for kind, pattern in PAGE_ROUTES:
+            match = pattern.fullmatch(path)
+            if match:
+                server.count(kind)
+                self.send_body(
+                    200, server.page(kind, match["code"]), "text/html; charset=utf-8"
+                )
+                return
+
+        match = MEDIA_RE.fullmatch(path)
+        if match:
+            name = match["name"]
+            server.count("media")
+            self.send_body(200, server.media(name), CONTENT_TYPES[Path(name).suffix])
+            return
+
+        server.count("not_found")
+        self.send_body(404, b"Not found", "text/plain")
+
+    do_HEAD = do_GET
@@ -18,5 +18,7 @@ urlpatterns = [
     path("favicon.ico", views.favicon, name="favicon"),
     path("api/process-reel/", views.process_reel),
     path("api/task-status/<int:insight_id>/", views.check_task_status),
+    path("api/task-trace/<int:insight_id>/", views.task_trace),
+    path("api/traces/slowest/", views.slowest_jobs),
     path("api/recall/daily/", views.daily_recall),
 ]
@@ -33,3 +33,16 @@ def parse_first_json(text: str) -> dict | None:
         pass
 
     return None
+
+
+def instagram_url(url: str) -> str:
+    """Return *url* re-pointed at INSTAGRAM_BASE_URL when a stand-in is set."""
+    from urllib.parse import urlsplit
+
+    from core.constants import INSTAGRAM_BASE_URL
+
+    if not INSTAGRAM_BASE_URL:
+        return url
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{INSTAGRAM_BASE_URL.rstrip('/')}{parts.path}{query}"
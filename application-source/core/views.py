@@ -2,8 +2,9 @@
 
 import json
 import logging
+import math
 import traceback
-from datetime import date
+from datetime import date, timedelta
 from pathlib import Path
 
 from django.conf import settings
@@ -12,15 +13,29 @@ from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from core.models import ReelInsight
-from core.services.audio_extractor import extract_audio_for_gemini
-from core.services.audio_hash import compute_audio_hash
+
+from core.constants import (
+    AUDIO_FINGERPRINT_ENABLED,
+    AUDIO_PROFILE,
+    AUDIO_STREAM_COPY,
+    AUDIO_TRIM_SILENCE,
+    CHUNKED_TRANSCRIBE_MIN_SECONDS,
+    GEMINI_STREAM_PARTIALS,
+)
+from core.models import JobTrace, ReelInsight
+from core.services.audio_extractor import extract_audio_artifact
 from core.services.email_error import send_error_email
-from core.services.gemini_transcriber import gemini_transcribe
-from core.services.post_gemini import extract_post_text
-from core.services.post_text_aggregator import download_instagram_post
+from core.services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from core.services.metrics import JOB_SECONDS, observe_cache, render_metrics
+from core.services.pipeline_stages import stage
+from core.services.profiling import profiled, should_profile
 from core.services.recall import get_daily_triggers
-from core.services.reel_downloader import download_reel, get_reel_metadata
+from core.services.tracing import slowest_traces, trace_job, waterfall
+
+# The download and Gemini services pull in yt-dlp, instaloader, curl_cffi and
+# google-genai, which dominate import time. They are imported inside the
+# functions that need them so the UI, health check and cron commands never
+# pay for them (guarded by tests/core/services/test_import_timing.py).
 
 logger = logging.getLogger(__name__)
 FAVICON_PATH = Path(__file__).resolve().parent.parent / "static" / "favicon.png"
@@ -71,50 +86,134 @@ def _is_instagram_post_url(url: str) -> bool:
     return "/p/" in url
 
 
+def _reuse_existing(insight: ReelInsight, existing: ReelInsight):
+    insight.original_language = existing.original_language
+    insight.transcript_original = existing.transcript_original
+    insight.transcript_english = existing.transcript_english
+    insight.triggers = existing.triggers
+    insight.title = existing.title
+    insight.processed_at = timezone.now()
+    insight.audio_hash = None # Clear instead of duplicate to avoid IntegrityError (unique=True)
+    insight.save()
+
+
+def _fingerprint(audio_path: Path) -> list[tuple[int, int]]:
+    """Fingerprint the extracted audio; a failure only skips near-duplicate dedup."""
+    from core.services.audio_fingerprint import fingerprint_file
+
+    try:
+        return fingerprint_file(audio_path)
+    except Exception:
+        logger.warning("Audio fingerprinting failed; skipping", exc_info=True)
+        return []
+
+
+def _partial_saver(insight_id: int):
+    """Callback storing streamed Gemini fields for the status endpoint."""
+
+    def save(fields: dict) -> None:
+        ReelInsight.objects.filter(pk=insight_id).update(partial_result=fields)
+
+    return save
+
+
 def process_reel_task(insight_id: int, url: str):
     """Synchronously process a reel/post."""
+    kind = "post" if _is_instagram_post_url(url) else "reel"
+    with (
+        profiled("process_reel_task", should_profile()),
+        JOB_SECONDS.time(kind=kind),
+        trace_job(insight_id, url, kind),
+    ):
+        _process_reel_task(insight_id, url)
+
+
+def _process_reel_task(insight_id: int, url: str):
+    from core.services.audio_fingerprint import find_near_duplicate, index_fingerprints
     from core.services.email_new_reel import send_new_reel_email
+    from core.services.gemini_transcriber import (
+        gemini_transcribe,
+        gemini_transcribe_long,
+    )
+    from core.services.post_gemini import extract_post_text
+    from core.services.post_text_aggregator import download_instagram_post
+    from core.services.reel_downloader import download_reel
+    from core.services.response_cache import hash_files
 
     insight = ReelInsight.objects.get(pk=insight_id)
     video_path = None
     audio_path = None
+    landmarks: list[tuple[int, int]] = []
     image_paths: list[Path] = []
 
     try:
         if _is_instagram_post_url(url):
-            image_paths = download_instagram_post(url)
-            result = extract_post_text(image_paths)
+            with stage("download"):
+                image_paths = download_instagram_post(url)
+            with stage("hash"):
+                images_hash = hash_files(image_paths)
+            with stage("ai_call"):
+                result = extract_post_text(image_paths, images_hash)
             language = result["language"]
             transcript_original = result["transcript_native"]
             transcript_english = result["transcript_english"]
             triggers_list = result.get("triggers", [])
             title = result.get("title", "New Post Processed")
         else:
-            video_path = download_reel(url)
-            audio_path = extract_audio_for_gemini(video_path)
-            audio_hash = compute_audio_hash(audio_path)
+            with stage("download"):
+                video_path = download_reel(url)
+            with stage("ffmpeg"):
+                audio = extract_audio_artifact(
+                    video_path,
+                    stream_copy=AUDIO_STREAM_COPY,
+                    profile=AUDIO_PROFILE,
+                    trim_silence=AUDIO_TRIM_SILENCE,
+                )
+            audio_path = audio["path"]
+            # Hashed while ffmpeg wrote the file; never re-read it here.
+            audio_hash = audio["audio_hash"]
 
             # Secondary dedup check
-            existing = (
-                ReelInsight.objects.filter(audio_hash=audio_hash)
-                .exclude(pk=insight_id)
-                .first()
-            )
+            with stage("dedup_query"):
+                existing = (
+                    ReelInsight.objects.filter(audio_hash=audio_hash)
+                    .exclude(pk=insight_id)
+                    .first()
+                )
+            observe_cache("audio_hash", existing is not None)
             if existing:
                 logger.info(
                     "Found duplicate by hash in background, switching to existing"
                 )
-                insight.original_language = existing.original_language
-                insight.transcript_original = existing.transcript_original
-                insight.transcript_english = existing.transcript_english
-                insight.triggers = existing.triggers
-                insight.title = existing.title
-                insight.processed_at = timezone.now()
-                insight.audio_hash = None # Clear instead of duplicate to avoid IntegrityError (unique=True)
-                insight.save()
+                _reuse_existing(insight, existing)
                 return
 
-            result = gemini_transcribe(str(audio_path))
+            # Near-duplicate check: re-encoded or trimmed reposts of a reel.
+            if AUDIO_FINGERPRINT_ENABLED:
+                with stage("fingerprint"):
+                    landmarks = _fingerprint(audio_path)
+                    existing = find_near_duplicate(landmarks, exclude_id=insight_id)
+                observe_cache("fingerprint", existing is not None)
+                if existing:
+                    logger.info(
+                        "Found near-duplicate by fingerprint, switching to existing"
+                    )
+                    _reuse_existing(insight, existing)
+                    return
+
+            duration = audio["duration_seconds"]
+            with stage("ai_call"):
+                if duration and duration >= CHUNKED_TRANSCRIBE_MIN_SECONDS:
+                    result = gemini_transcribe_long(
+                        str(audio_path), duration, audio_hash
+                    )
+                else:
+                    result = gemini_transcribe(
+                        str(audio_path),
+                        audio_hash,
+                        _partial_saver(insight_id) if GEMINI_STREAM_PARTIALS else None,
+                        duration_seconds=duration,
+                    )
             language = result["language"]
             transcript_original = result["transcript_native"]
             transcript_english = result["transcript_english"]
@@ -126,13 +225,18 @@ def process_reel_task(insight_id: int, url: str):
         insight.transcript_english = transcript_english
         insight.triggers = "\n".join(triggers_list)
         insight.title = title
+        insight.partial_result = None
         insight.processed_at = timezone.now()
 
         if audio_path:
-            insight.audio_hash = compute_audio_hash(audio_path)
+            insight.audio_hash = audio["audio_hash"]
+            insight.audio_trimmed_seconds = audio["trimmed_seconds"]
             setattr(insight, "audio_path_for_email", str(audio_path))
 
-        insight.save()
+        with stage("db_save"):
+            insight.save()
+            if landmarks:
+                index_fingerprints(insight, landmarks)
 
         send_new_reel_email(insight, getattr(insight, "audio_path_for_email", None))
         logger.info("Background processing complete for insight %s", insight_id)
@@ -167,7 +271,9 @@ def process_reel(request):
             return _error("Valid Instagram URL required", 400)
 
         # Cache check by URL
-        existing = ReelInsight.objects.filter(source_url=url).first()
+        with stage("dedup_query"):
+            existing = ReelInsight.objects.filter(source_url=url).first()
+        observe_cache("url", existing is not None)
         if existing:
             if existing.processed_at:
                 return JsonResponse(
@@ -189,11 +295,18 @@ def process_reel(request):
         # Metadata check (source_id)
         source_id = None
         if not _is_instagram_post_url(url):
+            from core.services.reel_downloader import get_reel_metadata
+
             try:
-                meta = get_reel_metadata(url)
+                with stage("metadata"):
+                    meta = get_reel_metadata(url)
                 source_id = meta.get("id")
                 if source_id:
-                    existing = ReelInsight.objects.filter(source_id=source_id).first()
+                    with stage("dedup_query"):
+                        existing = ReelInsight.objects.filter(
+                            source_id=source_id
+                        ).first()
+                    observe_cache("source_id", existing is not None)
                     if existing:
                         if existing.processed_at:
                             return JsonResponse(
@@ -266,11 +379,50 @@ def check_task_status(_request, insight_id):
                     "language": insight.original_language,
                 }
             )
-        return JsonResponse({"status": "processing"})
+        response = {"status": "processing"}
+        if insight.partial_result:
+            response["partial"] = insight.partial_result
+        return JsonResponse(response)
     except ReelInsight.DoesNotExist:
         return _error("Insight not found", 404)
 
 
+def _trace_summary(trace: JobTrace) -> dict:
+    return {
+        "trace_id": trace.trace_id,
+        "insight_id": trace.insight_id,
+        "kind": trace.kind,
+        "url": trace.source_url,
+        "started_at": trace.started_at.isoformat(),
+        "duration_ms": trace.duration_ms,
+        "ok": trace.ok,
+    }
+
+
+def task_trace(_request, insight_id):
+    """API endpoint returning the span waterfall of a job's latest trace."""
+    trace = JobTrace.objects.filter(insight_id=insight_id).order_by("-id").first()
+    if trace is None:
+        return _error("Trace not found", 404)
+    return JsonResponse({**_trace_summary(trace), "spans": waterfall(trace)})
+
+
+def slowest_jobs(request):
+    """API endpoint listing the slowest traced jobs (``?limit=``, ``?days=``)."""
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 100)
+        since = None
+        if days := request.GET.get("days"):
+            days = float(days)
+            if not math.isfinite(days) or days < 0:
+                raise ValueError(days)
+            since = timezone.now() - timedelta(days=days)
+    except (ValueError, OverflowError):
+        return _error("limit and days must be non-negative numbers", 400)
+    traces = slowest_traces(limit, since)
+    return JsonResponse({"jobs": [_trace_summary(trace) for trace in traces]})
+
+
 def daily_recall(_request):
     """Return the latest recall triggers in JSON."""
     triggers = get_daily_triggers(limit=5)
@@ -283,8 +435,21 @@ def daily_recall(_request):
     )
 
 
+def metrics(_request):
+    """Expose processing metrics in the Prometheus text format."""
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
 def health_check(_request):
     """Report basic health status for the API."""
+    from core.services.ffmpeg_governor import GOVERNOR
+    from core.services.model_router import ROUTER
+
     return JsonResponse(
-        {"status": "healthy", "message": "Trigger Engine API is running"}
+        {
+            "status": "healthy",
+            "message": "Trigger Engine API is running",
+            "ffmpeg": GOVERNOR.stats(),
+            "gemini_models": ROUTER.stats(),
+        }
     )
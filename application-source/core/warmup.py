@@ -0,0 +1,77 @@
+"""Pre-fork warmup for the gunicorn master process.
+
+With ``preload_app`` the master imports Django once and every worker is
+forked from it, sharing those pages copy-on-write. ``warm_up`` loads the
+remaining lazily-imported pieces (URL resolvers, templates, pipeline service
+modules) so recycled workers start ready to serve. Network clients are never
+created here; ``GeminiKeyManager`` drops its pooled clients after a fork.
+"""
+
+import gc
+import importlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_ROOT = Path(__file__).resolve().parent / "templates"
+
+# Modules that core.views imports on first use.
+SERVICE_MODULES = (
+    "core.services.reel_downloader",
+    "core.services.audio_fingerprint",
+    "core.services.post_text_aggregator",
+    "core.services.gemini_transcriber",
+    "core.services.post_gemini",
+    "core.services.email_new_reel",
+)
+
+
+def _warm_urls() -> int:
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    # Accessing reverse_dict populates the resolver's lookup tables.
+    return len(resolver.reverse_dict)
+
+
+def _warm_templates() -> int:
+    from django.template.loader import get_template
+
+    count = 0
+    for template_path in sorted(TEMPLATE_ROOT.rglob("*.html")):
+        get_template(template_path.relative_to(TEMPLATE_ROOT).as_posix())
+        count += 1
+    return count
+
+
+def _warm_services() -> int:
+    count = 0
+    for module in SERVICE_MODULES:
+        try:
+            importlib.import_module(module)
+            count += 1
+        except Exception as e:
+            # A missing API key must not stop the server from booting;
+            # the worker will raise the real error on first use.
+            logger.warning("Warmup could not import %s: %s", module, e)
+    return count
+
+
+def warm_up(freeze: bool = True) -> dict[str, int]:
+    """Load URLs, templates and service modules in the current process.
+
+    Args:
+        freeze: Move everything loaded so far into the permanent GC
+                generation so workers do not dirty the shared pages.
+    """
+    report = {
+        "url_names": _warm_urls(),
+        "templates": _warm_templates(),
+        "service_modules": _warm_services(),
+    }
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    logger.info("Warmup complete: %s", report)
+    return report
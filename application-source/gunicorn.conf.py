@@ -0,0 +1,15 @@
+"""Gunicorn settings shared by every deployment of the app.
+
+The app is imported once in the master (``preload_app``) and warmed up
+before the first fork, so workers recycled by ``--max-requests`` start
+instantly and extra workers share the master's memory copy-on-write.
+"""
+
+preload_app = True
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before workers fork."""
+    from core.warmup import warm_up
+
+    warm_up()
@@ -14,8 +14,9 @@ def mock_google_genai_client():
         # Mock the generation response
         mock_response = MagicMock()
         mock_response.text = (
-            '{"title": "Mock Title", "hashtags": "#mock #test", '
-            '"caption": "Mock Caption"}'
+            '{"language": "en", "transcript_native": "Mock transcript", '
+            '"transcript_english": "Mock transcript", "triggers": ["Mock"], '
+            '"title": "Mock Title"}'
         )
         mock_client_instance.models.generate_content.return_value = (
             mock_response
@@ -88,3 +89,41 @@ def mock_django_q_async_task():
     """Globally mocks django_q.tasks.async_task to prevent bg execution."""
     with patch("django_q.tasks.async_task") as mock_async_task:
         yield mock_async_task
+
+
+@pytest.fixture(autouse=True)
+def isolated_gemini_key_state(tmp_path):
+    """Gives every test its own Gemini key state file and fresh mock clients."""
+    from core.services.gemini_key_manager import _MANAGERS, KEY_STATE
+
+    for manager in list(_MANAGERS):
+        manager.reset_clients()
+    with patch.object(KEY_STATE, "path", str(tmp_path / "gemini-keys.sqlite3")):
+        yield KEY_STATE
+
+
+@pytest.fixture(autouse=True)
+def isolated_model_router():
+    """Starts every test without Gemini model failure history."""
+    from core.services.model_router import ROUTER
+
+    ROUTER.reset()
+    yield ROUTER
+
+
+@pytest.fixture(autouse=True)
+def isolated_key_breaker():
+    """Starts every test with every Gemini key circuit closed."""
+    from core.services.gemini_resilience import KEY_BREAKER
+
+    KEY_BREAKER.reset()
+    yield KEY_BREAKER
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics():
+    """Starts every test with every /metrics counter and histogram at zero."""
+    from core.services.metrics import REGISTRY
+
+    REGISTRY.reset()
+    yield REGISTRY
@@ -4,6 +4,7 @@ from io import StringIO
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pytest
 from django.core.management import call_command
 
 
@@ -94,3 +95,237 @@ def test_cleanup_media(tmp_path):
     mock_old.unlink.assert_called_once()
     mock_new.unlink.assert_not_called()
     assert "Deleted old.mp4" in out.getvalue()
+
+
+def test_bench_imports_strict_fails_on_heavy_module():
+    """Test bench_imports reports heavy modules and exits 1 with --strict."""
+    out = StringIO()
+    result = {
+        "module": "core.views",
+        "total_us": 2500,
+        "entries": [
+            {"module": "yt_dlp", "depth": 0, "self_us": 2000, "cumulative_us": 2000}
+        ],
+        "heavy": ["yt_dlp"],
+    }
+    with patch(
+        "core.management.commands.bench_imports.measure_import",
+        return_value=result,
+    ):
+        with pytest.raises(SystemExit):
+            call_command("bench_imports", "core.views", "--strict", stdout=out)
+
+    assert "core.views: 2.5 ms total" in out.getvalue()
+    assert "heavy modules imported: yt_dlp" in out.getvalue()
+
+
+def test_bench_audio_profiles(tmp_path):
+    """Test bench_audio_profiles reports every profile on a sample video."""
+    video = tmp_path / "sample.mp4"
+    video.write_bytes(b"video")
+
+    def fake_extract(video_path, **_kwargs):
+        audio = video_path.with_suffix(".out")
+        audio.write_bytes(b"x" * 300)
+        return audio
+
+    out = StringIO()
+    with patch(
+        "core.management.commands.bench_audio_profiles.probe_audio_stream",
+        return_value={"codec_name": "aac", "bit_rate": 128000.0, "duration": 60.0},
+    ), patch(
+        "core.management.commands.bench_audio_profiles.extract_audio_for_gemini",
+        side_effect=fake_extract,
+    ):
+        call_command("bench_audio_profiles", str(video), stdout=out)
+
+    output = out.getvalue()
+    assert "copy" in output
+    assert "opus_24k" in output
+    assert "400" in output  # base64 size of the 300-byte payload
+
+
+def test_bench_request_memory():
+    """Test bench_request_memory measures both payload modes per size."""
+    out = StringIO()
+    call_command("bench_request_memory", "--sizes", "1", stdout=out)
+
+    lines = out.getvalue().splitlines()[1:]
+    assert [line.split()[1] for line in lines] == ["base64", "bytes"]
+    # Same request size on the wire either way: 1 MiB base64-encoded.
+    assert all(line.split()[-1] == "1398104" for line in lines)
+
+
+@pytest.mark.django_db
+def test_gemini_cache_command():
+    """Test gemini_cache reports usage and prunes or clears entries."""
+    from core.services.response_cache import store
+
+    store("hash1", "models/test", "transcribe-v1", {"title": "x"})
+
+    out = StringIO()
+    call_command("gemini_cache", stdout=out)
+    assert "1 entries" in out.getvalue()
+    assert "transcribe-v1" in out.getvalue()
+
+    out = StringIO()
+    call_command("gemini_cache", "--prune", "--max-mb", "0", stdout=out)
+    assert "Pruned 1 cached responses" in out.getvalue()
+
+    store("hash2", "models/test", "transcribe-v1", {"title": "y"})
+    out = StringIO()
+    call_command("gemini_cache", "--clear", stdout=out)
+    assert "Deleted 1 cached responses" in out.getvalue()
+    assert "0 entries" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_backfill_audio_hashes(tmp_path):
+    """Test reels are rehashed and new duplicates lose their hash."""
+    from core.models import ReelInsight
+
+    def insight(url, audio_hash):
+        return ReelInsight.objects.create(
+            source_url=url,
+            original_language="en",
+            transcript_original="o",
+            transcript_english="e",
+            triggers="",
+            audio_hash=audio_hash,
+        )
+
+    first = insight("https://instagram.com/reel/a/", "old-a")
+    repost = insight("https://instagram.com/reel/b/", "old-b")
+    post = insight("https://instagram.com/p/c/", "old-c")
+
+    def extract(video_path, **_kwargs):
+        audio_path = video_path.with_suffix(".aac")
+        audio_path.write_bytes(b"audio")
+        return {"path": audio_path, "audio_hash": "new"}
+
+    def download(url):
+        video_path = tmp_path / f"{url.rstrip('/').rsplit('/', 1)[-1]}.mp4"
+        video_path.write_bytes(b"video")
+        return video_path
+
+    out = StringIO()
+    with patch(
+        "core.services.reel_downloader.download_reel", side_effect=download
+    ), patch(
+        "core.services.audio_extractor.extract_audio_artifact", side_effect=extract
+    ):
+        call_command("backfill_audio_hashes", stdout=out)
+
+    assert "2 changed, 0 unchanged, 0 failed" in out.getvalue()
+    first.refresh_from_db()
+    repost.refresh_from_db()
+    post.refresh_from_db()
+    assert first.audio_hash == "new"
+    assert repost.audio_hash is None
+    assert post.audio_hash == "old-c"
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch("google.genai.Client")
+def test_gemini_keys_command_enables_keys(_mock_client, isolated_gemini_key_state):
+    """Test gemini_keys lists disabled keys and --enable clears them."""
+    from core.services.gemini_key_manager import GeminiKeyManager, key_id
+
+    GeminiKeyManager(keys=["key1"]).disable_key("key1")
+    out = StringIO()
+
+    call_command("gemini_keys", stdout=out)
+    assert f"{key_id('key1')} -" in out.getvalue()
+    assert "disabled" in out.getvalue()
+
+    call_command("gemini_keys", "--enable", stdout=out)
+    assert "Re-enabled 1 keys" in out.getvalue()
+    assert isolated_gemini_key_state.snapshot()[key_id("key1")]["disabled_until"] == 0
+
+
+def test_bench_pipeline_summarize():
+    """Test bench_pipeline reports nearest-rank percentiles."""
+    from core.management.commands.bench_pipeline import summarize
+
+    stats = summarize([float(n) for n in range(1, 101)])
+
+    assert (stats["count"], stats["p50"], stats["p95"], stats["p99"]) == (
+        100,
+        50.0,
+        95.0,
+        99.0,
+    )
+    assert summarize([]) == {"count": 0}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_pipeline_posts_against_standins(tmp_path):
+    """Test bench_pipeline runs posts end to end and writes per-stage JSON."""
+    import json
+    from contextlib import nullcontext
+
+    from google.genai.client import Client
+
+    output = tmp_path / "results.json"
+    out = StringIO()
+    with (
+        # pytest-django already provides a test database.
+        patch(
+            "core.management.commands.bench_pipeline.throwaway_database",
+            lambda _directory: nullcontext(),
+        ),
+        patch("google.genai.Client", Client),
+        patch("core.services.post_text_aggregator.MEDIA_DIR", tmp_path),
+    ):
+        call_command(
+            "bench_pipeline",
+            "--reels", "0",
+            "--posts", "2",
+            # The in-memory test database is shared-cache: one writer at a time.
+            "--concurrency", "1",
+            "--gemini-latency", "0",
+            "--instagram-latency", "0",
+            "--output", str(output),
+            stdout=out,
+        )
+
+    results = json.loads(output.read_text())
+    assert results["jobs"]["total"] == 2
+    assert results["jobs"]["failed"] == 0
+    assert results["latency"]["post"]["count"] == 2
+    assert {"download", "hash", "ai_call", "db_save", "email_render"} <= set(
+        results["stages"]
+    )
+    assert results["standins"]["gemini"] == {"ok": 2}
+    assert "jobs/s" in out.getvalue()
+
+
+def test_profile_report_merges_profiles(tmp_path):
+    """Test profile_report sums collapsed stacks and merges .pstats files."""
+    import cProfile
+
+    (tmp_path / "a-process_reel_task.collapsed").write_text("main;work 3\nmain 1\n")
+    (tmp_path / "b-process_reel_task.collapsed").write_text("main;work 2\n")
+    (tmp_path / "c-api.recall.daily.collapsed").write_text("main;other 9\n")
+    profiler = cProfile.Profile()
+    profiler.runcall(sorted, range(10))
+    profiler.dump_stats(tmp_path / "d-process_reel_task.pstats")
+    (tmp_path / "e-process_reel_task.pstats").write_bytes(b"")
+    output = tmp_path / "merged.collapsed"
+    out = StringIO()
+
+    call_command(
+        "profile_report",
+        "--dir", str(tmp_path),
+        "--match", "process_reel_task",
+        "--output", str(output),
+        stdout=out,
+    )
+
+    assert output.read_text() == "main 1\nmain;work 5\n"
+    assert (tmp_path / "merged.pstats").exists()
+    report = out.getvalue()
+    assert "2 sampled profiles, 6 samples" in report
+    assert "83.3    83.3  work" in report
+    assert "1 cProfile profiles" in report
+    assert "Skipped unreadable profile e-process_reel_task.pstats" in report
@@ -1,15 +1,38 @@
 """Tests for the audio_extractor service."""
 
-import subprocess
+import hashlib
+import io
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from core.services.audio_extractor import (
+    SILENCE_REMOVE_FILTER,
+    audio_mime_type,
+    can_stream_copy,
+    detect_silences,
+    extract_audio_artifact,
     extract_audio_for_gemini,
     get_ffmpeg_path,
+    plan_segments,
+    probe_audio_stream,
+    split_audio_at_silence,
 )
+from core.services.audio_hash import compute_audio_hash
+
+
+def fake_popen(output: bytes = b"audio", returncode: int = 0, error: bytes = b""):
+    """Build a subprocess.Popen stand-in that streams *output* on stdout."""
+
+    def _popen(_command, **kwargs):
+        kwargs["stderr"].write(error)
+        process = MagicMock()
+        process.stdout = io.BytesIO(output)
+        process.wait.return_value = returncode
+        return process
+
+    return MagicMock(side_effect=_popen)
 
 
 def test_get_ffmpeg_path_success():
@@ -30,49 +53,405 @@ def test_get_ffmpeg_path_not_found():
     "core.services.audio_extractor.get_ffmpeg_path",
     return_value="/usr/bin/ffmpeg",
 )
-@patch("subprocess.run")
-def test_extract_audio_for_gemini_success(mock_run, _mock_get_path):
+def test_extract_audio_for_gemini_success(_mock_get_path, tmp_path):
     """Test successful audio extraction."""
-    video_path = Path("/tmp/video.mp4")
+    video_path = tmp_path / "video.mp4"
 
-    # Simulate successful subprocess run
-    mock_run.return_value = MagicMock(stdout="", stderr="", returncode=0)
+    # Simulate ffmpeg streaming the encoded audio on stdout
+    with patch("subprocess.Popen", fake_popen(b"encoded audio")) as mock_popen:
+        result_path = extract_audio_for_gemini(video_path)
 
-    result_path = extract_audio_for_gemini(video_path)
+    assert result_path == tmp_path / "video.mp3"
+    assert result_path.read_bytes() == b"encoded audio"
+    mock_popen.assert_called_once()
 
-    assert result_path == Path("/tmp/video.mp3")
-    mock_run.assert_called_once()
-
-    args, kwargs = mock_run.call_args
-    command = args[0]
+    command = mock_popen.call_args[0][0]
 
     # Assert ffmpeg arguments are constructed correctly
     assert command[0] == "/usr/bin/ffmpeg"
-    assert command[3] == "/tmp/video.mp4"
-    assert command[-1] == "/tmp/video.mp3"
-    assert kwargs.get("check") is True
+    assert command[3] == str(video_path)
+    assert command[command.index("-b:a") + 1] == "64k"
+    assert command[command.index("-f") + 1] == "mp3"
+    assert command[-3] == "-threads"
+    assert command[-1] == "pipe:1"
 
 
 @patch(
     "core.services.audio_extractor.get_ffmpeg_path",
     return_value="/usr/bin/ffmpeg",
 )
-@patch("subprocess.run")
-def test_extract_audio_for_gemini_failure(mock_run, _mock_get_path):
+def test_extract_audio_for_gemini_failure(_mock_get_path, tmp_path):
     """Test audio extraction failure handling."""
-    video_path = Path("/tmp/video.mp4")
+    video_path = tmp_path / "video.mp4"
 
     # Simulate a subprocess failure
-    process_error = subprocess.CalledProcessError(
-        returncode=1,
-        cmd=["ffmpeg"],
-        output="Standard out text",
-        stderr="Standard error text",
+    with patch(
+        "subprocess.Popen",
+        fake_popen(b"partial", returncode=1, error=b"Standard error text"),
+    ):
+        with pytest.raises(RuntimeError, match="ffmpeg failed") as excinfo:
+            extract_audio_for_gemini(video_path)
+
+    assert "Standard error text" in str(excinfo.value)
+    assert not (tmp_path / "video.mp3").exists()
+
+
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_removes_partial_file_when_copy_fails(_mock_get_path, tmp_path):
+    """Test an interrupted copy kills ffmpeg and leaves no partial file."""
+    video_path = tmp_path / "video.mp4"
+    process = MagicMock()
+    process.stdout.read.side_effect = [b"partial", OSError("disk full")]
+    process.poll.return_value = None
+
+    with patch("subprocess.Popen", return_value=process):
+        with pytest.raises(OSError, match="disk full"):
+            extract_audio_for_gemini(video_path)
+
+    process.kill.assert_called_once()
+    assert not (tmp_path / "video.mp3").exists()
+
+    with patch("subprocess.Popen", side_effect=FileNotFoundError("ffmpeg")):
+        with pytest.raises(FileNotFoundError):
+            extract_audio_for_gemini(video_path)
+
+    assert not (tmp_path / "video.mp3").exists()
+
+
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_artifact_hash_matches_written_file(_mock_get_path, tmp_path):
+    """Test the hash produced during extraction equals a hash of the file."""
+    payload = b"x" * (3 * 1024 * 1024 + 17)  # spans several read chunks
+
+    with patch("subprocess.Popen", fake_popen(payload)), patch(
+        "core.services.audio_extractor.probe_audio_stream", return_value=None
+    ):
+        audio = extract_audio_artifact(tmp_path / "video.mp4")
+
+    assert audio["audio_hash"] == hashlib.sha256(payload).hexdigest()
+    assert audio["audio_hash"] == compute_audio_hash(audio["path"])
+
+@patch(
+    "core.services.audio_extractor.get_ffprobe_path",
+    return_value="/usr/bin/ffprobe",
+)
+@patch("subprocess.run")
+def test_probe_audio_stream(mock_run, _mock_probe_path):
+    """Test ffprobe JSON is reduced to codec, bit rate and duration."""
+    mock_run.return_value = MagicMock(
+        stdout=(
+            '{"streams": [{"codec_name": "aac", "bit_rate": "128000"}],'
+            ' "format": {"duration": "42.5"}}'
+        )
     )
-    mock_run.side_effect = process_error
 
-    with pytest.raises(RuntimeError, match="ffmpeg failed") as excinfo:
-        extract_audio_for_gemini(video_path)
+    probe = probe_audio_stream(Path("/tmp/video.mp4"))
 
-    assert "Standard out text" in str(excinfo.value)
-    assert "Standard error text" in str(excinfo.value)
+    assert probe == {"codec_name": "aac", "bit_rate": 128000.0, "duration": 42.5}
+    assert mock_run.call_args[0][0][-1] == "/tmp/video.mp4"
+
+
+@patch("core.services.audio_extractor.get_ffprobe_path", return_value=None)
+def test_probe_audio_stream_without_ffprobe(_mock_probe_path):
+    """Test probing is skipped when ffprobe is not installed."""
+    assert probe_audio_stream(Path("/tmp/video.mp4")) is None
+
+
+@patch(
+    "core.services.audio_extractor.get_ffprobe_path",
+    return_value="/usr/bin/ffprobe",
+)
+@patch("subprocess.run")
+def test_probe_audio_stream_no_audio(mock_run, _mock_probe_path):
+    """Test a file without an audio stream probes as None."""
+    mock_run.return_value = MagicMock(stdout='{"streams": []}')
+    assert probe_audio_stream(Path("/tmp/video.mp4")) is None
+
+
+@pytest.mark.parametrize(
+    ("probe", "expected"),
+    [
+        ({"codec_name": "aac", "bit_rate": 128000.0, "duration": 60.0}, True),
+        ({"codec_name": "opus", "bit_rate": 128000.0, "duration": 60.0}, False),
+        ({"codec_name": "aac", "bit_rate": None, "duration": 60.0}, False),
+        ({"codec_name": "aac", "bit_rate": 128000.0, "duration": 3600.0}, False),
+        (None, False),
+    ],
+)
+def test_can_stream_copy(probe, expected):
+    """Test stream copy is only allowed for small AAC sources."""
+    assert can_stream_copy(probe) is expected
+
+
+@patch(
+    "core.services.audio_extractor.probe_audio_stream",
+    return_value={"codec_name": "aac", "bit_rate": 128000.0, "duration": 30.0},
+)
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_for_gemini_stream_copy(_mock_get_path, _mock_probe, tmp_path):
+    """Test AAC sources are demuxed to ADTS without re-encoding."""
+    with patch("subprocess.Popen", fake_popen()) as mock_popen:
+        result_path = extract_audio_for_gemini(
+            tmp_path / "video.mp4", stream_copy=True
+        )
+
+    assert result_path == tmp_path / "video.aac"
+    command = mock_popen.call_args[0][0]
+    assert command[command.index("-c:a") + 1] == "copy"
+    assert command[command.index("-f") + 1] == "adts"
+
+
+@patch(
+    "core.services.audio_extractor.probe_audio_stream",
+    return_value={"codec_name": "opus", "bit_rate": 96000.0, "duration": 30.0},
+)
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_for_gemini_stream_copy_reencodes_other_codecs(
+    _mock_get_path, _mock_probe, tmp_path
+):
+    """Test non-AAC sources still go through the MP3 encode."""
+    with patch("subprocess.Popen", fake_popen()) as mock_popen:
+        result_path = extract_audio_for_gemini(
+            tmp_path / "video.mp4", stream_copy=True
+        )
+
+    assert result_path == tmp_path / "video.mp3"
+    mock_popen.assert_called_once()
+
+
+@patch(
+    "core.services.audio_extractor.probe_audio_stream",
+    return_value={"codec_name": "aac", "bit_rate": 128000.0, "duration": 30.0},
+)
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_for_gemini_stream_copy_failure_falls_back(
+    _mock_get_path, _mock_probe, tmp_path
+):
+    """Test a failed stream copy falls back to re-encoding."""
+    runs = iter([fake_popen(returncode=1), fake_popen()])
+    with patch(
+        "subprocess.Popen",
+        MagicMock(side_effect=lambda *args, **kwargs: next(runs)(*args, **kwargs)),
+    ) as mock_popen:
+        result_path = extract_audio_for_gemini(
+            tmp_path / "video.mp4", stream_copy=True
+        )
+
+    assert result_path == tmp_path / "video.mp3"
+    assert mock_popen.call_count == 2
+    assert not (tmp_path / "video.aac").exists()
+
+
+
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_for_gemini_opus_profile(_mock_get_path, tmp_path):
+    """Test a named profile selects its codec arguments and container."""
+    with patch("subprocess.Popen", fake_popen()) as mock_popen:
+        result_path = extract_audio_for_gemini(
+            tmp_path / "video.mp4", profile="opus_24k"
+        )
+
+    assert result_path == tmp_path / "video.ogg"
+    command = mock_popen.call_args[0][0]
+    assert command[command.index("-c:a") + 1] == "libopus"
+    assert command[command.index("-b:a") + 1] == "24k"
+    assert command[command.index("-f") + 1] == "ogg"
+
+
+def test_extract_audio_for_gemini_unknown_profile():
+    """Test unknown profile names are rejected before running ffmpeg."""
+    with pytest.raises(ValueError, match="Unknown audio profile"):
+        extract_audio_for_gemini(Path("/tmp/video.mp4"), profile="flac_lossless")
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("clip.mp3", "audio/mpeg"),
+        ("clip.M4A", "audio/mp4"),
+        ("clip.ogg", "audio/ogg"),
+        ("clip.opus", "audio/ogg"),
+        ("clip.xyz", "application/octet-stream"),
+    ],
+)
+def test_audio_mime_type(path, expected):
+    """Test MIME types are derived from the file extension."""
+    assert audio_mime_type(path) == expected
+
+
+@patch("core.services.audio_extractor.probe_audio_stream")
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_extract_audio_for_gemini_trim_silence(_mock_get_path, mock_probe, tmp_path):
+    """Test silence trimming adds the filter and skips the stream copy probe."""
+    with patch("subprocess.Popen", fake_popen()) as mock_popen:
+        result_path = extract_audio_for_gemini(
+            tmp_path / "video.mp4", stream_copy=True, trim_silence=True
+        )
+
+    assert result_path == tmp_path / "video.mp3"
+    command = mock_popen.call_args[0][0]
+    assert command[command.index("-af") + 1] == SILENCE_REMOVE_FILTER
+    mock_probe.assert_not_called()
+
+
+@patch("core.services.audio_extractor._extract_audio")
+@patch("core.services.audio_extractor.probe_audio_stream")
+def test_extract_audio_artifact(mock_probe, mock_extract):
+    """Test the artifact reports durations, hash and the trimmed seconds."""
+    source_probe = {"codec_name": "aac", "bit_rate": 128000.0, "duration": 61.5}
+    mock_probe.side_effect = [
+        source_probe,
+        {"codec_name": "mp3", "bit_rate": 64000.0, "duration": 48.25},
+    ]
+    mock_extract.return_value = (Path("/tmp/video.mp3"), "abc123")
+
+    audio = extract_audio_artifact(Path("/tmp/video.mp4"), trim_silence=True)
+
+    assert audio == {
+        "path": Path("/tmp/video.mp3"),
+        "mime_type": "audio/mpeg",
+        "audio_hash": "abc123",
+        "source_seconds": 61.5,
+        "duration_seconds": 48.25,
+        "trimmed_seconds": 13.25,
+    }
+    assert mock_extract.call_args.kwargs["source_probe"] is source_probe
+
+
+@patch("core.services.audio_extractor._extract_audio")
+@patch("core.services.audio_extractor.probe_audio_stream")
+def test_extract_audio_artifact_untrimmed(mock_probe, mock_extract):
+    """Test a length difference is not reported as trimmed without trimming."""
+    mock_probe.side_effect = [
+        {"codec_name": "aac", "bit_rate": 128000.0, "duration": 61.5},
+        {"codec_name": "aac", "bit_rate": 128000.0, "duration": 60.9},
+    ]
+    mock_extract.return_value = (Path("/tmp/video.aac"), "abc123")
+
+    audio = extract_audio_artifact(Path("/tmp/video.mp4"), stream_copy=True)
+
+    assert audio["duration_seconds"] == 60.9
+    assert audio["trimmed_seconds"] is None
+
+
+@patch("core.services.audio_extractor._extract_audio")
+@patch("core.services.audio_extractor.probe_audio_stream", return_value=None)
+def test_extract_audio_artifact_without_ffprobe(_mock_probe, mock_extract):
+    """Test durations are None when ffprobe is unavailable."""
+    mock_extract.return_value = (Path("/tmp/video.mp3"), "abc123")
+
+    audio = extract_audio_artifact(Path("/tmp/video.mp4"))
+
+    assert audio["path"] == Path("/tmp/video.mp3")
+    assert audio["trimmed_seconds"] is None
+
+
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+@patch("subprocess.run")
+def test_detect_silences(mock_run, _mock_get_path):
+    """Test silencedetect output is parsed into (start, end) pairs."""
+    mock_run.return_value = MagicMock(
+        stdout="",
+        stderr=(
+            "[silencedetect @ 0x1] silence_start: 10.5\n"
+            "[silencedetect @ 0x1] silence_end: 11.25 | silence_duration: 0.75\n"
+            "[silencedetect @ 0x1] silence_start: 59.9\n"
+        ),
+    )
+
+    assert detect_silences(Path("/tmp/audio.mp3")) == [(10.5, 11.25)]
+
+
+def test_plan_segments_short_audio_is_one_segment():
+    """Test audio under the maximum length is not split."""
+    assert plan_segments(80.0, [(30.0, 31.0)]) == [(0.0, 80.0)]
+
+
+def test_plan_segments_cuts_at_nearest_silence():
+    """Test cuts land in the silence closest to each target boundary."""
+    silences = [(20.0, 21.0), (58.0, 59.0), (75.0, 76.0), (121.0, 122.0)]
+
+    segments = plan_segments(200.0, silences)
+
+    assert segments == [(0.0, 58.5), (58.5, 121.5), (121.5, 200.0)]
+
+
+def test_plan_segments_hard_cut_without_silence():
+    """Test a hard cut at the target length when no silence is found."""
+    assert plan_segments(150.0, []) == [(0.0, 60.0), (60.0, 150.0)]
+
+
+@patch("core.services.audio_extractor.detect_silences", return_value=[])
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_split_audio_at_silence(_mock_get_path, _mock_detect, tmp_path):
+    """Test segments are stream-copied into ordered, hashed part files."""
+    popen = fake_popen(b"segment")
+    with patch("subprocess.Popen", popen):
+        parts = split_audio_at_silence(tmp_path / "audio.mp3", 150.0)
+
+    digest = hashlib.sha256(b"segment").hexdigest()
+    assert parts == [
+        (tmp_path / "audio_part0.mp3", digest),
+        (tmp_path / "audio_part1.mp3", digest),
+    ]
+    first, second = (call.args[0] for call in popen.call_args_list)
+    assert first[first.index("-ss") + 1] == "0.000"
+    assert first[first.index("-t") + 1] == "60.000"
+    assert second[second.index("-ss") + 1] == "60.000"
+    assert second[second.index("-c") + 1] == "copy"
+    assert second[second.index("-f") + 1] == "mp3"
+
+
+@patch("core.services.audio_extractor.detect_silences", return_value=[])
+@patch(
+    "core.services.audio_extractor.get_ffmpeg_path",
+    return_value="/usr/bin/ffmpeg",
+)
+def test_split_audio_at_silence_failure_removes_parts(
+    _mock_get_path, _mock_detect, tmp_path
+):
+    """Test parts written before a failed split are deleted."""
+    popens = iter([fake_popen(b"segment"), fake_popen(returncode=1)])
+    popen = MagicMock(side_effect=lambda command, **kw: next(popens)(command, **kw))
+
+    with patch("subprocess.Popen", popen), pytest.raises(RuntimeError):
+        split_audio_at_silence(tmp_path / "audio.aac", 150.0)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch("core.services.audio_extractor.detect_silences", return_value=[])
+@patch("subprocess.run")
+def test_split_audio_at_silence_short_audio(mock_run, _mock_detect):
+    """Test short audio is returned unsplit without running ffmpeg."""
+    assert split_audio_at_silence(Path("/tmp/audio.mp3"), 45.0) == [
+        (Path("/tmp/audio.mp3"), None)
+    ]
+    mock_run.assert_not_called()
@@ -0,0 +1,148 @@
+"""Tests for the perceptual audio fingerprint index."""
+
+import subprocess
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from core.models import AudioFingerprint, ReelInsight
+from core.services.audio_fingerprint import (
+    FRAME_SIZE,
+    HOP_SIZE,
+    SAMPLE_RATE,
+    _spectrogram,
+    decode_pcm,
+    find_near_duplicate,
+    fingerprint_samples,
+    index_fingerprints,
+)
+
+
+def _melody(seed: int, seconds: float = 30.0) -> np.ndarray:
+    """Random sequence of short tones over light noise."""
+    rng = np.random.default_rng(seed)
+    note_length = int(0.25 * SAMPLE_RATE)
+    t = np.arange(note_length) / SAMPLE_RATE
+    notes = [
+        np.sin(2 * np.pi * rng.uniform(200, 3000) * t)
+        + 0.5 * np.sin(2 * np.pi * rng.uniform(200, 3000) * t)
+        for _ in range(int(seconds / 0.25))
+    ]
+    signal = np.concatenate(notes)
+    return (0.3 * signal + 0.02 * rng.standard_normal(len(signal))).astype(np.float32)
+
+
+def _insight(url: str) -> ReelInsight:
+    return ReelInsight.objects.create(
+        source_url=url,
+        original_language="en",
+        transcript_original="orig",
+        transcript_english="eng",
+        triggers="t1",
+        processed_at=timezone.now(),
+    )
+
+
+@patch("core.services.audio_fingerprint.get_ffmpeg_path", return_value="ffmpeg")
+@patch("core.services.audio_fingerprint.subprocess.run")
+def test_decode_pcm(mock_run, _mock_ffmpeg, tmp_path):
+    """Test PCM decoding converts s16le output to float samples."""
+    pcm = np.array([0, 16384, -32768], dtype="<i2").tobytes()
+    mock_run.return_value = subprocess.CompletedProcess([], 0, stdout=pcm, stderr=b"")
+
+    samples = decode_pcm(tmp_path / "reel.mp4")
+
+    np.testing.assert_allclose(samples, [0.0, 0.5, -1.0])
+    command = mock_run.call_args[0][0]
+    assert command[command.index("-ar") + 1] == str(SAMPLE_RATE)
+    assert command[-1] == "pipe:1"
+
+
+@patch("core.services.audio_fingerprint.get_ffmpeg_path", return_value="ffmpeg")
+@patch("core.services.audio_fingerprint.subprocess.run")
+def test_decode_pcm_failure(mock_run, _mock_ffmpeg, tmp_path):
+    """Test ffmpeg decode errors raise RuntimeError."""
+    mock_run.return_value = subprocess.CompletedProcess([], 1, stdout=b"", stderr=b"bad")
+
+    with pytest.raises(RuntimeError, match="bad"):
+        decode_pcm(tmp_path / "reel.mp4")
+
+
+def test_fingerprint_samples_short_input():
+    """Test audio shorter than one frame yields no landmarks."""
+    assert fingerprint_samples(np.zeros(100, dtype=np.float32)) == []
+
+
+def test_spectrogram_drops_nyquist_bin():
+    """Test every bin fits the landmark's 8-bit frequency field once halved."""
+    spectrogram = _spectrogram(_melody(seed=1, seconds=2.0))
+
+    assert spectrogram.dtype == np.float32
+    assert spectrogram.shape[1] == FRAME_SIZE // 2
+    assert (spectrogram.shape[1] - 1) >> 1 < 256
+
+
+@pytest.mark.django_db
+def test_find_near_duplicate_matches_trimmed_copy():
+    """Test a trimmed, noisier copy matches the indexed original."""
+    original = _insight("https://instagram.com/reel/original/")
+    other = _insight("https://instagram.com/reel/other/")
+    signal = _melody(seed=1)
+    index_fingerprints(original, fingerprint_samples(signal))
+    index_fingerprints(other, fingerprint_samples(_melody(seed=2)))
+
+    copy = signal[16 * HOP_SIZE :]
+    copy = copy + 0.01 * np.random.default_rng(3).standard_normal(len(copy))
+
+    assert find_near_duplicate(fingerprint_samples(copy)) == original
+
+
+@pytest.mark.django_db
+def test_find_near_duplicate_rejects_shared_music():
+    """Test a short excerpt or other audio over the same music does not match."""
+    original = _insight("https://instagram.com/reel/original/")
+    signal = _melody(seed=1)
+    index_fingerprints(original, fingerprint_samples(signal))
+
+    excerpt = signal[5 * SAMPLE_RATE : 20 * SAMPLE_RATE]
+    mixed = signal + _melody(seed=7)
+
+    assert find_near_duplicate(fingerprint_samples(excerpt)) is None
+    assert find_near_duplicate(fingerprint_samples(mixed)) is None
+
+
+@pytest.mark.django_db
+def test_find_near_duplicate_no_match():
+    """Test unrelated audio and excluded insights do not match."""
+    original = _insight("https://instagram.com/reel/original/")
+    landmarks = fingerprint_samples(_melody(seed=1))
+    index_fingerprints(original, landmarks)
+
+    assert find_near_duplicate(fingerprint_samples(_melody(seed=4))) is None
+    assert find_near_duplicate(landmarks, exclude_id=original.pk) is None
+    assert find_near_duplicate([]) is None
+
+
+@pytest.mark.django_db
+def test_find_near_duplicate_skips_unprocessed():
+    """Test pending insights are never offered as duplicates."""
+    pending = _insight("https://instagram.com/reel/pending/")
+    pending.processed_at = None
+    pending.save()
+    landmarks = fingerprint_samples(_melody(seed=1))
+    index_fingerprints(pending, landmarks)
+
+    assert find_near_duplicate(landmarks) is None
+
+
+@pytest.mark.django_db
+def test_index_fingerprints_deduplicates():
+    """Test repeated landmarks are stored once."""
+    insight = _insight("https://instagram.com/reel/x/")
+
+    stored = index_fingerprints(insight, [(7, 1), (7, 1), (7, 2)])
+
+    assert stored == 2
+    assert AudioFingerprint.objects.filter(insight=insight).count() == 2
@@ -0,0 +1,63 @@
+"""Tests for the ffmpeg concurrency governor."""
+
+import threading
+import time
+
+from core.services.ffmpeg_governor import FfmpegGovernor
+
+
+def test_governor_limits_concurrency_across_threads(tmp_path):
+    """Test no more than `slots` blocks run at the same time."""
+    governor = FfmpegGovernor(slots=2, lock_dir=tmp_path, poll_interval=0.01)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with governor.slot():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    stats = governor.stats()
+    assert stats["runs"] == 6
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_governor_slots_are_shared_through_lock_files(tmp_path):
+    """Test two governors (as in two workers) share the same slot files."""
+    first = FfmpegGovernor(slots=1, lock_dir=tmp_path, poll_interval=0.01)
+    second = FfmpegGovernor(slots=1, lock_dir=tmp_path, poll_interval=0.01)
+    acquired = threading.Event()
+
+    def take_second_slot():
+        with second.slot():
+            acquired.set()
+
+    with first.slot():
+        thread = threading.Thread(target=take_second_slot)
+        thread.start()
+        assert not acquired.wait(0.1)
+
+    thread.join(timeout=2)
+    assert acquired.is_set()
+    assert second.stats()["wait_seconds_total"] >= 0.1
+
+
+def test_governor_thread_sizing(tmp_path):
+    """Test encoder threads split the CPUs between slots."""
+    governor = FfmpegGovernor(slots=1, lock_dir=tmp_path)
+    assert governor.threads >= 1
+    assert governor.stats()["slots"] == 1
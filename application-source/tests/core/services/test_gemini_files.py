@@ -0,0 +1,119 @@
+"""Tests for cached Gemini Files API uploads."""
+
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.utils import timezone
+
+from core.models import GeminiFileUpload
+from core.services.gemini_files import (
+    file_part,
+    forget_upload,
+    get_uploaded_audio,
+    key_id,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def _uploaded(name="files/abc", state="ACTIVE"):
+    uploaded = MagicMock()
+    uploaded.name = name
+    uploaded.uri = f"https://generativelanguage.googleapis.com/v1beta/{name}"
+    uploaded.mime_type = "audio/mpeg"
+    uploaded.state = state
+    uploaded.expiration_time = timezone.now() + timedelta(hours=48)
+    return uploaded
+
+
+def test_key_id_hides_key():
+    """Test the key identifier is stable and does not contain the key."""
+    assert key_id("secret-key") == key_id("secret-key")
+    assert "secret" not in key_id("secret-key")
+    assert key_id("a") != key_id("b")
+
+
+def test_get_uploaded_audio_uploads_once():
+    """Test the first call uploads and later calls reuse the cached file."""
+    client = MagicMock()
+    client.files.upload.return_value = _uploaded()
+
+    first = get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+    second = get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+
+    client.files.upload.assert_called_once_with(
+        file="audio.mp3", config={"mime_type": "audio/mpeg"}
+    )
+    assert first.pk == second.pk
+    assert file_part(first) == {
+        "file_data": {"file_uri": first.file_uri, "mime_type": "audio/mpeg"}
+    }
+
+
+def test_get_uploaded_audio_is_per_key():
+    """Test a different key gets its own upload."""
+    client = MagicMock()
+    client.files.upload.side_effect = [_uploaded("files/a"), _uploaded("files/b")]
+
+    get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+    get_uploaded_audio(client, "key2", "audio.mp3", "hash1")
+
+    assert client.files.upload.call_count == 2
+    assert GeminiFileUpload.objects.count() == 2
+
+
+def test_get_uploaded_audio_replaces_expiring():
+    """Test uploads about to expire are replaced."""
+    GeminiFileUpload.objects.create(
+        audio_hash="hash1",
+        key_id=key_id("key1"),
+        file_name="files/old",
+        file_uri="https://example.com/files/old",
+        mime_type="audio/mpeg",
+        expires_at=timezone.now() + timedelta(minutes=1),
+    )
+    client = MagicMock()
+    client.files.upload.return_value = _uploaded("files/new")
+
+    upload = get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+
+    assert upload.file_name == "files/new"
+    assert GeminiFileUpload.objects.count() == 1
+
+
+@patch("core.services.gemini_files.time.sleep")
+def test_get_uploaded_audio_waits_for_processing(_mock_sleep):
+    """Test uploads still processing are polled until active."""
+    client = MagicMock()
+    client.files.upload.return_value = _uploaded(state="PROCESSING")
+    client.files.get.return_value = _uploaded(state="ACTIVE")
+
+    upload = get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+
+    client.files.get.assert_called_once_with(name="files/abc")
+    assert upload.file_name == "files/abc"
+
+
+def test_get_uploaded_audio_failed_processing():
+    """Test a failed upload raises and is not cached."""
+    client = MagicMock()
+    client.files.upload.return_value = _uploaded(state="FAILED")
+
+    with pytest.raises(RuntimeError, match="failed processing"):
+        get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+    assert not GeminiFileUpload.objects.exists()
+
+
+def test_forget_upload():
+    """Test forgetting removes only that key's upload."""
+    client = MagicMock()
+    client.files.upload.side_effect = [_uploaded("files/a"), _uploaded("files/b")]
+    get_uploaded_audio(client, "key1", "audio.mp3", "hash1")
+    get_uploaded_audio(client, "key2", "audio.mp3", "hash1")
+
+    forget_upload("key1", "hash1")
+
+    assert list(GeminiFileUpload.objects.values_list("file_name", flat=True)) == [
+        "files/b"
+    ]
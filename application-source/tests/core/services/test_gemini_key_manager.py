@@ -1,10 +1,24 @@
 """Tests for the gemini_key_manager service."""
 
+import asyncio
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
 import pytest
 
-from core.services.gemini_key_manager import GeminiKeyManager
+from core.services.gemini_key_manager import (
+    AsyncGeminiKeyManager,
+    GeminiKeyManager,
+    KeyBudget,
+    KeyStateStore,
+    _reset_clients_after_fork,
+    default_key_manager,
+    key_id,
+    parse_model_budgets,
+    retry_hint,
+)
 
 
 def test_key_manager_initialization():
@@ -37,6 +51,19 @@ def test_key_manager_get_client_rotation(_mock_client):
     assert key == "key1"
 
 
+@patch("google.genai.Client")
+def test_key_manager_clients_use_gemini_base_url(mock_client):
+    """Test clients are pointed at GEMINI_BASE_URL when it is set."""
+    with patch(
+        "core.services.gemini_key_manager.GEMINI_BASE_URL", "http://127.0.0.1:8801"
+    ):
+        GeminiKeyManager(keys=["key1"]).get_client()
+
+    mock_client.assert_called_once_with(
+        api_key="key1", http_options={"base_url": "http://127.0.0.1:8801"}
+    )
+
+
 @patch("google.genai.Client")
 def test_key_manager_cooldown(_mock_client):
     """Test key cooldown mechanics."""
@@ -77,8 +104,261 @@ def test_key_manager_disable(_mock_client):
         manager.get_client()
 
 
+@patch("google.genai.Client")
+def test_disabled_key_returns_after_ttl(_mock_client, isolated_gemini_key_state):
+    """Test a disabled key is used again once its disable expires or is cleared."""
+    manager = GeminiKeyManager(keys=["key1"], max_wait_seconds=0)
+
+    with patch("core.services.gemini_key_manager.time.time", return_value=1_000.0):
+        manager.disable_key("key1", seconds=60)
+        with pytest.raises(RuntimeError, match="exhausted"):
+            manager.get_client()
+    with patch("core.services.gemini_key_manager.time.time", return_value=1_061.0):
+        assert manager.get_client()[0] == "key1"
+
+    manager.disable_key("key1")
+    assert isolated_gemini_key_state.enable([key_id("key1")]) == 1
+    assert manager.get_client()[0] == "key1"
+
+
 @patch("google.genai.Client")
 def test_next_key_legacy_helper(_mock_client):
     """Test next_key legacy backward compatibility method."""
     manager = GeminiKeyManager(keys=["key1"])
     assert manager.next_key() == "key1"
+
+
+@patch("google.genai.Client")
+def test_key_manager_clients_dropped_after_fork(mock_client):
+    """Test pooled clients are discarded in forked children."""
+    manager = GeminiKeyManager(keys=["key1"])
+    manager.get_client()
+    assert mock_client.call_count == 1
+
+    _reset_clients_after_fork()
+
+    manager.get_client()
+    assert mock_client.call_count == 2
+
+
+@patch("google.genai.Client")
+def test_async_key_manager_shares_state(_mock_client):
+    """Test the async manager rotates and cools down the wrapped manager's keys."""
+    manager = GeminiKeyManager(keys=["key1", "key2"])
+    async_manager = AsyncGeminiKeyManager(manager)
+
+    async def scenario():
+        key, _ = await async_manager.get_client()
+        await async_manager.cooldown_key(key)
+        return key
+
+    cooled = asyncio.run(scenario())
+
+    assert cooled == "key1"
+    # The sync side sees the cooldown immediately.
+    assert manager.get_client()[0] == "key2"
+    assert manager.get_client()[0] == "key2"
+
+
+def test_async_key_manager_in_flight_limit_per_loop():
+    """Test each event loop gets its own bounded semaphore."""
+    async_manager = AsyncGeminiKeyManager(GeminiKeyManager(keys=["key1"]), 3)
+
+    async def limits():
+        return async_manager.in_flight_limit(), async_manager.in_flight_limit()
+
+    first, again = asyncio.run(limits())
+    second, _ = asyncio.run(limits())
+
+    assert first is again
+    assert first is not second
+    assert first._value == 3
+
+
+@patch("google.genai.Client")
+def test_key_state_shared_between_managers(_mock_client):
+    """Test a cooldown or disable from one manager is honoured by another."""
+    transcriber = GeminiKeyManager(keys=["key1", "key2", "key3"])
+    posts = GeminiKeyManager(keys=["key1", "key2", "key3"])
+
+    transcriber.cooldown_key("key1")
+    posts.disable_key("key2")
+
+    assert posts.get_client()[0] == "key3"
+    assert transcriber.get_client()[0] == "key3"
+
+
+def _cool_down_in_child(path):
+    GeminiKeyManager(keys=["key1", "key2"], store=KeyStateStore(path)).cooldown_key(
+        "key1"
+    )
+
+
+@patch("google.genai.Client")
+def test_key_state_shared_across_processes(_mock_client, isolated_gemini_key_state):
+    """Test a cooldown recorded by another worker process is seen here."""
+    child = multiprocessing.get_context("fork").Process(
+        target=_cool_down_in_child, args=(isolated_gemini_key_state.path,)
+    )
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+
+    manager = GeminiKeyManager(keys=["key1", "key2"])
+    assert [manager.get_client()[0] for _ in range(3)] == ["key2"] * 3
+
+
+@patch("google.genai.Client")
+def test_key_rotation_thread_safe(_mock_client):
+    """Test concurrent rotation hands out keys evenly."""
+    manager = GeminiKeyManager(
+        keys=["key1", "key2"], budget=KeyBudget(rpm=1000, tpm=10**6, rpd=10**4)
+    )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = list(pool.map(lambda _: manager.get_client()[0], range(40)))
+
+    assert Counter(keys) == {"key1": 20, "key2": 20}
+
+
+def test_key_state_never_stores_raw_keys(isolated_gemini_key_state):
+    """Test only key digests are written to the shared state file."""
+    GeminiKeyManager(keys=["secret-key"]).cooldown_key("secret-key")
+
+    snapshot = isolated_gemini_key_state.snapshot()
+    assert list(snapshot) == [key_id("secret-key")]
+    with open(isolated_gemini_key_state.path, "rb") as f:
+        assert b"secret-key" not in f.read()
+
+
+def test_default_key_manager_is_shared():
+    """Test the Gemini service modules use one manager instance."""
+    from core.services import gemini_transcriber, post_gemini
+
+    assert gemini_transcriber.KEY_MANAGER is default_key_manager()
+    assert post_gemini.KEY_MANAGER is gemini_transcriber.KEY_MANAGER
+
+
+@patch("google.genai.Client")
+def test_scheduler_prefers_key_with_most_headroom(_mock_client):
+    """Test large requests go to whichever key has the most token budget left."""
+    manager = GeminiKeyManager(
+        keys=["key1", "key2"], budget=KeyBudget(rpm=100, tpm=10_000, rpd=1000)
+    )
+
+    assert manager.get_client(tokens=6_000)[0] == "key1"
+    assert manager.get_client(tokens=1_000)[0] == "key2"
+    # key2 still has 9k tokens against key1's 4k, so it is picked again.
+    assert manager.get_client(tokens=1_000)[0] == "key2"
+
+
+@patch("core.services.gemini_key_manager.time.sleep")
+@patch("google.genai.Client")
+def test_scheduler_waits_for_refill(_mock_client, mock_sleep):
+    """Test a spent budget waits for refill instead of failing or cooling down."""
+    manager = GeminiKeyManager(
+        keys=["key1"],
+        budget=KeyBudget(rpm=60, tpm=10_000, rpd=1000),
+        max_wait_seconds=60,
+    )
+    now = [1_000.0]
+
+    def advance(seconds):
+        now[0] += seconds
+
+    mock_sleep.side_effect = advance
+    with patch("core.services.gemini_key_manager.time.time", lambda: now[0]):
+        manager.get_client(tokens=10_000)
+        manager.get_client(tokens=5_000)
+
+    # 5k tokens at 10k/min refill take 30 seconds.
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == pytest.approx(30.0)
+
+
+@patch("google.genai.Client")
+def test_scheduler_gives_up_beyond_max_wait(_mock_client):
+    """Test requests fail fast when refill would exceed the wait limit."""
+    manager = GeminiKeyManager(
+        keys=["key1"],
+        budget=KeyBudget(rpm=1, tpm=10_000, rpd=1000),
+        max_wait_seconds=5,
+    )
+    manager.get_client()
+
+    with pytest.raises(RuntimeError, match="All Gemini API keys are exhausted"):
+        manager.get_client()
+
+
+@patch("google.genai.Client")
+def test_budgets_are_per_model(_mock_client, isolated_gemini_key_state):
+    """Test each model spends its own buckets with its own budget."""
+    manager = GeminiKeyManager(
+        keys=["key1"],
+        budget=KeyBudget(rpm=1, tpm=10_000, rpd=1000),
+        max_wait_seconds=0,
+        model_budgets={"capacity": KeyBudget(rpm=2, tpm=10_000, rpd=1000)},
+    )
+
+    manager.get_client(model="models/lite")
+    manager.get_client(model="models/capacity")
+    manager.get_client(model="models/capacity")
+    with pytest.raises(RuntimeError, match="exhausted"):
+        manager.get_client(model="models/lite")
+    with pytest.raises(RuntimeError, match="exhausted"):
+        manager.get_client(model="models/capacity")
+
+    budgets = isolated_gemini_key_state.snapshot()[key_id("key1")]["budgets"]
+    assert set(budgets) == {"lite", "capacity"}
+
+
+def test_parse_model_budgets():
+    """Test GEMINI_MODEL_BUDGETS entries become per-model budgets."""
+    budgets = parse_model_budgets("models/a=10/250000/250, b=1/2/3,")
+
+    assert budgets == {
+        "a": KeyBudget(rpm=10, tpm=250_000, rpd=250),
+        "b": KeyBudget(rpm=1, tpm=2, rpd=3),
+    }
+    with pytest.raises(ValueError, match="model=rpm/tpm/rpd"):
+        parse_model_budgets("a=10")
+
+
+def test_retry_hint_parses_retry_delay():
+    """Test the RetryInfo delay from a 429 payload becomes the cooldown."""
+    error = Exception(
+        "429 RESOURCE_EXHAUSTED. {'error': {'details': [{'@type': "
+        "'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': '37s'}]}}"
+    )
+    assert retry_hint(error) == {"seconds": 37.0}
+    assert retry_hint(Exception("RESOURCE_EXHAUSTED")) == {}
+
+
+@patch("google.genai.Client")
+def test_cooldown_uses_hint(_mock_client, isolated_gemini_key_state):
+    """Test cooldowns follow the retry hint rather than a fixed hour."""
+    manager = GeminiKeyManager(keys=["key1"])
+
+    with patch("core.services.gemini_key_manager.time.time", return_value=1_000.0):
+        manager.cooldown_key("key1", seconds=12)
+
+    state = isolated_gemini_key_state.snapshot()[key_id("key1")]
+    assert state["cooldown_until"] == 1_012.0
+
+
+def test_key_budget_rejects_zero():
+    """Test budgets must be positive."""
+    with pytest.raises(ValueError):
+        KeyBudget(rpm=0)
+
+
+@patch("google.genai.Client")
+def test_get_client_excludes_keys(_mock_client):
+    """Test excluded keys are never returned, e.g. for hedged requests."""
+    manager = GeminiKeyManager(keys=["key1", "key2", "key3"])
+
+    keys = {manager.get_client(exclude=["key1"])[0] for _ in range(6)}
+
+    assert keys == {"key2", "key3"}
+    with pytest.raises(RuntimeError, match="No other Gemini API key"):
+        GeminiKeyManager(keys=["key1"]).get_client(exclude=["key1"])
@@ -0,0 +1,37 @@
+"""Tests for the shared Gemini request builder."""
+
+from core.services.gemini_request import (
+    audio_part,
+    estimate_tokens,
+    inline_part,
+    user_contents,
+)
+
+
+def test_audio_part_passes_raw_bytes(tmp_path):
+    """Test audio is sent as raw bytes with a MIME type from its extension."""
+    audio = tmp_path / "clip.ogg"
+    audio.write_bytes(b"\x00\x01audio")
+
+    assert audio_part(str(audio)) == {
+        "inline_data": {"mime_type": "audio/ogg", "data": b"\x00\x01audio"}
+    }
+
+
+def test_user_contents():
+    """Test parts are wrapped in a single user turn."""
+    assert user_contents([{"text": "hi"}]) == [
+        {"role": "user", "parts": [{"text": "hi"}]}
+    ]
+
+
+def test_estimate_tokens():
+    """Test token estimates from audio length, image count and prompt text."""
+    parts = [
+        inline_part(b"x" * 80_000, "audio/mpeg"),  # ~10 s at 64 kbps
+        inline_part(b"img", "image/jpeg"),
+        inline_part(b"img", "image/png"),
+        {"text": "a" * 400},
+    ]
+    assert estimate_tokens(parts) == 320 + 2 * 258 + 100
+    assert estimate_tokens([{"text": ""}], audio_bytes=16_000) == 64
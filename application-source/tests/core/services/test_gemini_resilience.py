@@ -0,0 +1,136 @@
+"""Tests for Gemini circuit breakers and request hedging."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from google.genai.errors import ClientError, ServerError
+
+from core.services.gemini_resilience import CircuitBreaker, hedged, is_transient
+
+
+def test_breaker_opens_after_consecutive_failures():
+    """Test the breaker opens on the Nth consecutive failure only."""
+    breaker = CircuitBreaker(threshold=3, open_seconds=60)
+
+    assert not breaker.record_failure("key")
+    assert not breaker.record_failure("key")
+    assert breaker.allow("key")
+    assert breaker.record_failure("key")
+    assert not breaker.allow("key")
+    assert breaker.allow("other")
+
+
+def test_breaker_success_resets_count():
+    """Test a success in between restarts the consecutive count."""
+    breaker = CircuitBreaker(threshold=2, open_seconds=60)
+
+    breaker.record_failure("key")
+    breaker.record_success("key")
+    assert not breaker.record_failure("key")
+    assert breaker.allow("key")
+
+
+@patch("core.services.gemini_resilience.time.monotonic")
+def test_breaker_half_open_after_timeout(mock_monotonic):
+    """Test one trial is allowed after open_seconds; a failure re-opens it."""
+    mock_monotonic.return_value = 100.0
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    breaker.record_failure("model")
+    assert not breaker.allow("model")
+
+    mock_monotonic.return_value = 131.0
+    assert breaker.allow("model")
+    assert not breaker.allow("model")  # the trial is still running
+    assert breaker.record_failure("model")
+    assert not breaker.allow("model")
+
+    mock_monotonic.return_value = 162.0
+    breaker.record_success("model")
+    assert breaker.allow("model")
+
+
+@patch("core.services.gemini_resilience.time.monotonic")
+def test_breaker_half_open_admits_one_concurrent_caller(mock_monotonic):
+    """Test only one of many concurrent callers gets the trial call."""
+    mock_monotonic.return_value = 100.0
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    breaker.record_failure("key")
+    mock_monotonic.return_value = 131.0
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(breaker.allow("key")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    breaker.record_success("key")
+    assert breaker.allow("key") and breaker.allow("key")
+
+
+def test_is_transient():
+    """Test server errors and timeouts are transient, client errors are not."""
+    response = MagicMock()
+    response.text = "UNAVAILABLE"
+    assert is_transient(ServerError(503, response=response))
+    assert is_transient(requests.exceptions.ReadTimeout())
+    assert not is_transient(ClientError(400, response=response))
+    assert not is_transient(RuntimeError("boom"))
+
+
+def test_hedged_fast_primary_skips_hedge():
+    """Test no duplicate is sent when the primary beats the delay."""
+    hedge = MagicMock()
+
+    assert hedged(lambda: "primary", hedge, delay=1.0) == "primary"
+    hedge.assert_not_called()
+
+
+def test_hedged_slow_primary_returns_hedge():
+    """Test the hedge's answer is used when the primary stalls."""
+    release = threading.Event()
+
+    def slow_primary():
+        release.wait(5)
+        return "primary"
+
+    started = time.perf_counter()
+    try:
+        assert hedged(slow_primary, lambda: "hedge", delay=0.05) == "hedge"
+    finally:
+        release.set()
+    assert time.perf_counter() - started < 1.0
+
+
+def test_hedged_failed_hedge_waits_for_primary():
+    """Test a failing hedge does not fail the request."""
+
+    def slow_primary():
+        time.sleep(0.1)
+        return "primary"
+
+    def hedge():
+        raise RuntimeError("hedge failed")
+
+    assert hedged(slow_primary, hedge, delay=0.01) == "primary"
+
+
+def test_hedged_raises_primary_error_when_both_fail():
+    """Test the primary's error is raised when both calls fail."""
+
+    def slow_primary():
+        time.sleep(0.05)
+        raise ValueError("primary failed")
+
+    def hedge():
+        raise RuntimeError("hedge failed")
+
+    with pytest.raises(ValueError, match="primary failed"):
+        hedged(slow_primary, hedge, delay=0.01)
@@ -0,0 +1,67 @@
+"""Tests for the Gemini structured-output schemas."""
+
+import json
+from core.services.gemini_schemas import (
+    SummaryResult,
+    TranscriptionResult,
+    json_config,
+    parse_structured,
+)
+
+TRANSCRIPTION = {
+    "language": "hi",
+    "transcript_native": "नमस्ते",
+    "transcript_english": "Hello",
+    "triggers": ["Wave"],
+    "title": "Greeting",
+}
+
+
+def test_json_config_requests_schema():
+    """Test the request config asks for JSON matching the schema."""
+    assert json_config(SummaryResult) == {
+        "response_mime_type": "application/json",
+        "response_schema": SummaryResult,
+    }
+
+
+def test_parse_structured_prefers_sdk_parsed():
+    """Test the SDK-validated object is used without re-decoding the text."""
+    parsed = TranscriptionResult(**TRANSCRIPTION)
+    assert parse_structured("not json", TranscriptionResult, parsed) == TRANSCRIPTION
+
+
+def test_parse_structured_validates_text():
+    """Test raw JSON text is validated when the SDK did not parse it."""
+    text = json.dumps(TRANSCRIPTION)
+
+    assert parse_structured(text, TranscriptionResult) == TRANSCRIPTION
+
+
+def test_parse_structured_coerces_to_schema():
+    """Test validated output drops keys the schema does not declare."""
+    text = json.dumps({"triggers": ["A"], "title": "T", "extra": 1})
+
+    assert parse_structured(text, SummaryResult) == {
+        "triggers": ["A"],
+        "title": "T",
+    }
+
+
+def test_parse_structured_falls_back_for_fenced_json():
+    """Test JSON wrapped in markdown still parses via parse_first_json."""
+    text = '```json\n{"triggers": ["A"], "title": "T"}\n```'
+
+    assert parse_structured(text, SummaryResult) == {"triggers": ["A"], "title": "T"}
+
+
+def test_parse_structured_rejects_off_schema_fallback():
+    """Test JSON found by the fallback must still match the schema."""
+    text = '```json\n{"title": "Only"}\n```'
+
+    assert parse_structured(text, SummaryResult) is None
+
+
+def test_parse_structured_invalid_text():
+    """Test None is returned when the text holds no JSON object."""
+    assert parse_structured("no json here", SummaryResult) is None
@@ -1,12 +1,41 @@
 """Tests for the Gemini transcriber service."""
 
-from unittest.mock import MagicMock, mock_open, patch
+import asyncio
+import json
+import threading
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, mock_open, patch
 
 import pytest
-from google.genai.errors import ClientError
+import requests
+from google.genai.errors import ClientError, ServerError
 
 from core.constants import GEMINI_API_KEYS
-from core.services.gemini_transcriber import gemini_transcribe
+from core.services.gemini_key_manager import AsyncGeminiKeyManager, GeminiKeyManager
+from core.services.gemini_schemas import (
+    SegmentResult,
+    SummaryResult,
+    TranscriptionResult,
+)
+from core.services.gemini_transcriber import (
+    gemini_transcribe,
+    gemini_transcribe_async,
+    gemini_transcribe_long,
+)
+
+
+def _reply(**fields) -> str:
+    """A complete TranscriptionResult JSON reply with *fields* overridden."""
+    return json.dumps(
+        {
+            "language": "en",
+            "transcript_native": "native",
+            "transcript_english": "english",
+            "triggers": [],
+            "title": "Title",
+            **fields,
+        }
+    )
 
 
 def setup_mock_response(mock_client_fixture, text_response):
@@ -30,7 +59,7 @@ def test_gemini_transcribe_markdown_json(_mock_file, mock_google_genai_client):
     """Test transcription when the response is a markdown JSON block."""
     # Setup response with markdown json block
     setup_mock_response(
-        mock_google_genai_client, '```json\n{"language": "en"}\n```'
+        mock_google_genai_client, f"```json\n{_reply(language='en')}\n```"
     )
     result = gemini_transcribe("test.wav")
     assert result["language"] == "en"
@@ -251,3 +280,367 @@ def test_gemini_transcribe_client_error_other(mocked_open, mock_key_manager):
 
     with pytest.raises(RuntimeError, match="AI processing failed"):
         gemini_transcribe("test.mp3")
+
+
+@patch("core.services.gemini_transcriber._generate_json")
+@patch("core.services.gemini_transcriber.split_audio_at_silence")
+def test_gemini_transcribe_long_merges_segments_in_order(
+    mock_split, mock_generate, tmp_path
+):
+    """Test segment transcripts are merged in order before the summary pass."""
+    parts = []
+    for index in range(3):
+        part = tmp_path / f"audio_part{index}.mp3"
+        part.write_bytes(f"segment {index}".encode())
+        parts.append(part)
+    mock_split.return_value = [(part, None) for part in parts]
+
+    def fake_generate(request_parts, schema, **_kwargs):
+        if "inline_data" not in request_parts[0]:
+            assert schema is SummaryResult
+            return {"triggers": ["Walk daily"], "title": "Long Reel"}
+        assert schema is SegmentResult
+        audio = request_parts[0]["inline_data"]["data"].decode()
+        return {
+            "language": "hi",
+            "transcript_native": f"native {audio}",
+            "transcript_english": f"english {audio}",
+        }
+
+    mock_generate.side_effect = fake_generate
+
+    result = gemini_transcribe_long(str(tmp_path / "audio.mp3"), 200.0)
+
+    assert result["language"] == "hi"
+    assert result["transcript_native"] == (
+        "native segment 0\nnative segment 1\nnative segment 2"
+    )
+    assert result["transcript_english"] == (
+        "english segment 0\nenglish segment 1\nenglish segment 2"
+    )
+    assert result["triggers"] == ["Walk daily"]
+    assert result["title"] == "Long Reel"
+    summary_request = mock_generate.call_args_list[-1].args[0]
+    assert summary_request[0]["text"].endswith(result["transcript_english"])
+    assert not any(part.exists() for part in parts)
+
+
+@patch("core.services.gemini_transcriber.GEMINI_FILES_API_MIN_BYTES", 4)
+@patch("core.services.gemini_transcriber._generate_json")
+@patch("core.services.gemini_transcriber.split_audio_at_silence")
+def test_gemini_transcribe_long_uploads_large_segments(
+    mock_split, mock_generate, tmp_path
+):
+    """Test segments over the Files API threshold are uploaded, not inlined."""
+    parts = [tmp_path / "audio_part0.mp3", tmp_path / "audio_part1.mp3"]
+    for part in parts:
+        part.write_bytes(f"{part.name} audio".encode())
+    mock_split.return_value = [(part, part.stem * 4) for part in parts]
+    mock_generate.return_value = {"transcript_english": "text", "title": "Long"}
+
+    gemini_transcribe_long(str(tmp_path / "audio.mp3"), 200.0)
+
+    segment_calls = [
+        call for call in mock_generate.call_args_list if call.args[1] is SegmentResult
+    ]
+    assert len(segment_calls) == 2
+    for call in segment_calls:
+        assert "inline_data" not in call.args[0][0]
+        segment_path, segment_hash = call.kwargs["audio_upload"]
+        assert segment_hash == Path(segment_path).stem * 4
+
+
+@patch("core.services.gemini_transcriber.gemini_transcribe")
+@patch("core.services.gemini_transcriber.split_audio_at_silence")
+def test_gemini_transcribe_long_unsplit_audio(mock_split, mock_transcribe):
+    """Test audio that yields a single segment uses the one-shot path."""
+    mock_split.return_value = [(Path("/tmp/audio.mp3"), None)]
+    mock_transcribe.return_value = {"title": "Short"}
+
+    assert gemini_transcribe_long("/tmp/audio.mp3", 100.0) == {"title": "Short"}
+    mock_transcribe.assert_called_once_with(
+        "/tmp/audio.mp3", None, duration_seconds=100.0
+    )
+
+
+@pytest.mark.django_db
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["testkey"])
+@patch("core.services.gemini_transcriber.GEMINI_FILES_API_MIN_BYTES", 4)
+@patch("core.services.gemini_transcriber.KEY_MANAGER")
+def test_gemini_transcribe_large_audio_uses_files_api(
+    mock_key_manager, mock_google_genai_client, tmp_path
+):
+    """Test large audio is uploaded once and referenced by URI on retries."""
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"large audio payload")
+
+    uploaded = MagicMock()
+    uploaded.name = "files/abc"
+    uploaded.uri = "https://generativelanguage.googleapis.com/v1beta/files/abc"
+    uploaded.mime_type = "audio/mpeg"
+    uploaded.state = "ACTIVE"
+    uploaded.expiration_time = None
+    mock_google_genai_client.files.upload.return_value = uploaded
+    setup_mock_response(mock_google_genai_client, _reply(title="Uploaded"))
+
+    mock_key_manager.key_count = 1
+    mock_key_manager.get_client.return_value = ("testkey", mock_google_genai_client)
+
+    assert gemini_transcribe(str(audio), "hash1")["title"] == "Uploaded"
+    assert gemini_transcribe(str(audio), "hash1")["title"] == "Uploaded"
+
+    mock_google_genai_client.files.upload.assert_called_once()
+    parts = mock_google_genai_client.models.generate_content.call_args.kwargs[
+        "contents"
+    ][0]["parts"]
+    assert parts[0] == {
+        "file_data": {"file_uri": uploaded.uri, "mime_type": "audio/mpeg"}
+    }
+    assert "inline_data" not in str(parts)
+
+
+@pytest.mark.django_db
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["testkey"])
+@patch("core.services.gemini_transcriber.KEY_MANAGER")
+@patch("builtins.open", new_callable=mock_open, read_data=b"audio data")
+def test_gemini_transcribe_small_audio_stays_inline(
+    _mock_file, mock_key_manager, mock_google_genai_client
+):
+    """Test audio below the threshold is still sent inline."""
+    mock_key_manager.key_count = 1
+    mock_key_manager.get_client.return_value = ("testkey", mock_google_genai_client)
+
+    gemini_transcribe("test.mp3", "hash1")
+
+    mock_google_genai_client.files.upload.assert_not_called()
+    parts = mock_google_genai_client.models.generate_content.call_args.kwargs[
+        "contents"
+    ][0]["parts"]
+    assert "inline_data" in parts[0]
+
+
+@pytest.mark.django_db
+@patch("core.services.gemini_transcriber._generate_json")
+@patch("core.services.gemini_transcriber.split_audio_at_silence")
+def test_gemini_transcribe_long_uses_response_cache(mock_split, mock_generate):
+    """Test a cached long transcription skips splitting and Gemini calls."""
+    from core.services.gemini_transcriber import LONG_PROMPT_VERSION, MODEL
+    from core.services.response_cache import store
+
+    store("hash1", MODEL, LONG_PROMPT_VERSION, {"title": "Cached Long"})
+
+    result = gemini_transcribe_long("/tmp/audio.mp3", 400.0, "hash1")
+
+    assert result == {"title": "Cached Long"}
+    mock_split.assert_not_called()
+    mock_generate.assert_not_called()
+
+
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["key1", "key2"])
+@patch("google.genai.Client")
+def test_gemini_transcribe_async_keeps_requests_in_flight(mock_client, tmp_path):
+    """Test concurrent async transcriptions overlap on one event loop."""
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"audio data")
+    in_flight = 0
+    peak = 0
+
+    async def fake_generate(**_kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        response = MagicMock()
+        response.text = _reply(title="Async")
+        return response
+
+    mock_client.return_value.aio.models.generate_content = AsyncMock(
+        side_effect=fake_generate
+    )
+    manager = AsyncGeminiKeyManager(GeminiKeyManager(keys=["key1", "key2"]), 4)
+
+    async def run_all():
+        return await asyncio.gather(
+            *(gemini_transcribe_async(str(audio)) for _ in range(10))
+        )
+
+    with patch("core.services.gemini_transcriber.ASYNC_KEY_MANAGER", manager):
+        results = asyncio.run(run_all())
+
+    assert [r["title"] for r in results] == ["Async"] * 10
+    assert peak == 4
+    parts = mock_client.return_value.aio.models.generate_content.call_args.kwargs[
+        "contents"
+    ][0]["parts"]
+    assert parts[0]["inline_data"]["data"] == b"audio data"
+
+
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["key1", "key2"])
+@patch("google.genai.Client")
+def test_gemini_transcribe_async_rotates_on_quota(mock_client, tmp_path):
+    """Test a quota error cools the key down and retries on the next key."""
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"audio data")
+    error_resp = MagicMock()
+    error_resp.text = "RESOURCE_EXHAUSTED"
+    response = MagicMock()
+    response.text = _reply(title="Second Key")
+    mock_client.return_value.aio.models.generate_content = AsyncMock(
+        side_effect=[ClientError("RESOURCE_EXHAUSTED", response=error_resp), response]
+    )
+    sync_manager = GeminiKeyManager(keys=["key1", "key2"])
+    manager = AsyncGeminiKeyManager(sync_manager)
+
+    with patch("core.services.gemini_transcriber.ASYNC_KEY_MANAGER", manager):
+        result = asyncio.run(gemini_transcribe_async(str(audio)))
+
+    assert result["title"] == "Second Key"
+    assert sync_manager.get_client()[0] == "key2"
+
+
+@patch("builtins.open", new_callable=mock_open, read_data=b"audio data")
+def test_gemini_transcribe_requests_structured_output(
+    _mock_file, mock_google_genai_client
+):
+    """Test transcription asks Gemini for JSON matching the result schema."""
+    gemini_transcribe("test.mp3")
+
+    config = mock_google_genai_client.models.generate_content.call_args.kwargs[
+        "config"
+    ]
+    assert config["response_mime_type"] == "application/json"
+    assert config["response_schema"] is TranscriptionResult
+
+
+@patch("builtins.open", new_callable=mock_open, read_data=b"audio data")
+def test_gemini_transcribe_streams_partial_fields(
+    _mock_file, mock_google_genai_client
+):
+    """Test streamed responses report completed fields before the end."""
+    chunks = [
+        '{"language": "en", "ti',
+        'tle": "Early Title", "transcript_english": "Hel',
+        'lo", "transcript_native": "Hello", "triggers": ["Wave"]}',
+    ]
+    mock_google_genai_client.models.generate_content_stream.return_value = [
+        MagicMock(text=chunk) for chunk in chunks
+    ]
+    partials = []
+
+    result = gemini_transcribe("test.mp3", on_partial=partials.append)
+
+    assert partials[0] == {"language": "en"}
+    assert partials[1] == {"language": "en", "title": "Early Title"}
+    assert partials[-1] == result
+    assert result["triggers"] == ["Wave"]
+    mock_google_genai_client.models.generate_content.assert_not_called()
+
+
+@patch("builtins.open", new_callable=mock_open, read_data=b"audio data")
+@patch("core.services.gemini_transcriber.route_audio")
+def test_gemini_transcribe_falls_back_to_next_model(
+    mock_route, _mock_file, mock_google_genai_client
+):
+    """Test invalid output from the routed model is retried on the fallback."""
+    mock_route.return_value = ["models/lite", "models/capacity"]
+    invalid = MagicMock(text="not json")
+    valid = MagicMock(text=_reply(title="Recovered"))
+    mock_google_genai_client.models.generate_content.side_effect = [invalid, valid]
+
+    result = gemini_transcribe("test.mp3", duration_seconds=20.0)
+
+    assert result["title"] == "Recovered"
+    models = [
+        call.kwargs["model"]
+        for call in mock_google_genai_client.models.generate_content.call_args_list
+    ]
+    assert models == ["models/lite", "models/capacity"]
+    mock_route.assert_called_once()
+
+
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["key1", "key2"])
+@patch("core.services.gemini_transcriber.GEMINI_REQUEST_TIMEOUT_SECONDS", 12.5)
+@patch("google.genai.Client")
+def test_gemini_transcribe_timeout_moves_to_next_key(mock_client, tmp_path):
+    """Test a timed-out call is retried on another key within the deadline."""
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"audio data")
+    response = MagicMock(text=_reply(title="Second Key"))
+    generate = mock_client.return_value.models.generate_content
+    generate.side_effect = [requests.exceptions.ReadTimeout("slow"), response]
+    manager = GeminiKeyManager(keys=["key1", "key2"])
+
+    with patch("core.services.gemini_transcriber.KEY_MANAGER", manager):
+        result = gemini_transcribe(str(audio))
+
+    assert result["title"] == "Second Key"
+    timeouts = [
+        call.kwargs["config"]["http_options"]["timeout"]
+        for call in generate.call_args_list
+    ]
+    assert timeouts == [12500, 12500]
+
+
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["key1", "key2"])
+@patch("google.genai.Client")
+def test_gemini_transcribe_breaker_benches_failing_key(
+    mock_client, tmp_path, isolated_key_breaker
+):
+    """Test repeated server errors open the key's breaker and cool it down."""
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"audio data")
+    isolated_key_breaker.threshold = 1
+    generate = mock_client.return_value.models.generate_content
+    error_resp = MagicMock()
+    error_resp.text = "UNAVAILABLE"
+    generate.side_effect = [
+        ServerError(503, response=error_resp),
+        MagicMock(text=_reply(title="Recovered")),
+    ]
+    manager = GeminiKeyManager(keys=["key1", "key2"])
+
+    with patch("core.services.gemini_transcriber.KEY_MANAGER", manager):
+        assert gemini_transcribe(str(audio))["title"] == "Recovered"
+
+    # key1 is benched, so every following request lands on key2.
+    assert {manager.get_client()[0] for _ in range(3)} == {"key2"}
+
+
+@patch("core.services.gemini_transcriber.GEMINI_API_KEYS", ["key1", "key2"])
+@patch("core.services.gemini_transcriber.GEMINI_HEDGE_ENABLED", True)
+@patch("core.services.gemini_transcriber._hedge_delay", return_value=0.05)
+@patch("google.genai.Client")
+def test_gemini_transcribe_hedges_slow_request(
+    mock_client, _mock_delay, tmp_path
+):
+    """Test a stalled request is duplicated on the other key."""
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"audio data")
+    release = threading.Event()
+    clients = {}
+
+    def make_client(api_key):
+        client = MagicMock()
+
+        def generate(**_kwargs):
+            if api_key == "key1":
+                release.wait(5)
+                return MagicMock(text=_reply(title="Slow"))
+            return MagicMock(text=_reply(title="Hedged"))
+
+        client.models.generate_content.side_effect = generate
+        clients[api_key] = client
+        return client
+
+    mock_client.side_effect = make_client
+    manager = GeminiKeyManager(keys=["key1", "key2"])
+
+    try:
+        with patch("core.services.gemini_transcriber.KEY_MANAGER", manager):
+            result = gemini_transcribe(str(audio))
+    finally:
+        release.set()
+
+    assert result["title"] == "Hedged"
+    assert set(clients) == {"key1", "key2"}
@@ -0,0 +1,135 @@
+"""Tests for post image preprocessing."""
+
+import io
+from unittest.mock import patch
+
+from PIL import Image
+
+from core.services.image_preprocess import (
+    prepared_image_part,
+    prepared_image_parts,
+    shrink_image,
+)
+
+
+def _jpeg(size, exif=None, mode="RGB", color="white"):
+    image = Image.new(mode, size, color)
+    output = io.BytesIO()
+    if mode == "RGBA":
+        image.save(output, format="PNG")
+    else:
+        image.save(output, format="JPEG", quality=100, exif=exif or b"")
+    return output.getvalue()
+
+
+def test_shrink_image_caps_long_edge():
+    """Test large slides are downscaled keeping their aspect ratio."""
+    shrunk = shrink_image(_jpeg((2160, 2700)), max_edge=1536)
+
+    with Image.open(io.BytesIO(shrunk)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (1229, 1536)
+
+
+def test_shrink_image_keeps_small_images_size():
+    """Test images already under the limit are not upscaled."""
+    shrunk = shrink_image(_jpeg((640, 800)), max_edge=1536)
+
+    with Image.open(io.BytesIO(shrunk)) as image:
+        assert image.size == (640, 800)
+
+
+def test_shrink_image_strips_metadata_and_applies_orientation():
+    """Test EXIF is dropped after rotating the pixels upright."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif[0x010F] = "Camera Maker"
+    shrunk = shrink_image(_jpeg((400, 200), exif=exif.tobytes()), max_edge=1536)
+
+    with Image.open(io.BytesIO(shrunk)) as image:
+        assert image.size == (200, 400)
+        assert not image.getexif()
+        assert "icc_profile" not in image.info
+
+
+def test_shrink_image_converts_transparent_images():
+    """Test RGBA images are re-encoded as JPEG."""
+    shrunk = shrink_image(_jpeg((300, 300), mode="RGBA"))
+
+    with Image.open(io.BytesIO(shrunk)) as image:
+        assert image.format == "JPEG"
+        assert image.mode == "RGB"
+
+
+def test_shrink_image_flattens_transparency_onto_white():
+    """Test transparent pixels become white rather than black."""
+    shrunk = shrink_image(_jpeg((300, 300), mode="RGBA", color=(0, 0, 0, 0)))
+
+    with Image.open(io.BytesIO(shrunk)) as image:
+        assert all(channel > 250 for channel in image.getpixel((150, 150)))
+
+
+def test_prepared_image_part_reencodes(tmp_path):
+    """Test slides are sent as smaller JPEG parts."""
+    original = _jpeg((2000, 2000))
+    path = tmp_path / "slide.png"
+    path.write_bytes(original)
+
+    part = prepared_image_part(path)["inline_data"]
+
+    assert part["mime_type"] == "image/jpeg"
+    assert len(part["data"]) < len(original)
+
+
+def test_prepared_image_part_passes_through_undecodable(tmp_path):
+    """Test files Pillow cannot read are sent unchanged."""
+    path = tmp_path / "slide.webp"
+    path.write_bytes(b"not an image")
+
+    part = prepared_image_part(path)["inline_data"]
+
+    assert part == {"mime_type": "image/webp", "data": b"not an image"}
+
+
+def test_prepared_image_part_keeps_smaller_original(tmp_path):
+    """Test the original is sent when re-encoding would not shrink it."""
+    path = tmp_path / "slide.png"
+    path.write_bytes(b"tiny")
+
+    with patch(
+        "core.services.image_preprocess.shrink_image", return_value=b"larger jpeg"
+    ):
+        part = prepared_image_part(path)["inline_data"]
+
+    assert part == {"mime_type": "image/png", "data": b"tiny"}
+
+
+def test_prepared_image_part_passes_through_decompression_bombs(tmp_path):
+    """Test slides Pillow refuses as too large are sent unchanged."""
+    path = tmp_path / "slide.jpg"
+    path.write_bytes(b"huge image")
+
+    with patch(
+        "core.services.image_preprocess.shrink_image",
+        side_effect=Image.DecompressionBombError("too many pixels"),
+    ):
+        part = prepared_image_part(path)["inline_data"]
+
+    assert part == {"mime_type": "image/jpeg", "data": b"huge image"}
+
+
+def test_prepared_image_parts_keeps_slide_order(tmp_path):
+    """Test parallel preprocessing returns parts in slide order."""
+    paths = []
+    for index, width in enumerate((300, 400, 500, 600)):
+        path = tmp_path / f"slide{index}.jpg"
+        path.write_bytes(_jpeg((width, 100)))
+        paths.append(path)
+
+    parts = prepared_image_parts(paths)
+
+    widths = []
+    for part in parts:
+        with Image.open(io.BytesIO(part["inline_data"]["data"])) as image:
+            widths.append(image.size[0])
+    assert widths == [300, 400, 500, 600]
@@ -0,0 +1,45 @@
+"""Tests for the import timing helpers and the lazy-import guarantee."""
+
+import pytest
+
+from core.services.import_timing import (
+    DEFAULT_TARGETS,
+    find_heavy_modules,
+    measure_import,
+    parse_importtime,
+)
+
+SAMPLE_STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _io
+import time:       300 |        420 |   io
+import time:      1500 |       1920 | django
+import time:        15 |         15 | yt_dlp
+"""
+
+
+def test_parse_importtime():
+    """Test parsing of -X importtime lines, skipping the header."""
+    entries = parse_importtime(SAMPLE_STDERR)
+
+    assert [entry["module"] for entry in entries] == ["_io", "io", "django", "yt_dlp"]
+    assert entries[0]["depth"] == 2
+    assert entries[2] == {
+        "module": "django",
+        "depth": 0,
+        "self_us": 1500,
+        "cumulative_us": 1920,
+    }
+
+
+def test_find_heavy_modules():
+    """Test detection of heavy third-party packages."""
+    entries = parse_importtime(SAMPLE_STDERR)
+    assert find_heavy_modules(entries) == ["yt_dlp"]
+
+
+@pytest.mark.parametrize("module", DEFAULT_TARGETS)
+def test_entry_points_do_not_import_heavy_modules(module):
+    """Boot paths must not import yt-dlp, instaloader, curl_cffi or genai."""
+    result = measure_import(module)
+    assert result["heavy"] == []
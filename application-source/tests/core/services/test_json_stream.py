@@ -0,0 +1,62 @@
+"""Tests for incremental JSON object parsing."""
+
+import json
+
+from core.services.json_stream import IncrementalJSONObject
+
+
+def test_fields_reported_as_they_complete():
+    """Test each top-level field is reported once its value is complete."""
+    parser = IncrementalJSONObject()
+
+    assert parser.feed('{"language": "h') == {}
+    assert parser.feed('i", "title": "Morning') == {"language": "hi"}
+    assert parser.feed(' Walk", "triggers": ["Walk", "St') == {
+        "title": "Morning Walk"
+    }
+    assert parser.feed('retch"]}') == {"triggers": ["Walk", "Stretch"]}
+    assert parser.done
+    assert parser.fields == {
+        "language": "hi",
+        "title": "Morning Walk",
+        "triggers": ["Walk", "Stretch"],
+    }
+
+
+def test_matches_json_loads_one_character_at_a_time():
+    """Test single-character chunks reproduce the fully decoded object."""
+    document = {
+        "title": 'Quotes "and" \\ escapes',
+        "count": 12,
+        "nested": {"a": [1, {"b": None}]},
+        "ok": True,
+    }
+    parser = IncrementalJSONObject()
+    for char in json.dumps(document, ensure_ascii=False):
+        parser.feed(char)
+
+    assert parser.fields == document
+    assert parser.done
+
+
+def test_number_waits_for_terminator():
+    """Test a number at the end of the buffer is not reported early."""
+    parser = IncrementalJSONObject()
+
+    assert parser.feed('{"count": 12') == {}
+    assert parser.feed("3}") == {"count": 123}
+
+
+def test_skips_leading_fence():
+    """Test text before the opening brace is ignored."""
+    parser = IncrementalJSONObject()
+
+    assert parser.feed('```json\n{"title": "T"') == {"title": "T"}
+
+
+def test_non_object_stops_parsing():
+    """Test malformed object content ends parsing without raising."""
+    parser = IncrementalJSONObject()
+
+    assert parser.feed("{oops: 1}") == {}
+    assert parser.done
@@ -0,0 +1,176 @@
+"""Tests for the metrics service and the /metrics endpoint."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.genai.errors import ClientError, ServerError
+
+from core.services.metrics import (
+    CACHE_LOOKUPS,
+    GEMINI_REQUEST_SECONDS,
+    POST_STRATEGY_SECONDS,
+    SERVICE_SECONDS,
+    STAGE_SECONDS,
+    Registry,
+    gemini_attempt,
+    observe_cache,
+    render_metrics,
+    timed,
+)
+from core.services.model_router import InvalidOutputError
+from core.services.pipeline_stages import stage
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test histogram buckets are cumulative and end with +Inf, sum and count."""
+    registry = Registry()
+    histogram = registry.histogram("t_seconds", "Test.", ("kind",), (1.0, 5.0))
+    histogram.observe(0.5, kind="reel")
+    histogram.observe(3.0, kind="reel")
+    histogram.observe(9.0, kind="reel")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE t_seconds histogram" in lines
+    assert 't_seconds_bucket{kind="reel",le="1.0"} 1' in lines
+    assert 't_seconds_bucket{kind="reel",le="5.0"} 2' in lines
+    assert 't_seconds_bucket{kind="reel",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{kind="reel"} 12.5' in lines
+    assert 't_seconds_count{kind="reel"} 3' in lines
+
+
+def test_label_values_are_escaped_and_checked():
+    """Test quotes in label values are escaped and wrong label names rejected."""
+    registry = Registry()
+    counter = registry.counter("t_total", "Test.", ("name",))
+    counter.inc(name='say "hi"')
+
+    assert 't_total{name="say \\"hi\\""} 1' in registry.render()
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_stages_and_timed_services_are_recorded():
+    """Test stage() and @timed calls land in their histograms with outcomes."""
+
+    @timed("download_reel")
+    def failing():
+        raise RuntimeError("boom")
+
+    with stage("download"):
+        pass
+    with pytest.raises(RuntimeError):
+        failing()
+
+    assert STAGE_SECONDS.count(stage="download", outcome="ok") == 1
+    assert SERVICE_SECONDS.count(service="download_reel", outcome="error") == 1
+
+
+def test_cache_hit_ratio_is_derived_from_lookups():
+    """Test the hit ratio gauge is hits over lookups per cache."""
+    observe_cache("url", True)
+    observe_cache("url", False)
+    observe_cache("url", False)
+    observe_cache("url", True)
+    observe_cache("audio_hash", False)
+
+    text = render_metrics()
+
+    assert CACHE_LOOKUPS.value(cache="url", result="hit") == 2
+    assert 'trigger_engine_cache_hit_ratio{cache="url"} 0.5' in text
+    assert 'trigger_engine_cache_hit_ratio{cache="audio_hash"} 0.0' in text
+
+
+RESPONSE = MagicMock(text="error")
+
+
+@pytest.mark.parametrize(
+    "error, outcome",
+    [
+        (None, "ok"),
+        (ClientError(429, response=RESPONSE), "quota"),
+        (ClientError(400, response=RESPONSE), "client_error"),
+        (ServerError(503, response=RESPONSE), "transient"),
+        (InvalidOutputError("truncated"), "invalid_output"),
+        (ValueError("bug"), "error"),
+    ],
+)
+def test_gemini_attempt_labels_outcome_per_key(error, outcome):
+    """Test each Gemini attempt is recorded per key id, model and outcome."""
+    with patch("core.services.gemini_key_manager.key_id", return_value="abc"):
+        try:
+            with gemini_attempt("transcribe", "secret-key", "models/m"):
+                if error is not None:
+                    raise error
+        except Exception as e:
+            assert e is error
+
+    assert (
+        GEMINI_REQUEST_SECONDS.count(
+            service="transcribe", key="abc", model="models/m", outcome=outcome
+        )
+        == 1
+    )
+    assert "secret-key" not in render_metrics()
+
+
+def test_post_strategies_are_timed_with_outcome(tmp_path):
+    """Test each post download strategy attempt is recorded by outcome."""
+    from core.services import post_text_aggregator
+
+    image = tmp_path / "a.jpg"
+    with (
+        patch.object(
+            post_text_aggregator, "_try_instaloader", side_effect=RuntimeError
+        ),
+        patch.object(post_text_aggregator, "_try_embed_page", return_value=[]),
+        patch.object(post_text_aggregator, "_try_direct_page", return_value=[image]),
+    ):
+        post_text_aggregator.download_instagram_post(
+            "https://www.instagram.com/p/ABC/"
+        )
+
+    assert POST_STRATEGY_SECONDS.count(strategy="Instaloader", outcome="error") == 1
+    assert POST_STRATEGY_SECONDS.count(strategy="Embed page", outcome="empty") == 1
+    assert POST_STRATEGY_SECONDS.count(strategy="Direct page", outcome="ok") == 1
+    assert SERVICE_SECONDS.count(service="download_instagram_post", outcome="ok") == 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_serves_prometheus_text(client):
+    """Test /metrics/ answers in the Prometheus text format."""
+    observe_cache("source_id", True)
+
+    response = client.get("/metrics/")
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = response.content.decode()
+    assert "# TYPE trigger_engine_job_seconds histogram" in body
+    sample = 'trigger_engine_cache_lookups_total{cache="source_id",result="hit"} 1'
+    assert sample in body
+
+
+@pytest.mark.django_db
+def test_process_reel_counts_url_cache_hits(client):
+    """Test a processed URL served from the database counts as a url cache hit."""
+    from core.models import ReelInsight
+    from django.utils import timezone
+
+    ReelInsight.objects.create(
+        source_url="https://www.instagram.com/reel/R1/",
+        title="t",
+        transcript_original="o",
+        transcript_english="e",
+        triggers="a",
+        processed_at=timezone.now(),
+    )
+
+    response = client.post(
+        "/api/process-reel/",
+        {"url": "https://www.instagram.com/reel/R1/"},
+        content_type="application/json",
+    )
+
+    assert response.json()["status"] == "cached"
+    assert CACHE_LOOKUPS.value(cache="url", result="hit") == 1
@@ -0,0 +1,191 @@
+"""Tests for Gemini model routing."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from google.genai.errors import ClientError
+
+from core.services.gemini_resilience import CircuitBreaker
+from core.services.model_router import (
+    InvalidOutputError,
+    ModelRouter,
+    is_truncated,
+    route_audio,
+    route_images,
+)
+
+CAPACITY = "models/capacity"
+
+
+@patch("core.services.model_router.GEMINI_CAPACITY_MODEL", CAPACITY)
+@patch("core.services.model_router.GEMINI_ROUTE_LONG_AUDIO_SECONDS", 90.0)
+def test_route_audio_by_duration():
+    """Test long clips prefer the capacity model and short ones the lite model."""
+    assert route_audio("models/lite", 30.0) == ["models/lite", CAPACITY]
+    assert route_audio("models/lite", None) == ["models/lite", CAPACITY]
+    assert route_audio("models/lite", 120.0) == [CAPACITY, "models/lite"]
+
+
+@patch("core.services.model_router.GEMINI_CAPACITY_MODEL", CAPACITY)
+@patch("core.services.model_router.GEMINI_ROUTE_MAX_LITE_IMAGES", 1)
+@patch("core.services.model_router.GEMINI_ROUTE_MAX_LITE_IMAGE_BYTES", 1000)
+def test_route_images_by_count_and_size():
+    """Test multi-slide or large posts prefer the capacity model."""
+    assert route_images("models/lite", 1, 500) == ["models/lite", CAPACITY]
+    assert route_images("models/lite", 3, 500) == [CAPACITY, "models/lite"]
+    assert route_images("models/lite", 1, 5000) == [CAPACITY, "models/lite"]
+
+
+@patch("core.services.model_router.GEMINI_CAPACITY_MODEL", "models/lite")
+def test_route_without_distinct_capacity_model():
+    """Test a single candidate is returned when both models are the same."""
+    assert route_audio("models/lite", 600.0) == ["models/lite"]
+
+
+def test_is_truncated():
+    """Test MAX_TOKENS finish reasons are detected."""
+    response = MagicMock()
+    response.candidates = [MagicMock(finish_reason="MAX_TOKENS")]
+    assert is_truncated(response)
+
+    response.candidates = [MagicMock(finish_reason="STOP")]
+    assert not is_truncated(response)
+
+    response.candidates = []
+    assert not is_truncated(response)
+
+
+def test_call_falls_back_on_invalid_output():
+    """Test the next model is tried when one returns unusable output."""
+    router = ModelRouter()
+    attempts = []
+
+    def attempt(model):
+        attempts.append(model)
+        if model == "a":
+            raise InvalidOutputError("truncated")
+        return {"model": model}
+
+    assert router.call(["a", "b"], attempt) == {"model": "b"}
+    assert attempts == ["a", "b"]
+    stats = router.stats()
+    assert stats["a"]["failures"] == 1
+    assert stats["b"]["calls"] == 1
+
+
+def test_call_raises_last_invalid_output():
+    """Test the last InvalidOutputError is raised when no model succeeds."""
+    router = ModelRouter()
+
+    def attempt(model):
+        raise InvalidOutputError(f"bad {model}")
+
+    with pytest.raises(InvalidOutputError, match="bad b"):
+        router.call(["a", "b"], attempt)
+
+
+def test_call_does_not_fall_back_on_other_errors():
+    """Test errors other than unusable output propagate immediately."""
+    router = ModelRouter()
+    attempt = MagicMock(side_effect=RuntimeError("quota"))
+
+    with pytest.raises(RuntimeError, match="quota"):
+        router.call(["a", "b"], attempt)
+    attempt.assert_called_once_with("a")
+
+
+def test_key_errors_do_not_count_against_model():
+    """Test quota and key rejections leave the model's health untouched."""
+    router = ModelRouter(breaker=CircuitBreaker(threshold=1, open_seconds=60))
+    quota = RuntimeError("AI quota exceeded on all Gemini keys")
+    quota.__cause__ = ClientError(429, response=MagicMock(text="error"))
+    attempt = MagicMock(side_effect=quota)
+
+    with pytest.raises(RuntimeError):
+        router.call(["a"], attempt)
+
+    assert router.breaker.allow("a")
+    assert router.stats() == {}
+
+
+def test_server_errors_count_against_model():
+    """Test 5xx errors, even wrapped after every key failed, count as failures."""
+    router = ModelRouter(breaker=CircuitBreaker(threshold=1, open_seconds=60))
+    error = RuntimeError("Gemini did not respond on any key")
+    error.__cause__ = requests.exceptions.Timeout("read timed out")
+    attempt = MagicMock(side_effect=error)
+
+    with pytest.raises(RuntimeError):
+        router.call(["a"], attempt)
+
+    assert router.stats()["a"]["failures"] == 1
+    assert not router.breaker.allow("a")
+
+
+def test_failing_model_is_tried_last():
+    """Test models failing most recent calls are demoted."""
+    router = ModelRouter()
+    for _ in range(4):
+        router.record("a", 1.0, ok=False)
+    router.record("b", 1.0, ok=True)
+
+    assert router.order(["a", "b"]) == ["b", "a"]
+    assert router.order(["c", "a"]) == ["c", "a"]
+
+
+def test_stats_latency_percentiles():
+    """Test stats report per-model latency percentiles."""
+    router = ModelRouter()
+    for seconds in range(1, 21):
+        router.record("a", float(seconds), ok=True)
+
+    stats = router.stats()["a"]
+    assert stats["calls"] == 20
+    assert stats["latency_p50_seconds"] == 10.0
+    assert stats["latency_p95_seconds"] == 19.0
+
+
+def test_open_breaker_skips_model():
+    """Test a model with an open circuit is not called."""
+    router = ModelRouter(breaker=CircuitBreaker(threshold=2, open_seconds=60))
+    router.record("a", 1.0, ok=False)
+    router.record("a", 1.0, ok=False)
+    attempt = MagicMock(return_value="ok")
+
+    assert router.call(["a", "b"], attempt) == "ok"
+    attempt.assert_called_once_with("b")
+
+
+def test_all_breakers_open_fails_fast():
+    """Test calls fail immediately when every candidate's circuit is open."""
+    router = ModelRouter(breaker=CircuitBreaker(threshold=1, open_seconds=60))
+    router.record("a", 1.0, ok=False)
+    attempt = MagicMock()
+
+    with pytest.raises(RuntimeError, match="failing repeatedly"):
+        router.call(["a"], attempt)
+    attempt.assert_not_called()
+
+
+@patch("core.services.gemini_resilience.time.monotonic")
+def test_half_open_trial_claimed_only_when_tried(mock_monotonic):
+    """Test a half-open model keeps its trial when an earlier model succeeds."""
+    mock_monotonic.return_value = 100.0
+    router = ModelRouter(breaker=CircuitBreaker(threshold=1, open_seconds=30))
+    router.record("b", 1.0, ok=False)
+    mock_monotonic.return_value = 131.0
+
+    assert router.call(["a", "b"], MagicMock(return_value="ok")) == "ok"
+    assert router.breaker.allow("b")
+
+
+def test_latency_percentile_needs_samples():
+    """Test no percentile is reported before enough calls."""
+    router = ModelRouter()
+    router.record("a", 1.0, ok=True)
+    assert router.latency_percentile("a", 0.95) is None
+
+    for _ in range(20):
+        router.record("a", 2.0, ok=True)
+    assert router.latency_percentile("a", 0.95) == 2.0
@@ -0,0 +1,72 @@
+"""Tests for the pipeline_stages service."""
+
+import pytest
+
+from core.services.pipeline_stages import (
+    add_stage_listener,
+    remove_stage_listener,
+    stage,
+)
+
+
+@pytest.fixture
+def recorded():
+    calls = []
+
+    def listener(name, seconds, ok):
+        calls.append((name, seconds, ok))
+
+    add_stage_listener(listener)
+    yield calls
+    remove_stage_listener(listener)
+
+
+def test_stage_reports_name_duration_and_success(recorded):
+    """Test a stage that finishes is reported as ok with its duration."""
+    with stage("download"):
+        pass
+
+    [(name, seconds, ok)] = recorded
+    assert name == "download"
+    assert seconds >= 0
+    assert ok is True
+
+
+def test_stage_reports_failure_and_reraises(recorded):
+    """Test a stage that raises is reported as failed and the error propagates."""
+    with pytest.raises(ValueError):
+        with stage("ai_call"):
+            raise ValueError("boom")
+
+    assert recorded[0][0] == "ai_call"
+    assert recorded[0][2] is False
+
+
+def test_failing_listener_does_not_break_the_stage(recorded):
+    """Test an exception in one listener neither escapes nor skips others."""
+
+    def broken(*_args):
+        raise RuntimeError("listener bug")
+
+    add_stage_listener(broken)
+    try:
+        with stage("hash"):
+            pass
+    finally:
+        remove_stage_listener(broken)
+
+    assert [call[0] for call in recorded] == ["hash"]
+
+
+def test_removed_listener_is_not_called(recorded):
+    """Test remove_stage_listener stops further calls."""
+    calls = []
+    listener = lambda *args: calls.append(args)  # noqa: E731
+    add_stage_listener(listener)
+    remove_stage_listener(listener)
+
+    with stage("db_save"):
+        pass
+
+    assert calls == []
+    assert len(recorded) == 1
@@ -1,17 +1,18 @@
 """Tests for the post_gemini service."""
 
+import asyncio
 import json
 from pathlib import Path
-from unittest.mock import MagicMock, mock_open, patch
+from unittest.mock import AsyncMock, MagicMock, mock_open, patch
 
 import pytest
 from google.genai.errors import ClientError
 
 from core.constants import GEMINI_API_KEYS
 from core.services.post_gemini import (
-    _parse_json_object,
     _safe_key_index,
     extract_post_text,
+    extract_post_text_async,
 )
 
 
@@ -22,35 +23,6 @@ def test_safe_key_index():
         assert _safe_key_index("unknown") == -1
 
 
-def test_parse_json_object_valid():
-    """Test parsing a valid JSON object."""
-    assert _parse_json_object('{"key": "value"}') == {"key": "value"}
-
-
-def test_parse_json_object_markdown_wrapper():
-    """Test parsing JSON object enclosed in markdown code blocks."""
-    # Test with standard markdown
-    text = '```json\n{"data": 123}\n```'
-    assert _parse_json_object(text) == {"data": 123}
-
-
-def test_parse_json_object_embedded_snippet():
-    """Test parsing JSON object embedded within other text."""
-    # Test with garbage text before and after the snippet
-    text = 'Here is the response:\n{"inner": "content"}\nHope this helps.'
-    assert _parse_json_object(text) == {"inner": "content"}
-
-
-def test_parse_json_object_invalid():
-    """Test parsing invalid JSON object raises RuntimeError."""
-    with pytest.raises(
-        RuntimeError, match="AI returned invalid post text JSON"
-    ):
-        _parse_json_object(
-            "This is completely free of any braces or json structure"
-        )
-
-
 def setup_mock_response(mock_client_fixture, text_response):
     """Set up the mock client to return a specific text response."""
     mock_response = MagicMock()
@@ -90,15 +62,17 @@ def test_extract_post_text_fallback_native_transcript(
 ):
     """Test extracting post text when native transcript is empty."""
     response_json = {
+        "language": "en",
         "transcript_native": "",  # Empty native transcript
         "transcript_english": "English fallback works",
+        "triggers": [],
+        "title": "Post",
     }
     setup_mock_response(mock_google_genai_client, json.dumps(response_json))
 
     result = extract_post_text([Path("dummy.jpg")])
 
     assert result["transcript_native"] == "English fallback works"
-    assert result["title"] == "New Post Processed"  # Testing default
 
 
 @patch("pathlib.Path.open", new_callable=mock_open, read_data=b"image bytes")
@@ -107,8 +81,15 @@ def test_extract_post_text_no_english_transcript(
     mock_key_manager, _mock_file, mock_google_genai_client
 ):
     """Test extracting post text when no English transcript is available."""
-    # Both missing
-    setup_mock_response(mock_google_genai_client, '{"transcript_english": ""}')
+    # Both empty
+    response_json = {
+        "language": "en",
+        "transcript_native": "",
+        "transcript_english": "",
+        "triggers": [],
+        "title": "",
+    }
+    setup_mock_response(mock_google_genai_client, json.dumps(response_json))
 
     mock_key_manager.key_count = 1
     valid_key = GEMINI_API_KEYS[0] if GEMINI_API_KEYS else "dummy_key"
@@ -123,7 +104,7 @@ def test_extract_post_text_no_english_transcript(
         extract_post_text([Path("dummy.jpg")])
 
 
-@patch("pathlib.Path.open", new_callable=mock_open)
+@patch("pathlib.Path.open", new_callable=mock_open, read_data=b"image bytes")
 @patch("core.services.post_gemini.KEY_MANAGER")
 def test_extract_post_text_empty_response(
     mock_key_manager, _mock_file, mock_google_genai_client
@@ -144,7 +125,7 @@ def test_extract_post_text_empty_response(
         extract_post_text([Path("dummy.jpg")])
 
 
-@patch("pathlib.Path.open", new_callable=mock_open)
+@patch("pathlib.Path.open", new_callable=mock_open, read_data=b"image bytes")
 @patch("core.services.post_gemini.KEY_MANAGER")
 def test_extract_post_text_invalid_json_response(
     mock_key_manager, _mock_file, mock_google_genai_client
@@ -167,7 +148,7 @@ def test_extract_post_text_invalid_json_response(
         extract_post_text([Path("dummy.jpg")])
 
 
-@patch("pathlib.Path.open", new_callable=mock_open)
+@patch("pathlib.Path.open", new_callable=mock_open, read_data=b"image bytes")
 @patch("core.services.post_gemini.KEY_MANAGER")
 def test_extract_post_text_quota_error(
     mock_key_manager, _mock_file, mock_google_genai_client
@@ -189,7 +170,7 @@ def test_extract_post_text_quota_error(
     mock_key_manager.cooldown_key.assert_called_once_with("key1")
 
 
-@patch("pathlib.Path.open", new_callable=mock_open)
+@patch("pathlib.Path.open", new_callable=mock_open, read_data=b"image bytes")
 @patch("core.services.post_gemini.KEY_MANAGER")
 def test_extract_post_text_invalid_key_error(
     mock_key_manager, _mock_file, mock_google_genai_client
@@ -211,7 +192,7 @@ def test_extract_post_text_invalid_key_error(
     mock_key_manager.disable_key.assert_called_once_with("key1")
 
 
-@patch("pathlib.Path.open", new_callable=mock_open)
+@patch("pathlib.Path.open", new_callable=mock_open, read_data=b"image bytes")
 @patch("core.services.post_gemini.KEY_MANAGER")
 def test_extract_post_text_general_error(
     mock_key_manager, _mock_file, mock_google_genai_client
@@ -229,3 +210,60 @@ def test_extract_post_text_general_error(
 
     with pytest.raises(RuntimeError, match="Post text extraction failed"):
         extract_post_text([Path("dummy.jpg")])
+
+
+@patch("core.services.post_gemini.ASYNC_KEY_MANAGER")
+def test_extract_post_text_async_success(mock_key_manager, tmp_path):
+    """Test async post extraction sends every slide through client.aio."""
+    slides = []
+    for index in range(2):
+        slide = tmp_path / f"slide{index}.jpg"
+        slide.write_bytes(f"slide {index}".encode())
+        slides.append(slide)
+
+    response = MagicMock()
+    response.text = json.dumps(
+        {
+            "language": "en",
+            "transcript_native": "",
+            "transcript_english": "Async text",
+            "triggers": [],
+            "title": "Async",
+        }
+    )
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    mock_key_manager.key_count = 1
+    mock_key_manager.get_client = AsyncMock(return_value=("testkey", client))
+    mock_key_manager.in_flight_limit.return_value = asyncio.Semaphore(1)
+
+    result = asyncio.run(extract_post_text_async(slides))
+
+    assert result["transcript_english"] == "Async text"
+    assert result["transcript_native"] == "Async text"
+    parts = client.aio.models.generate_content.call_args.kwargs["contents"][0]["parts"]
+    assert [part["inline_data"]["data"] for part in parts[:2]] == [
+        b"slide 0",
+        b"slide 1",
+    ]
+
+
+@patch("core.services.post_gemini.ASYNC_KEY_MANAGER")
+def test_extract_post_text_async_invalid_key(mock_key_manager, tmp_path):
+    """Test async extraction disables invalid keys and reports exhaustion."""
+    slide = tmp_path / "slide.jpg"
+    slide.write_bytes(b"slide")
+    error_resp = MagicMock()
+    error_resp.text = "API_KEY_INVALID"
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(
+        side_effect=ClientError("API_KEY_INVALID", response=error_resp)
+    )
+    mock_key_manager.key_count = 1
+    mock_key_manager.get_client = AsyncMock(return_value=("testkey", client))
+    mock_key_manager.disable_key = AsyncMock()
+    mock_key_manager.in_flight_limit.return_value = asyncio.Semaphore(1)
+
+    with pytest.raises(RuntimeError, match="All Gemini keys exhausted"):
+        asyncio.run(extract_post_text_async([slide]))
+    mock_key_manager.disable_key.assert_awaited_once_with("testkey")
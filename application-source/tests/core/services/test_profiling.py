@@ -0,0 +1,120 @@
+"""Tests for the profiling service and middleware."""
+
+import os
+import pstats
+import time
+from unittest.mock import patch
+
+import pytest
+
+from core.services import profiling
+from core.services.profiling import profiled, rotate, should_profile
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    with patch("core.services.profiling.PROFILE_DIR", str(tmp_path)):
+        yield tmp_path
+
+
+def _busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_should_profile_by_token_or_sample_rate():
+    """Test a matching token always profiles and the rate samples the rest."""
+    with (
+        patch.object(profiling, "PROFILE_TOKEN", "s3cret"),
+        patch.object(profiling, "PROFILE_SAMPLE_RATE", 0.0),
+    ):
+        assert should_profile("s3cret")
+        assert not should_profile("wrong")
+        assert not should_profile()
+
+    with (
+        patch.object(profiling, "PROFILE_TOKEN", ""),
+        patch.object(profiling, "PROFILE_SAMPLE_RATE", 1.0),
+    ):
+        assert should_profile()
+        assert should_profile("")
+
+
+def test_sampled_profile_writes_collapsed_stacks(profile_dir):
+    """Test sample mode saves stacks that include the profiled function."""
+    with (
+        patch.object(profiling, "PROFILE_MODE", "sample"),
+        patch.object(profiling, "PROFILE_SAMPLE_INTERVAL_SECONDS", 0.001),
+    ):
+        with profiled("process_reel_task") as path:
+            _busy(0.05)
+
+    assert path.parent == profile_dir
+    assert "process_reel_task" in path.name
+    lines = path.read_text().splitlines()
+    assert lines
+    assert any("test_profiling:_busy" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1
+
+
+def test_cprofile_mode_writes_pstats(profile_dir):
+    """Test cprofile mode saves loadable .pstats."""
+    with patch.object(profiling, "PROFILE_MODE", "cprofile"):
+        with profiled("api.recall.daily") as path:
+            _busy(0.001)
+
+    assert path.suffix == ".pstats"
+    functions = {func for _, _, func in pstats.Stats(str(path)).stats}
+    assert "_busy" in functions
+
+
+def test_nested_and_disabled_blocks_are_not_profiled(profile_dir):
+    """Test only the outermost enabled block writes a profile."""
+    with profiled("outer") as outer:
+        with profiled("inner") as inner:
+            pass
+    with profiled("off", enabled=False) as off:
+        pass
+
+    assert outer is not None
+    assert inner is None
+    assert off is None
+    assert [p.name for p in profile_dir.iterdir()] == [outer.name]
+
+
+def test_rotate_keeps_newest_profiles(tmp_path):
+    """Test rotation deletes the oldest profiles beyond the limit."""
+    for index in range(4):
+        path = tmp_path / f"p{index}.collapsed"
+        path.write_text("a;b 1\n")
+        stamp = 1_000_000 + index
+        os.utime(path, (stamp, stamp))
+    (tmp_path / "notes.txt").write_text("kept")
+
+    rotate(tmp_path, keep=2)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "notes.txt",
+        "p2.collapsed",
+        "p3.collapsed",
+    ]
+
+
+@pytest.mark.django_db
+def test_middleware_profiles_api_request_with_token(client, profile_dir):
+    """Test an /api/ request with the profile token is profiled and named."""
+    with (
+        patch.object(profiling, "PROFILE_TOKEN", "s3cret"),
+        patch("core.views.get_daily_triggers", return_value=[]),
+    ):
+        response = client.get(
+            "/api/recall/daily/", headers={"X-Profile-Token": "s3cret"}
+        )
+        plain = client.get("/api/recall/daily/")
+
+    name = response["X-Profile-File"]
+    assert "api.recall.daily" in name
+    assert (profile_dir / name).exists()
+    assert "X-Profile-File" not in plain
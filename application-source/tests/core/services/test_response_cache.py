@@ -0,0 +1,127 @@
+"""Tests for the persistent Gemini response cache."""
+
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.utils import timezone
+
+from core.models import GeminiResponseCache
+from core.services.response_cache import (
+    cache_stats,
+    cached_response,
+    evict,
+    hash_files,
+    lookup,
+    prune,
+    store,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_hash_files_is_order_sensitive(tmp_path):
+    """Test the image-set hash depends on content and slide order."""
+    first = tmp_path / "1.jpg"
+    second = tmp_path / "2.jpg"
+    first.write_bytes(b"slide one")
+    second.write_bytes(b"slide two")
+
+    assert hash_files([first, second]) == hash_files([first, second])
+    assert hash_files([first, second]) != hash_files([second, first])
+
+
+def test_cached_response_computes_once():
+    """Test a second call with the same key is served from the cache."""
+    compute = MagicMock(return_value={"title": "Cached"})
+
+    first = cached_response("hash1", "model", "transcribe-v1", compute)
+    second = cached_response("hash1", "model", "transcribe-v1", compute)
+
+    assert first == second == {"title": "Cached"}
+    compute.assert_called_once()
+    assert GeminiResponseCache.objects.get().hits == 1
+
+
+def test_cached_response_key_includes_model_and_prompt():
+    """Test a different model or prompt version misses the cache."""
+    compute = MagicMock(return_value={"title": "x"})
+
+    cached_response("hash1", "model-a", "v1", compute)
+    cached_response("hash1", "model-b", "v1", compute)
+    cached_response("hash1", "model-a", "v2", compute)
+
+    assert compute.call_count == 3
+
+
+def test_cached_response_without_hash():
+    """Test calls without a content hash are never cached."""
+    compute = MagicMock(return_value={"title": "x"})
+
+    cached_response(None, "model", "v1", compute)
+
+    assert not GeminiResponseCache.objects.exists()
+
+
+def test_failed_compute_is_not_cached():
+    """Test errors propagate and leave no entry behind."""
+    compute = MagicMock(side_effect=RuntimeError("AI processing failed"))
+
+    with pytest.raises(RuntimeError):
+        cached_response("hash1", "model", "v1", compute)
+    assert lookup("hash1", "model", "v1") is None
+
+
+def test_evict_least_recently_used():
+    """Test eviction removes the least recently used entries first."""
+    with patch("core.services.response_cache.GEMINI_RESPONSE_CACHE_MAX_BYTES", 10**6):
+        for name in ("old", "mid", "new"):
+            store(name, "model", "v1", {"text": "x" * 100})
+    for age, name in enumerate(("new", "mid", "old"), start=1):
+        GeminiResponseCache.objects.filter(content_hash=name).update(
+            last_used_at=timezone.now() - timedelta(hours=age)
+        )
+    lookup("old", "model", "v1")  # now the most recently used
+
+    size = GeminiResponseCache.objects.first().size_bytes
+    assert evict(max_bytes=2 * size) == 1
+    assert set(GeminiResponseCache.objects.values_list("content_hash", flat=True)) == {
+        "old",
+        "new",
+    }
+
+
+def test_store_respects_budget():
+    """Test storing beyond the budget evicts older entries."""
+    with patch("core.services.response_cache.GEMINI_RESPONSE_CACHE_MAX_BYTES", 150):
+        store("a", "model", "v1", {"text": "x" * 100})
+        store("b", "model", "v1", {"text": "x" * 100})
+
+    assert list(GeminiResponseCache.objects.values_list("content_hash", flat=True)) == [
+        "b"
+    ]
+
+
+def test_store_existing_entry_updates_it():
+    """Test storing an existing key replaces the response instead of failing."""
+    store("a", "model", "v1", {"text": "first"})
+    store("a", "model", "v1", {"text": "second"})
+
+    entry = GeminiResponseCache.objects.get()
+    assert entry.response == {"text": "second"}
+    assert entry.size_bytes == len(b'{"text": "second"}')
+
+
+def test_prune_unused_and_stats():
+    """Test pruning by age and the reported statistics."""
+    store("stale", "model", "v1", {"text": "old"})
+    store("fresh", "model", "v2", {"text": "new"})
+    GeminiResponseCache.objects.filter(content_hash="stale").update(
+        last_used_at=timezone.now() - timedelta(days=40)
+    )
+
+    assert prune(unused_since=timezone.now() - timedelta(days=30)) == 1
+
+    stats = cache_stats()
+    assert stats["entries"] == 1
+    assert stats["per_prompt"][0]["prompt_version"] == "v2"
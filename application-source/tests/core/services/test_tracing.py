@@ -0,0 +1,164 @@
+"""Tests for the tracing service and the trace API views."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+
+from core.models import JobTrace
+from core.services.pipeline_stages import stage
+from core.services.tracing import (
+    current_trace_id,
+    in_current_trace,
+    slowest_traces,
+    span,
+    trace_job,
+    waterfall,
+)
+
+
+def _trace(trace_id, duration_ms, insight_id=1, **fields):
+    return JobTrace.objects.create(
+        trace_id=trace_id,
+        insight_id=insight_id,
+        kind="reel",
+        source_url="https://www.instagram.com/reel/R1/",
+        started_at=fields.pop("started_at", timezone.now()),
+        duration_ms=duration_ms,
+        ok=True,
+        **fields,
+    )
+
+
+def test_span_outside_a_trace_does_nothing():
+    """Test spans without an active trace record nothing and still yield attrs."""
+    with span("download", url="x") as attrs:
+        attrs["outcome"] = "ok"
+
+    assert current_trace_id() is None
+
+
+@pytest.mark.django_db
+def test_trace_job_saves_nested_spans_with_parents():
+    """Test stages and spans inside a job are stored with parent and attrs."""
+    with trace_job(7, "https://www.instagram.com/reel/R1/", "reel") as trace:
+        assert current_trace_id() == trace.trace_id
+        with stage("ai_call"):
+            with span("gemini_request", key="abc") as attrs:
+                attrs["outcome"] = "quota"
+            with span("gemini_request", key="def"):
+                pass
+
+    stored = JobTrace.objects.get(trace_id=trace.trace_id)
+    assert stored.insight_id == 7
+    assert stored.ok is True
+    assert [s[:2] for s in stored.spans] == [
+        ["ai_call", -1],
+        ["gemini_request", 0],
+        ["gemini_request", 0],
+    ]
+    assert stored.spans[1][5] == {"key": "abc", "outcome": "quota"}
+    assert [row["depth"] for row in waterfall(stored)] == [0, 1, 1]
+    assert current_trace_id() is None
+
+
+@pytest.mark.django_db
+def test_failed_job_is_saved_as_not_ok():
+    """Test a job that raises is still saved, with the failing span marked."""
+    with pytest.raises(RuntimeError):
+        with trace_job(8, "https://www.instagram.com/p/P1/", "post"):
+            with span("download_instagram_post"):
+                raise RuntimeError("boom")
+
+    stored = JobTrace.objects.get(insight_id=8)
+    assert stored.ok is False
+    assert stored.spans[0][4] is False
+
+
+@pytest.mark.django_db
+def test_in_current_trace_carries_spans_into_pool_threads():
+    """Test work run on pool threads is recorded under the submitting span."""
+    with trace_job(9, "https://www.instagram.com/reel/R2/", "reel") as trace:
+
+        def segment(index):
+            with span("segment", index=index):
+                return index
+
+        with span("ai_call"):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(in_current_trace(segment), range(3)))
+
+    spans = JobTrace.objects.get(trace_id=trace.trace_id).spans
+    assert sorted(s[5]["index"] for s in spans[1:]) == ["0", "1", "2"]
+    assert {s[1] for s in spans[1:]} == {0}
+
+
+@pytest.mark.django_db
+def test_oldest_traces_are_dropped_beyond_the_limit():
+    """Test only the newest JOB_TRACE_MAX_ROWS traces are kept."""
+    with patch("core.services.tracing.JOB_TRACE_MAX_ROWS", 2):
+        for insight_id in (1, 2, 3):
+            with trace_job(insight_id, "https://www.instagram.com/reel/R/", "reel"):
+                pass
+
+    assert sorted(JobTrace.objects.values_list("insight_id", flat=True)) == [2, 3]
+
+
+@pytest.mark.django_db
+def test_tracing_disabled_saves_nothing():
+    """Test JOB_TRACE_MAX_ROWS=0 turns tracing off."""
+    with patch("core.services.tracing.JOB_TRACE_MAX_ROWS", 0):
+        with trace_job(1, "https://www.instagram.com/reel/R/", "reel"):
+            with span("download"):
+                assert current_trace_id() is None
+
+    assert not JobTrace.objects.exists()
+
+
+@pytest.mark.django_db
+def test_slowest_traces_orders_by_duration_and_filters_by_start():
+    """Test the slowest-N query sorts by duration and honours the cutoff."""
+    _trace("a", 900)
+    _trace("b", 5000, started_at=timezone.now() - timedelta(days=3))
+    _trace("c", 1200)
+
+    assert [t.trace_id for t in slowest_traces(2)] == ["b", "c"]
+    since = timezone.now() - timedelta(days=1)
+    assert [t.trace_id for t in slowest_traces(10, since)] == ["c", "a"]
+
+
+@pytest.mark.django_db
+def test_task_trace_view_returns_latest_waterfall(client):
+    """Test the task trace endpoint returns the newest trace of the insight."""
+    _trace("old", 100, insight_id=5)
+    _trace("new", 200, insight_id=5, spans=[["download", -1, 0.0, 150.0, True, {}]])
+
+    response = client.get("/api/task-trace/5/")
+
+    body = response.json()
+    assert body["trace_id"] == "new"
+    assert body["spans"][0]["name"] == "download"
+    assert client.get("/api/task-trace/6/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_slowest_jobs_view(client):
+    """Test the slowest jobs endpoint lists traces by duration."""
+    _trace("a", 100)
+    _trace("b", 300)
+
+    response = client.get("/api/traces/slowest/?limit=1")
+
+    assert [job["trace_id"] for job in response.json()["jobs"]] == ["b"]
+    assert client.get("/api/traces/slowest/?limit=x").status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("days", ["inf", "nan", "-1", "1e9", "1e300"])
+def test_slowest_jobs_view_rejects_bad_days(client, days):
+    """Test non-finite, negative or out-of-range days are a 400, not a 500."""
+    response = client.get(f"/api/traces/slowest/?days={days}")
+
+    assert response.status_code == 400
@@ -0,0 +1,117 @@
+"""Tests for the Gemini stand-in, driven through the real google-genai SDK."""
+
+import json
+
+import pytest
+from google.genai import errors
+from google.genai.client import Client
+
+from core.services.gemini_schemas import TranscriptionResult, json_config
+from core.standins import GeminiBehavior, GeminiStandIn, serve_in_background
+
+MODEL = "models/gemini-2.5-flash-lite"
+
+
+@pytest.fixture
+def start_gemini():
+    servers = []
+
+    def start(**behavior):
+        server = GeminiStandIn(behavior=GeminiBehavior(latency_seconds=0, **behavior))
+        serve_in_background(server)
+        servers.append(server)
+        client = Client(api_key="test", http_options={"base_url": server.base_url})
+        return server, client
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_generate_content_fills_response_schema(start_gemini):
+    """Test generateContent answers with JSON matching the requested schema."""
+    server, client = start_gemini()
+
+    response = client.models.generate_content(
+        model=MODEL, contents="hi", config=json_config(TranscriptionResult)
+    )
+
+    assert isinstance(response.parsed, TranscriptionResult)
+    assert response.parsed.language == "en"
+    assert len(response.parsed.triggers) == 2
+    assert server.outcomes == {"ok": 1}
+
+
+def test_stream_generate_content_delivers_chunks(start_gemini):
+    """Test streamGenerateContent splits the answer into SSE chunks."""
+    _server, client = start_gemini(stream_chunks=3)
+
+    chunks = list(
+        client.models.generate_content_stream(
+            model=MODEL, contents="hi", config=json_config(TranscriptionResult)
+        )
+    )
+
+    assert len(chunks) == 3
+    assert set(json.loads("".join(chunk.text for chunk in chunks))) == set(
+        TranscriptionResult.model_fields
+    )
+
+
+def test_quota_errors_carry_retry_delay(start_gemini):
+    """Test a quota roll returns 429 with a retryDelay hint."""
+    _server, client = start_gemini(quota_error_rate=1.0, retry_delay_seconds=7)
+
+    with pytest.raises(errors.ClientError) as excinfo:
+        client.models.generate_content(model=MODEL, contents="hi")
+
+    assert excinfo.value.code == 429
+    assert "7s" in str(excinfo.value)
+
+
+def test_server_errors_raise_server_error(start_gemini):
+    """Test a server-error roll returns 503."""
+    _server, client = start_gemini(server_error_rate=1.0)
+
+    with pytest.raises(errors.ServerError):
+        client.models.generate_content(model=MODEL, contents="hi")
+
+
+def test_malformed_rate_truncates_json(start_gemini):
+    """Test a malformed roll returns text that is not valid JSON."""
+    _server, client = start_gemini(malformed_rate=1.0)
+
+    response = client.models.generate_content(model=MODEL, contents="hi")
+
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(response.text)
+
+
+def test_outcomes_are_reproducible_for_a_seed():
+    """Test the same seed yields the same sequence of outcomes."""
+    behavior = GeminiBehavior(quota_error_rate=0.3, malformed_rate=0.3, seed=42)
+    runs = []
+    for _ in range(2):
+        server = GeminiStandIn(behavior=behavior)
+        runs.append([server.draw_outcome() for _ in range(50)])
+        server.server_close()
+
+    assert runs[0] == runs[1]
+    assert {"quota", "malformed", "ok"} <= set(runs[0])
+
+
+def test_files_api_upload_get_and_delete(start_gemini, tmp_path):
+    """Test the resumable upload, get and delete round trip."""
+    _server, client = start_gemini()
+    audio = tmp_path / "audio.mp3"
+    audio.write_bytes(b"\0" * 1024)
+
+    uploaded = client.files.upload(file=str(audio), config={"mime_type": "audio/mpeg"})
+    fetched = client.files.get(name=uploaded.name)
+    client.files.delete(name=uploaded.name)
+
+    assert fetched.size_bytes == 1024
+    assert fetched.state.name == "ACTIVE"
+    with pytest.raises(errors.ClientError):
+        client.files.get(name=uploaded.name)
@@ -0,0 +1,82 @@
+"""Tests for the Instagram stand-in and the downloaders pointed at it."""
+
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from core.services.post_text_aggregator import download_instagram_post
+from core.services.reel_downloader import download_reel, get_reel_metadata
+from core.standins import InstagramBehavior, InstagramStandIn, serve_in_background
+
+
+@pytest.fixture
+def instagram(tmp_path):
+    recordings = tmp_path / "recordings"
+    (recordings / "media").mkdir(parents=True)
+    (recordings / "media" / "REEL1.mp4").write_bytes(b"recorded mp4")
+    server = InstagramStandIn(
+        behavior=InstagramBehavior(
+            latency_seconds=0, post_slides=2, recordings_dir=recordings
+        )
+    )
+    serve_in_background(server)
+    with patch("core.constants.INSTAGRAM_BASE_URL", server.base_url):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_reel_from_standin(instagram, tmp_path):
+    """Test download_reel follows the stand-in page to its recorded MP4."""
+    with patch("core.services.reel_downloader.MEDIA_DIR", tmp_path):
+        path = download_reel("https://www.instagram.com/reel/REEL1/")
+
+    assert path.read_bytes() == b"recorded mp4"
+    assert instagram.outcomes == {"reel": 1, "media": 1}
+
+
+def test_get_reel_metadata_uses_shortcode(instagram):
+    """Test stand-in metadata skips yt-dlp and reports the shortcode as id."""
+    with patch("core.services.reel_downloader.yt_dlp.YoutubeDL") as ydl:
+        meta = get_reel_metadata("https://www.instagram.com/reel/REEL1/")
+
+    assert meta == {"id": "REEL1", "title": None}
+    ydl.assert_not_called()
+
+
+def test_download_post_from_standin_embed(instagram, tmp_path):
+    """Test a post downloads every synthesized carousel slide via the embed page."""
+    with (
+        patch("core.services.post_text_aggregator.MEDIA_DIR", tmp_path),
+        patch("core.services.post_text_aggregator._try_instaloader") as instaloader,
+    ):
+        paths = download_instagram_post("https://www.instagram.com/p/POST1/")
+
+    assert len(paths) == 2
+    with Image.open(paths[0]) as image:
+        assert image.size == (1080, 1350)
+    instaloader.assert_not_called()
+    assert instagram.outcomes == {"embed": 1, "media": 2}
+
+
+def test_recorded_pages_point_back_at_the_server(tmp_path):
+    """Test {{base_url}} in a recorded page is replaced with the server URL."""
+    (tmp_path / "post").mkdir()
+    (tmp_path / "post" / "ABC.html").write_bytes(b'<a href="{{base_url}}/x">')
+    server = InstagramStandIn(behavior=InstagramBehavior(recordings_dir=tmp_path))
+    try:
+        page = server.page("post", "ABC")
+    finally:
+        server.server_close()
+
+    assert page == f'<a href="{server.base_url}/x">'.encode()
+
+
+def test_unknown_paths_are_not_found(instagram):
+    """Test paths outside the fake site return 404."""
+    from curl_cffi import requests as curl_requests
+
+    resp = curl_requests.get(f"{instagram.base_url}/explore/")
+
+    assert resp.status_code == 404
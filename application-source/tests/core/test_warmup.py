@@ -0,0 +1,33 @@
+"""Tests for the pre-fork warmup helpers."""
+
+from unittest.mock import patch
+
+from core.warmup import warm_up
+
+
+@patch("core.warmup.SERVICE_MODULES", ())
+def test_warm_up_loads_urls_and_templates():
+    """Test warmup populates URL resolvers and compiles every template."""
+    report = warm_up(freeze=False)
+
+    assert report["url_names"] > 0
+    assert report["templates"] >= 7
+    assert report["service_modules"] == 0
+
+
+@patch("core.warmup.SERVICE_MODULES", ("core.services.does_not_exist",))
+def test_warm_up_tolerates_service_import_errors():
+    """Test a failing service import is logged instead of aborting boot."""
+    with patch("core.warmup.logger") as mock_logger:
+        report = warm_up(freeze=False)
+
+    assert report["service_modules"] == 0
+    mock_logger.warning.assert_called_once()
+
+
+@patch("core.warmup.gc")
+@patch("core.warmup.SERVICE_MODULES", ())
+def test_warm_up_freezes_gc(mock_gc):
+    """Test warmup freezes the GC so forked workers share pages."""
+    warm_up()
+    mock_gc.freeze.assert_called_once()
@@ -18,10 +18,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
-from core.views import health_check
+from core.views import health_check, metrics
 
 urlpatterns = [
     path("", include("core.urls")),  # UI + API
     path("health/", health_check),  # infra health
+    path("metrics/", metrics),  # Prometheus scrape
     path("admin/", admin.site.urls),
 ]